@@ -0,0 +1,29 @@
+from django.core.cache import caches
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, Warning, register
+
+from .throttle import THROTTLE_CACHE_ALIAS
+
+
+@register(Tags.caches, Tags.security)
+def check_throttle_cache(app_configs, **kwargs):
+    """Throttling counters on a database cache would cost several writes per login attempt."""
+    if isinstance(caches[THROTTLE_CACHE_ALIAS], BaseDatabaseCache):
+        return [Error(
+            f"The '{THROTTLE_CACHE_ALIAS}' cache must not be a database cache.",
+            hint="Set REDIS_URL, or keep the per-process LocMemCache.",
+            id="accounts.E001",
+        )]
+    return []
+
+
+@register(Tags.caches, Tags.security, deploy=True)
+def check_throttle_cache_shared(app_configs, **kwargs):
+    if isinstance(caches[THROTTLE_CACHE_ALIAS], LocMemCache):
+        return [Warning(
+            f"The '{THROTTLE_CACHE_ALIAS}' cache is per process: login limits are multiplied by the worker count.",
+            hint="Set REDIS_URL.",
+            id="accounts.W001",
+        )]
+    return []
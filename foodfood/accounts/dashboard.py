@@ -0,0 +1,299 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, time as dt_time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Sum, Avg, Q
+from django.db.models.functions import TruncHour, TruncDay, TruncWeek
+from django.utils import timezone
+
+from foodfood.cache import shared_cache
+from foodfood.routing import current_read_alias, read_from
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_CACHE_KEY = "vendor-dashboard:{vendor_id}"
+DASHBOARD_LOCK_KEY = "vendor-dashboard-lock:{vendor_id}"
+
+TIMESERIES_RESOLUTIONS = {
+    "hour": TruncHour,
+    "day": TruncDay,
+    "week": TruncWeek,
+}
+TIMESERIES_MAX_POINTS = 1000
+
+
+def _fresh_seconds():
+    return getattr(settings, "VENDOR_DASHBOARD_FRESH_SECONDS", 30)
+
+
+def _stale_seconds():
+    return getattr(settings, "VENDOR_DASHBOARD_STALE_SECONDS", 600)
+
+
+def compute_dashboard_context(vendor):
+    """Compute the analytics shown on the vendor dashboard."""
+    from orders.models import Order
+    from restaurants.models import MenuItem
+    from orders.analytics import top_menu_items as top_menu_items_since, customer_metrics
+
+    restaurants = vendor.restaurants.all()
+
+    # === ANALYTICS TEMPORELLES ===
+    now = timezone.now()
+    today = now.date()
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
+
+    # Commandes par période
+    orders_today = Order.objects.filter(
+        restaurant__vendor=vendor,
+        created_at__date=today
+    )
+    orders_week = Order.objects.filter(
+        restaurant__vendor=vendor,
+        created_at__gte=week_ago
+    )
+    orders_month = Order.objects.filter(
+        restaurant__vendor=vendor,
+        created_at__gte=month_ago
+    )
+
+    # === MÉTRIQUES FINANCIÈRES ===
+    revenue_today = orders_today.aggregate(total=Sum('total_amount'))['total'] or 0
+    revenue_week = orders_week.aggregate(total=Sum('total_amount'))['total'] or 0
+    revenue_month = orders_month.aggregate(total=Sum('total_amount'))['total'] or 0
+
+    # === MÉTRIQUES DE COMMANDES ===
+    orders_count_today = orders_today.count()
+    orders_count_week = orders_week.count()
+    orders_count_month = orders_month.count()
+
+    # Panier moyen
+    avg_order_value_today = orders_today.aggregate(avg=Avg('total_amount'))['avg'] or 0
+    avg_order_value_week = orders_week.aggregate(avg=Avg('total_amount'))['avg'] or 0
+    avg_order_value_month = orders_month.aggregate(avg=Avg('total_amount'))['avg'] or 0
+
+    # === ANALYTICS PAR RESTAURANT ===
+    # Deux requêtes groupées plutôt que cinq par restaurant
+    order_stats = {
+        row['restaurant_id']: row
+        for row in Order.objects.filter(restaurant__vendor=vendor).values('restaurant_id').annotate(
+            total_orders=Count('id'),
+            orders_this_month=Count('id', filter=Q(created_at__gte=month_ago)),
+            revenue_this_month=Sum('total_amount', filter=Q(created_at__gte=month_ago)),
+        )
+    }
+    menu_stats = {
+        row['restaurant_id']: row
+        for row in MenuItem.objects.filter(restaurant__vendor=vendor).values('restaurant_id').annotate(
+            menu_items_count=Count('id'),
+            available_items=Count('id', filter=Q(is_available=True)),
+        )
+    }
+    restaurant_stats = []
+    for restaurant in restaurants:
+        orders_row = order_stats.get(restaurant.pk, {})
+        menu_row = menu_stats.get(restaurant.pk, {})
+        stats = {
+            'restaurant': restaurant,
+            'total_orders': orders_row.get('total_orders', 0),
+            'orders_this_month': orders_row.get('orders_this_month', 0),
+            'revenue_this_month': orders_row.get('revenue_this_month') or 0,
+            'avg_rating': restaurant.rating,
+            'is_open': restaurant.is_open,
+            'menu_items_count': menu_row.get('menu_items_count', 0),
+            'available_items': menu_row.get('available_items', 0),
+        }
+        restaurant_stats.append(stats)
+
+    # === PLATS LES PLUS VENDUS ===
+    top_menu_items = top_menu_items_since(restaurants, month_ago.date(), limit=10)
+
+    # === COMMANDES RÉCENTES ===
+    recent_orders = list(Order.objects.filter(
+        restaurant__vendor=vendor
+    ).select_related('restaurant').order_by('-created_at')[:10])
+
+    # === STATUTS DES COMMANDES ===
+    order_status_stats = list(Order.objects.filter(
+        restaurant__vendor=vendor,
+        created_at__gte=month_ago
+    ).values('status').annotate(count=Count('status')))
+
+    # === TENDANCES HEBDOMADAIRES ===
+    weekly_data = [
+        {'date': point['start'].date(), 'orders': point['orders'], 'revenue': point['revenue']}
+        for point in order_timeseries(vendor, today - timedelta(days=6), today, 'day')
+    ]
+
+    # === PERFORMANCE GÉNÉRALE ===
+    customers = customer_metrics(restaurants)
+    total_customers = customers['total_customers']
+    repeat_customers = customers['repeat_customers']
+    customer_retention = customers['customer_retention']
+
+    return {
+        'vendor': vendor,
+        'restaurants': restaurants,
+        'recent_orders': recent_orders,
+
+        # Métriques temporelles
+        'revenue_today': revenue_today,
+        'revenue_week': revenue_week,
+        'revenue_month': revenue_month,
+        'orders_count_today': orders_count_today,
+        'orders_count_week': orders_count_week,
+        'orders_count_month': orders_count_month,
+        'avg_order_value_today': avg_order_value_today,
+        'avg_order_value_week': avg_order_value_week,
+        'avg_order_value_month': avg_order_value_month,
+
+        # Analytics par restaurant
+        'restaurant_stats': restaurant_stats,
+
+        # Plats populaires
+        'top_menu_items': top_menu_items,
+
+        # Statuts des commandes
+        'order_status_stats': order_status_stats,
+
+        # Tendances
+        'weekly_data': weekly_data,
+
+        # Performance
+        'total_customers': total_customers,
+        'repeat_customers': repeat_customers,
+        'customer_retention': customer_retention,
+    }
+
+
+def _bucket_starts(start, end, resolution):
+    """All bucket start datetimes between the start and end dates, in the current timezone."""
+    if resolution == "week":
+        day = start - timedelta(days=start.weekday())
+        step = timedelta(days=7)
+    else:
+        day = start
+        step = timedelta(days=1)
+    hours = range(24) if resolution == "hour" else (0,)
+    while day <= end:
+        for hour in hours:
+            yield timezone.make_aware(datetime.combine(day, dt_time(hour)))
+        day += step
+
+
+def timeseries_point_count(start, end, resolution):
+    days = (end - start).days + 1
+    if resolution == "hour":
+        return days * 24
+    if resolution == "week":
+        return (end - (start - timedelta(days=start.weekday()))).days // 7 + 1
+    return days
+
+
+def order_timeseries(vendor, start, end, resolution="day", restaurant_id=None, status=None):
+    """Order count and revenue of vendor per bucket between two dates (inclusive).
+
+    Bucketing happens in one grouped query; empty buckets are filled with zeros.
+    Raises ValueError for an unknown resolution or a range above TIMESERIES_MAX_POINTS.
+    """
+    from orders.models import Order
+
+    if resolution not in TIMESERIES_RESOLUTIONS:
+        raise ValueError(f"Unknown resolution '{resolution}'")
+    if end < start:
+        raise ValueError("End date is before start date")
+    if timeseries_point_count(start, end, resolution) > TIMESERIES_MAX_POINTS:
+        raise ValueError(f"Range exceeds {TIMESERIES_MAX_POINTS} points at '{resolution}' resolution")
+
+    orders = Order.objects.filter(
+        restaurant__vendor=vendor,
+        created_at__gte=timezone.make_aware(datetime.combine(start, dt_time.min)),
+        created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), dt_time.min)),
+    )
+    if restaurant_id is not None:
+        orders = orders.filter(restaurant_id=restaurant_id)
+    if status:
+        orders = orders.filter(status=status)
+
+    trunc = TIMESERIES_RESOLUTIONS[resolution]
+    rows = (
+        orders.annotate(bucket=trunc('created_at'))
+        .values('bucket')
+        .annotate(orders=Count('id'), revenue=Sum('total_amount'))
+        .order_by('bucket')
+    )
+    by_bucket = {row['bucket']: row for row in rows}
+
+    series = []
+    for bucket in _bucket_starts(start, end, resolution):
+        row = by_bucket.get(bucket)
+        series.append({
+            'start': bucket,
+            'orders': row['orders'] if row else 0,
+            'revenue': (row['revenue'] or 0) if row else 0,
+        })
+    return series
+
+
+def _store(vendor, context):
+    entry = {"context": context, "computed_at": time.time()}
+    shared_cache.set(DASHBOARD_CACHE_KEY.format(vendor_id=vendor.pk), entry, _stale_seconds())
+    return entry
+
+
+def _refresh_in_background(vendor):
+    """Recompute the dashboard for vendor in a worker thread, releasing the lock when done."""
+    lock_key = DASHBOARD_LOCK_KEY.format(vendor_id=vendor.pk)
+    # Threads start with an empty context: carry over the request's read database
+    read_alias = current_read_alias()
+
+    def run():
+        close_old_connections()
+        try:
+            with read_from(read_alias):
+                _store(vendor, compute_dashboard_context(vendor))
+        except Exception:
+            logger.exception("Vendor dashboard refresh failed for vendor %s", vendor.pk)
+        finally:
+            shared_cache.delete(lock_key)
+            close_old_connections()
+
+    thread = threading.Thread(target=run, name=f"dashboard-refresh-{vendor.pk}", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_dashboard_context(vendor):
+    """Return the dashboard context for vendor using stale-while-revalidate caching.
+
+    A fresh entry is served as is. A stale entry is served while a single background
+    recompute (guarded by a cache lock) refreshes it. A missing entry is computed inline.
+    Entry and lock live in the shared cache, so invalidations and the single refresh
+    hold across worker processes.
+    """
+    entry = shared_cache.get(DASHBOARD_CACHE_KEY.format(vendor_id=vendor.pk))
+    if entry is None:
+        return _store(vendor, compute_dashboard_context(vendor))["context"]
+
+    age = time.time() - entry["computed_at"]
+    if age > _fresh_seconds():
+        lock_key = DASHBOARD_LOCK_KEY.format(vendor_id=vendor.pk)
+        # cache.add is atomic: only one request per window triggers the recompute
+        if shared_cache.add(lock_key, 1, getattr(settings, "VENDOR_DASHBOARD_LOCK_SECONDS", 60)):
+            if getattr(settings, "VENDOR_DASHBOARD_BACKGROUND_REFRESH", True):
+                _refresh_in_background(vendor)
+            else:
+                try:
+                    entry = _store(vendor, compute_dashboard_context(vendor))
+                finally:
+                    shared_cache.delete(lock_key)
+    return entry["context"]
+
+
+def invalidate_dashboard(vendor_id):
+    """Drop the cached dashboard of a vendor so the next request recomputes it."""
+    shared_cache.delete(DASHBOARD_CACHE_KEY.format(vendor_id=vendor_id))
@@ -0,0 +1,113 @@
+import csv
+import json
+from datetime import datetime, time
+
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_date
+from django.utils import timezone
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_CHUNK_SIZE = 500
+
+CSV_HEADER = [
+    "order_id", "created_at", "restaurant", "customer", "status",
+    "delivery_address", "total_amount", "item", "quantity", "unit_price", "line_total",
+]
+
+
+def parse_export_date(value):
+    """Parse an optional YYYY-MM-DD filter, raising ValueError on malformed input."""
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f"Invalid date '{value}'")
+    return parsed
+
+
+class Echo:
+    """File-like object whose write() hands the value back, for csv.writer streaming."""
+
+    def write(self, value):
+        return value
+
+
+def vendor_orders_queryset(vendor, start=None, end=None, restaurant_id=None, status=None):
+    """Orders of vendor between two dates (inclusive), optionally for one restaurant or status."""
+    from orders.models import Order, OrderItem
+
+    orders = Order.objects.filter(restaurant__vendor=vendor)
+    if start is not None:
+        orders = orders.filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end is not None:
+        orders = orders.filter(created_at__lte=timezone.make_aware(datetime.combine(end, time.max)))
+    if restaurant_id is not None:
+        orders = orders.filter(restaurant_id=restaurant_id)
+    if status:
+        orders = orders.filter(status=status)
+    return (
+        orders
+        .select_related("restaurant", "customer__user")
+        .prefetch_related(Prefetch("items", queryset=OrderItem.objects.select_related("menu_item")))
+        .order_by("created_at", "id")
+    )
+
+
+def iter_orders(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Iterate orders chunk by chunk; order lines are prefetched per chunk."""
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def iter_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield CSV lines, one per order line (orders without lines get a single row)."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order in iter_orders(queryset, chunk_size):
+        base = [
+            order.pk,
+            order.created_at.isoformat(),
+            order.restaurant.name,
+            order.customer.user.get_username(),
+            order.status,
+            order.delivery_address,
+            order.total_amount,
+        ]
+        items = list(order.items.all())
+        if not items:
+            yield writer.writerow(base + ["", "", "", ""])
+        for item in items:
+            yield writer.writerow(base + [
+                item.menu_item.name,
+                item.quantity,
+                item.price,
+                item.price * item.quantity,
+            ])
+
+
+def iter_jsonl(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one JSON document per order, with its lines nested under "items"."""
+    for order in iter_orders(queryset, chunk_size):
+        yield json.dumps({
+            "order_id": order.pk,
+            "created_at": order.created_at.isoformat(),
+            "restaurant": order.restaurant.name,
+            "customer": order.customer.user.get_username(),
+            "status": order.status,
+            "delivery_address": order.delivery_address,
+            "total_amount": str(order.total_amount),
+            "items": [
+                {
+                    "item": item.menu_item.name,
+                    "quantity": item.quantity,
+                    "unit_price": str(item.price),
+                    "line_total": str(item.price * item.quantity),
+                }
+                for item in order.items.all()
+            ],
+        }, ensure_ascii=False) + "\n"
+
+
+def iter_export(queryset, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    if export_format == "jsonl":
+        return iter_jsonl(queryset, chunk_size)
+    return iter_csv(queryset, chunk_size)
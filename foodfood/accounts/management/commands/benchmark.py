@@ -0,0 +1,121 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from foodfood.benchmark import INTERFACES, SCENARIOS, compare, run_scenario
+from payments.gateway import reset_gateway
+from restaurants.models import MenuItem, Restaurant
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the main endpoints on a throwaway database and compare against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=[s.name for s in SCENARIOS],
+                            help='Scenario to run (repeatable); all by default')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Concurrent clients (threads under wsgi, coroutines under asgi)')
+        parser.add_argument('--interface', choices=[*INTERFACES, 'both'], default='wsgi',
+                            help='Handler to drive; "both" runs every scenario under WSGI then ASGI')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per thread')
+        parser.add_argument('--save', help='Write the results to this JSON baseline file')
+        parser.add_argument('--compare', help='Fail if results regress against this JSON baseline')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative regression in --compare mode (0.2 = 20%%)')
+        parser.add_argument('--synthetic-orders', type=int, default=0,
+                            help='Seed with generate_data at this many orders instead of seed_data')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the benchmark database (and its data) between runs')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = json.loads(Path(options['compare']).read_text())['results']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {exc}")
+
+        # The benchmark never touches the development database
+        db_dir = Path(settings.BASE_DIR) / '.cache'
+        db_dir.mkdir(exist_ok=True)
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = str(db_dir / 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb']
+        )
+        try:
+            results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        if options['save']:
+            Path(options['save']).write_text(json.dumps({
+                'created': timezone.now().isoformat(),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'interface': options['interface'],
+                'results': results,
+            }, indent=2))
+            self.stdout.write(f"Baseline written to {options['save']}")
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['threshold'])
+            for name, metric, before, after in regressions:
+                self.stdout.write(self.style.ERROR(f"{name}: {metric} {before} -> {after}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) beyond {options['threshold']:.0%}")
+            self.stdout.write(self.style.SUCCESS('No regression against the baseline'))
+
+    def run(self, options):
+        if not Restaurant.objects.exists():
+            self.stdout.write('Seeding benchmark data...')
+            orders = options['synthetic_orders']
+            if orders:
+                call_command('generate_data', orders=orders, restaurants=max(10, orders // 500),
+                             customers=max(100, orders // 20), stdout=self.stdout)
+            else:
+                call_command('seed_data', stdout=self.stdout)
+
+        users = {
+            'customer': User.objects.filter(customer_profile__isnull=False).exclude(customer_profile__phone='').first(),
+            'vendor': User.objects.filter(vendor_profile__restaurants__isnull=False).first(),
+        }
+        menu_item = MenuItem.objects.filter(is_available=True).select_related('restaurant').first()
+        if not all(users.values()) or menu_item is None:
+            raise CommandError('Benchmark data needs a customer with a phone, a vendor and a menu item')
+        fixtures = {
+            'menu_item_id': menu_item.pk,
+            'search_term': menu_item.restaurant.name.split()[0],
+        }
+
+        selected = [s for s in SCENARIOS if not options['scenario'] or s.name in options['scenario']]
+        interfaces = INTERFACES if options['interface'] == 'both' else [options['interface']]
+        results = {}
+        with override_settings(PAYMENT_GATEWAY='stub', ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            reset_gateway()
+            try:
+                self.stdout.write(f"{'scenario':<25}{'req':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}"
+                                  f"{'p99 ms':>10}{'req/s':>9}{'threads':>9}")
+                for scenario in selected:
+                    for interface in interfaces:
+                        summary = run_scenario(scenario, users, fixtures, requests=options['requests'],
+                                               concurrency=options['concurrency'], warmup=options['warmup'],
+                                               interface=interface)
+                        # WSGI results keep the bare scenario name, so older baselines still compare
+                        name = scenario.name if interface == 'wsgi' else f"{scenario.name}:{interface}"
+                        results[name] = summary
+                        self.stdout.write(
+                            f"{name:<25}{summary['requests']:>6}{summary['errors']:>5}"
+                            f"{summary['p50_ms']:>10}{summary['p95_ms']:>10}{summary['p99_ms']:>10}"
+                            f"{summary['throughput_rps']:>9}{summary['peak_threads']:>9}"
+                        )
+            finally:
+                reset_gateway()
+        return results
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Vendor
+from accounts.exports import (
+    EXPORT_FORMATS, EXPORT_CHUNK_SIZE, parse_export_date, vendor_orders_queryset, iter_export,
+)
+
+
+class Command(BaseCommand):
+    help = "Stream a vendor's order history, with order lines, as CSV or JSON lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('vendor', help='Vendor id or username of the vendor user')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--start', help='First day to export (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to export (YYYY-MM-DD)')
+        parser.add_argument('--restaurant', type=int, help='Only export this restaurant id')
+        parser.add_argument('--status', help='Only export orders with this status')
+        parser.add_argument('--output', help='File to write to (defaults to stdout)')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        vendor_ref = options['vendor']
+        lookup = {'pk': int(vendor_ref)} if vendor_ref.isdigit() else {'user__username': vendor_ref}
+        try:
+            vendor = Vendor.objects.get(**lookup)
+        except Vendor.DoesNotExist:
+            raise CommandError(f"Vendor '{vendor_ref}' does not exist")
+
+        try:
+            start = parse_export_date(options['start'])
+            end = parse_export_date(options['end'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        orders = vendor_orders_queryset(vendor, start=start, end=end, restaurant_id=options['restaurant'],
+                                        status=options['status'])
+        chunks = iter_export(orders, options['format'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,240 @@
+import random
+import sys
+import time
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Customer, Vendor
+from orders.models import Order, OrderItem
+from restaurants.models import MenuItem, Restaurant
+
+PREFIX = 'gen_'
+CATEGORIES = [value for value, _ in MenuItem.Category.choices]
+DISHES = ['Curry', 'Biryani', 'Pizza', 'Burger', 'Ramen', 'Salad', 'Tacos', 'Pasta', 'Wrap', 'Soup',
+          'Dosa', 'Paneer', 'Noodles', 'Sushi', 'Kebab', 'Falafel', 'Risotto', 'Lasagne', 'Poke', 'Thali']
+ADJECTIVES = ['Spicy', 'Classic', 'Smoky', 'Garden', 'Royal', 'Crispy', 'Masala', 'Golden', 'House', 'Street']
+KITCHENS = ['Kitchen', 'Bistro', 'Dhaba', 'Grill', 'Café', 'Diner', 'Canteen', 'Trattoria', 'House', 'Express']
+# Commandes récentes encore en cours, les anciennes sont terminées
+OPEN_STATUSES = [Order.STATUS_PENDING, Order.STATUS_ACCEPTED, Order.STATUS_PREPARING, Order.STATUS_ON_THE_WAY]
+CLOSED_STATUSES = [Order.STATUS_DELIVERED] * 19 + [Order.STATUS_CANCELLED]
+
+
+def zipf_cum_weights(n, skew):
+    """Cumulative weights giving rank r a probability proportional to 1 / r**skew."""
+    return list(accumulate(1 / rank ** skew for rank in range(1, n + 1)))
+
+
+class Progress:
+    """Single-line progress display on a terminal, one line per step otherwise."""
+
+    def __init__(self, stdout, label, total):
+        self.stdout = stdout
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+        self.tty = sys.stdout.isatty()
+
+    def advance(self, count):
+        self.done += count
+        rate = self.done / max(time.monotonic() - self.started, 1e-6)
+        line = f"{self.label}: {self.done}/{self.total} ({self.done / self.total:.0%}, {rate:,.0f}/s)"
+        if self.tty:
+            self.stdout.write(f"\r{line}", ending='')
+            self.stdout.flush()
+        elif self.done >= self.total or self.done % (self.total // 10 or 1) < count:
+            self.stdout.write(line)
+
+    def finish(self):
+        if self.tty:
+            self.stdout.write('')
+
+
+class Command(BaseCommand):
+    help = 'Generate large synthetic datasets with skewed popularity for load and benchmark testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=100)
+        parser.add_argument('--items-per-restaurant', type=int, default=50,
+                            help='Average menu size; each menu varies by +/-50%%')
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--max-items-per-order', type=int, default=5)
+        parser.add_argument('--restaurants-per-vendor', type=int, default=5)
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of restaurant and menu item popularity (0 = uniform)')
+        parser.add_argument('--customer-skew', type=float, default=0.6,
+                            help='Zipf exponent of how often customers order')
+        parser.add_argument('--days', type=int, default=90, help='Orders are spread over this many days')
+        parser.add_argument('--end-date', help='Last day of orders (YYYY-MM-DD), today by default')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; same seed, same data')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--password', default='testpass123', help='Password of every generated user')
+        parser.add_argument('--skip-analytics', action='store_true',
+                            help='Do not rebuild the menu item sales and customer sketch tables')
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated data first')
+
+    def handle(self, *args, **options):
+        if min(options['restaurants'], options['items_per_restaurant'], options['customers']) < 1:
+            raise CommandError('--restaurants, --items-per-restaurant and --customers must be positive')
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        end_date = (datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+                    if options['end_date'] else timezone.localdate())
+        self.end = timezone.make_aware(datetime.combine(end_date, dt_time.max))
+
+        if options['clear']:
+            self.clear_data()
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError('Generated data already exists; run again with --clear')
+
+        started = time.monotonic()
+        password = make_password(options['password'])
+        vendors = self.create_vendors(-(-options['restaurants'] // options['restaurants_per_vendor']), password)
+        restaurants = self.create_restaurants(vendors, options['restaurants'])
+        menus = self.create_menu_items(restaurants, options['items_per_restaurant'])
+        customers = self.create_customers(options['customers'], password)
+        self.create_orders(restaurants, menus, customers, options)
+
+        if not options['skip_analytics']:
+            call_command('rebuild_menu_item_sales', stdout=self.stdout)
+            call_command('rebuild_customer_sketches', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(restaurants)} restaurants, {sum(len(m) for m in menus)} menu items, '
+            f'{len(customers)} customers and {options["orders"]} orders in {time.monotonic() - started:.0f}s'
+        ))
+
+    def clear_data(self):
+        self.stdout.write('Clearing generated data...')
+        # OrderItem protects MenuItem, so orders go first
+        Order.objects.filter(customer__user__username__startswith=PREFIX).delete()
+        Order.objects.filter(restaurant__vendor__user__username__startswith=PREFIX).delete()
+        User.objects.filter(username__startswith=PREFIX).delete()
+
+    def bulk_create(self, model, objs, label):
+        """Insert objs in chunks, showing progress, and return them with their primary keys."""
+        progress = Progress(self.stdout, label, len(objs))
+        for start in range(0, len(objs), self.chunk_size):
+            chunk = objs[start:start + self.chunk_size]
+            model.objects.bulk_create(chunk)
+            progress.advance(len(chunk))
+        progress.finish()
+        return objs
+
+    def create_users(self, kind, count, password):
+        users = [
+            User(username=f'{PREFIX}{kind}{n}', email=f'{kind}{n}@example.com', password=password)
+            for n in range(1, count + 1)
+        ]
+        return self.bulk_create(User, users, f'{kind} users')
+
+    def create_vendors(self, count, password):
+        users = self.create_users('vendor', count, password)
+        vendors = [
+            Vendor(user=user, restaurant_name=f'{self.rng.choice(ADJECTIVES)} Foods {n}',
+                   phone=f'+91{self.rng.randrange(10 ** 9, 10 ** 10)}')
+            for n, user in enumerate(users, 1)
+        ]
+        return self.bulk_create(Vendor, vendors, 'vendors')
+
+    def create_restaurants(self, vendors, count):
+        per_vendor = -(-count // len(vendors))
+        restaurants = [
+            Restaurant(
+                vendor=vendors[(n - 1) // per_vendor],
+                name=f'{self.rng.choice(ADJECTIVES)} {self.rng.choice(DISHES)} {self.rng.choice(KITCHENS)} {n}',
+                # bulk_create skips save(), so slugs are set here
+                slug=f'{PREFIX.rstrip("_")}-restaurant-{n}',
+                rating=Decimal(self.rng.randint(30, 50)) / 10,
+                delivery_time=self.rng.choice([20, 25, 30, 35, 40, 45]),
+                delivery_fee=Decimal(self.rng.choice([0, 20, 30, 40, 50])),
+                is_open=self.rng.random() < 0.9,
+            )
+            for n in range(1, count + 1)
+        ]
+        return self.bulk_create(Restaurant, restaurants, 'restaurants')
+
+    def create_menu_items(self, restaurants, average):
+        items = []
+        for restaurant in restaurants:
+            for _ in range(self.rng.randint(max(1, average // 2), max(1, average * 3 // 2))):
+                items.append(MenuItem(
+                    restaurant=restaurant,
+                    name=f'{self.rng.choice(ADJECTIVES)} {self.rng.choice(DISHES)}',
+                    price=Decimal(self.rng.randrange(8000, 60000, 500)) / 100,
+                    category=self.rng.choice(CATEGORIES),
+                    is_available=self.rng.random() < 0.95,
+                ))
+        self.bulk_create(MenuItem, items, 'menu items')
+        # Per restaurant, in popularity rank order: (id, price)
+        menus = {restaurant.pk: [] for restaurant in restaurants}
+        for item in items:
+            menus[item.restaurant_id].append((item.pk, item.price))
+        return [menus[restaurant.pk] for restaurant in restaurants]
+
+    def create_customers(self, count, password):
+        users = self.create_users('customer', count, password)
+        customers = [
+            Customer(user=user, phone=f'+91{self.rng.randrange(10 ** 9, 10 ** 10)}',
+                     address=f'{self.rng.randint(1, 999)} {self.rng.choice(KITCHENS)} Road, Block {n % 50}')
+            for n, user in enumerate(users, 1)
+        ]
+        return self.bulk_create(Customer, customers, 'customers')
+
+    def create_orders(self, restaurants, menus, customers, options):
+        total = options['orders']
+        if not total:
+            return
+        restaurant_weights = zipf_cum_weights(len(restaurants), options['skew'])
+        customer_weights = zipf_cum_weights(len(customers), options['customer_skew'])
+        menu_weights = {}
+        span = timedelta(days=options['days']).total_seconds()
+        recent = self.end - timedelta(days=1)
+
+        progress = Progress(self.stdout, 'orders', total)
+        for start in range(0, total, self.chunk_size):
+            size = min(self.chunk_size, total - start)
+            restaurant_picks = self.rng.choices(range(len(restaurants)), cum_weights=restaurant_weights, k=size)
+            customer_picks = self.rng.choices(customers, cum_weights=customer_weights, k=size)
+
+            orders, lines = [], []
+            for restaurant_index, customer in zip(restaurant_picks, customer_picks):
+                restaurant, menu = restaurants[restaurant_index], menus[restaurant_index]
+                if len(menu) not in menu_weights:
+                    menu_weights[len(menu)] = zipf_cum_weights(len(menu), options['skew'])
+                picks = set(self.rng.choices(range(len(menu)), cum_weights=menu_weights[len(menu)],
+                                             k=self.rng.randint(1, options['max_items_per_order'])))
+                order_lines = [(menu[i][0], self.rng.choice((1, 1, 1, 2, 2, 3)), menu[i][1]) for i in picks]
+                created_at = self.end - timedelta(seconds=self.rng.random() * span)
+                orders.append(Order(
+                    customer=customer,
+                    restaurant=restaurant,
+                    # Total computed here instead of recalculate_total() per order
+                    total_amount=sum(qty * price for _, qty, price in order_lines) + restaurant.delivery_fee,
+                    status=self.rng.choice(OPEN_STATUSES if created_at > recent else CLOSED_STATUSES),
+                    delivery_address=customer.address,
+                    created_at=created_at,
+                ))
+                lines.append(order_lines)
+
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create(
+                    [
+                        OrderItem(order_id=order.pk, menu_item_id=menu_item_id, quantity=qty, price=price)
+                        for order, order_lines in zip(orders, lines)
+                        for menu_item_id, qty, price in order_lines
+                    ],
+                    batch_size=self.chunk_size,
+                )
+            progress.advance(size)
+        progress.finish()
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from foodfood.database import copy_sqlite_database
+from foodfood.routing import REPLICA
+
+
+class Command(BaseCommand):
+    help = 'Copy the default SQLite database onto the local read replica'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep copying every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between copies; keep below REPLICA_PIN_SECONDS')
+
+    def handle(self, *args, **options):
+        databases = settings.DATABASES
+        if REPLICA not in databases:
+            raise CommandError('No replica database configured; set DB_REPLICA_NAME')
+        if databases[REPLICA]['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('refresh_replica only copies SQLite databases')
+        while True:
+            start = time.monotonic()
+            pages = copy_sqlite_database(databases['default']['NAME'], databases[REPLICA]['NAME'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Replica refreshed: {pages} pages in {time.monotonic() - start:.2f}s'
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
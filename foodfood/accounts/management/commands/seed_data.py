@@ -4,9 +4,11 @@ from django.db import transaction
 from accounts.models import Customer, Vendor
 from restaurants.models import Restaurant, MenuItem
 from orders.models import Order, OrderItem
+from orders.analytics import record_order_sales, record_order_customer
 from decimal import Decimal
 import random
-from datetime import datetime, timedelta
+from datetime import timedelta
+from django.utils import timezone
 
 
 class Command(BaseCommand):
@@ -395,7 +397,7 @@ class Command(BaseCommand):
         total_orders = 0
         for order_data in orders_data:
             # Calculate order date
-            order_date = datetime.now() - timedelta(days=order_data['days_ago'])
+            order_date = timezone.now() - timedelta(days=order_data['days_ago'])
             
             # Get actual menu items
             restaurant = order_data['restaurant']
@@ -411,18 +413,21 @@ class Command(BaseCommand):
             )
             
             # Create order items
+            order_items = []
             for item_data in order_data['items']:
                 menu_item = menu_items.get(item_data['name'])
                 if menu_item:
-                    OrderItem.objects.create(
+                    order_items.append(OrderItem.objects.create(
                         order=order,
                         menu_item=menu_item,
                         quantity=item_data['quantity'],
                         price=menu_item.price
-                    )
+                    ))
             
             # Recalculate total
             order.recalculate_total()
+            record_order_sales(order, order_items)
+            record_order_customer(order)
             total_orders += 1
             
         self.stdout.write(f'Created {total_orders} orders')
\ No newline at end of file
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from foodfood.database import CHECKPOINT_MODES, optimize, wal_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'Checkpoint the SQLite WAL and refresh planner statistics; run periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=CHECKPOINT_MODES, default='PASSIVE',
+                            help='Checkpoint mode; TRUNCATE also shrinks the WAL file but waits for readers')
+        parser.add_argument('--skip-optimize', action='store_true')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, once every --interval seconds')
+        parser.add_argument('--interval', type=float, default=300.0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('sqlite_maintenance only applies to SQLite databases')
+        while True:
+            busy, wal_pages, checkpointed = wal_checkpoint(options['mode'])
+            if not options['skip_optimize']:
+                optimize()
+            message = (f'Checkpoint {options["mode"]}: {checkpointed}/{wal_pages} WAL pages written back'
+                       + (' (busy: readers still on older pages)' if busy else ''))
+            self.stdout.write(self.style.WARNING(message) if busy else self.style.SUCCESS(message))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,49 @@
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from foodfood.startup import startup_profile
+
+
+class Command(BaseCommand):
+    help = 'Measure worker startup in a fresh interpreter, break its import time down, check the budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help='Number of packages and modules listed')
+        parser.add_argument('--budget-ms', type=float, default=None,
+                            help='Fail above this total startup time (default: STARTUP_BUDGET_MS)')
+
+    def handle(self, *args, **options):
+        budget = options['budget_ms'] if options['budget_ms'] is not None else \
+            getattr(settings, 'STARTUP_BUDGET_MS', None)
+        try:
+            phases, entries = startup_profile(settings.BASE_DIR, os.environ['DJANGO_SETTINGS_MODULE'])
+        except RuntimeError as exc:
+            raise CommandError(f'Startup failed: {exc}')
+
+        by_package = defaultdict(int)
+        for module, self_us, _, _ in entries:
+            by_package[module.split('.')[0]] += self_us
+        import_ms = sum(by_package.values()) / 1000
+
+        self.stdout.write(
+            f"Startup: setup {phases['setup_ms']} ms, application {phases['application_ms']} ms, "
+            f"warm-up {phases['warmup_ms']} ms, total {phases['total_ms']} ms"
+            + (f" (budget {budget:g} ms)" if budget else '')
+        )
+        self.stdout.write(f'Imports: {len(entries)} modules, {import_ms:.1f} ms including interpreter startup')
+
+        self.stdout.write('\nImport time by top-level package (self time of all its modules):')
+        for package, total_us in sorted(by_package.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {package:<40}{total_us / 1000:>9.1f} ms')
+
+        self.stdout.write('\nSlowest modules (self time, cumulative):')
+        for module, self_us, cumulative_us, _ in sorted(entries, key=lambda entry: -entry[1])[:options['top']]:
+            self.stdout.write(f'  {module:<40}{self_us / 1000:>9.1f} ms{cumulative_us / 1000:>9.1f} ms')
+
+        if budget and phases['total_ms'] > budget:
+            raise CommandError(f"Startup took {phases['total_ms']} ms, over the {budget:g} ms budget")
+        if budget:
+            self.stdout.write(self.style.SUCCESS(f'\nWithin the {budget:g} ms startup budget'))
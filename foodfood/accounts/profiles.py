@@ -0,0 +1,51 @@
+from django.core.cache import cache
+
+from .models import Customer
+
+PROFILE_CACHE_KEY = "customer-profile:{user_id}"
+# The default cache is per process: an edit only invalidates the worker that saved
+# it, the others serve the old profile for at most this many seconds
+PROFILE_CACHE_TIMEOUT = 10
+_NO_PROFILE = "none"
+
+
+def get_customer_profile(user, create=False, cached=True):
+    """Return the Customer profile of user, or None if there is none.
+
+    Lookups are memoized on the user object for the request and cached for a few
+    seconds across requests; saving or deleting the Customer drops the cached entry. With create=True
+    a missing profile is created, which should only be needed for accounts made
+    before signup created profiles. Write paths pass cached=False: the cached profile
+    may predate an edit made through another worker.
+    """
+    if user is None or not user.is_authenticated:
+        return None
+    profile = getattr(user, "_customer_profile_cache", None) if cached else None
+    if profile is not None:
+        return profile
+
+    key = PROFILE_CACHE_KEY.format(user_id=user.pk)
+    entry = cache.get(key) if cached else None
+    if entry == _NO_PROFILE:
+        profile = None
+    elif entry is not None:
+        profile = entry
+    else:
+        profile = Customer.objects.filter(user=user).first()
+        cache.set(key, profile if profile is not None else _NO_PROFILE, PROFILE_CACHE_TIMEOUT)
+
+    if profile is None and create:
+        profile, _ = Customer.objects.get_or_create(user=user)
+    if profile is not None:
+        user._customer_profile_cache = profile
+    return profile
+
+
+def warm_customer_profile(user):
+    """Load the profile of user into the cache, used right after login."""
+    cache.delete(PROFILE_CACHE_KEY.format(user_id=user.pk))
+    return get_customer_profile(user)
+
+
+def invalidate_customer_profile(user_id):
+    cache.delete(PROFILE_CACHE_KEY.format(user_id=user_id))
@@ -0,0 +1,59 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+ROLE_CACHE_KEY = "user-role:{user_id}"
+# The default cache is per process: a role change only invalidates the worker that
+# saved it, the others pick it up within this many seconds
+ROLE_CACHE_TIMEOUT = 30
+
+
+class UserRole:
+    """Profiles attached to a user: customer, vendor, both or neither."""
+
+    def __init__(self, customer_id=None, vendor_id=None):
+        self.customer_id = customer_id
+        self.vendor_id = vendor_id
+
+    @property
+    def is_customer(self):
+        return self.customer_id is not None
+
+    @property
+    def is_vendor(self):
+        return self.vendor_id is not None
+
+    def __repr__(self):
+        return f"UserRole(customer_id={self.customer_id}, vendor_id={self.vendor_id})"
+
+
+ANONYMOUS_ROLE = UserRole()
+
+
+def get_user_role(user):
+    """Resolve the role of user, at most once per request and once per cache lifetime.
+
+    The result is memoized on the user object and shared across requests through the
+    cache; saving or deleting a Customer or Vendor drops the cached entry.
+    """
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS_ROLE
+    role = getattr(user, "_user_role_cache", None)
+    if role is not None:
+        return role
+
+    key = ROLE_CACHE_KEY.format(user_id=user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = (
+            User.objects.filter(pk=user.pk)
+            .values_list("customer_profile__id", "vendor_profile__id")
+            .first()
+        ) or (None, None)
+        cache.set(key, ids, ROLE_CACHE_TIMEOUT)
+    role = UserRole(customer_id=ids[0], vendor_id=ids[1])
+    user._user_role_cache = role
+    return role
+
+
+def invalidate_user_role(user_id):
+    cache.delete(ROLE_CACHE_KEY.format(user_id=user_id))
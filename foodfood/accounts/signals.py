@@ -0,0 +1,44 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from foodfood.instrumentation import instrument_connection
+from foodfood.slowqueries import install_slow_query_log
+from orders.models import Order
+from restaurants.models import Restaurant
+from .dashboard import invalidate_dashboard
+from .models import Customer, Vendor
+from .profiles import invalidate_customer_profile, warm_customer_profile
+from .roles import invalidate_user_role
+
+connection_created.connect(install_slow_query_log, dispatch_uid="slow-query-log")
+connection_created.connect(instrument_connection, dispatch_uid="request-sql-timer")
+
+
+@receiver([post_save, post_delete], sender=Order)
+def invalidate_vendor_dashboard(sender, instance, **kwargs):
+    """Any change to an order invalidates the dashboard of the vendor owning it."""
+    vendor_id = (
+        Restaurant.objects.filter(pk=instance.restaurant_id)
+        .values_list("vendor_id", flat=True)
+        .first()
+    )
+    if vendor_id is not None:
+        invalidate_dashboard(vendor_id)
+
+
+@receiver([post_save, post_delete], sender=Customer)
+@receiver([post_save, post_delete], sender=Vendor)
+def invalidate_role(sender, instance, **kwargs):
+    invalidate_user_role(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_profile(sender, instance, **kwargs):
+    invalidate_customer_profile(instance.user_id)
+
+
+@receiver(user_logged_in)
+def warm_profile_on_login(sender, request, user, **kwargs):
+    warm_customer_profile(user)
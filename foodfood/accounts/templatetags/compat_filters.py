@@ -1,5 +1,5 @@
 from django import template
-from accounts.models import Vendor
+from accounts.roles import get_user_role
 
 register = template.Library()
 
@@ -25,12 +25,9 @@ def length_is(value, arg):
 
 @register.simple_tag
 def is_vendor(user):
-    """Check if user is a vendor"""
+    """Check if user is a vendor (served from the cached user role)"""
     if not user or not user.is_authenticated:
         return False
-    try:
-        return Vendor.objects.filter(user=user).exists()
-    except:
-        return False
+    return get_user_role(user).is_vendor
 
 
@@ -1,3 +1,762 @@
-from django.test import TestCase
+import csv
+import json
+import logging
+import os
+import runpy
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, alogin, alogout, authenticate
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from foodfood.benchmark import compare, percentile
+from foodfood.cache import DatabaseCache
+from foodfood.database import database_status, wal_checkpoint
+from foodfood.executors import run_bounded
+from foodfood.log import QueueFileHandler, SamplingFilter
+from foodfood.proxies import client_ip
+from foodfood.routing import PIN_COOKIE, REPLICA, ReplicaRouter, ReplicaRoutingMiddleware, read_from, read_replica
+from foodfood.sessions import CompactSerializer, SessionStore
+from foodfood.slowqueries import install_slow_query_log
+from foodfood.startup import parse_importtime
+from foodfood.testing import MarketplaceData, QueryBudgetTestCase
+from orders.models import Order
+from restaurants.models import Restaurant
+
+from . import dashboard
+from .exports import CSV_HEADER
+from .models import Customer, Vendor
+from .profiles import get_customer_profile
+from .roles import get_user_role
+from .checks import check_throttle_cache
+from .throttle import (
+    THROTTLE_CACHE_ALIAS, check_login_throttle, reset_login_throttle, throttle_cache, throttle_metrics,
+)
+
+
+class VendorQueryBudgetTests(QueryBudgetTestCase):
+    def test_profile(self):
+        self.assertQueryBudget(reverse('profile'), 3, user=self.data.customer_user)
+
+    def test_vendor_dashboard(self):
+        self.assertQueryBudget(reverse('vendor-dashboard'), 6, user=self.data.vendor_user)
+
+    def test_vendor_dashboard_cold(self):
+        self.assertQueryBudget(reverse('vendor-dashboard'), 29, user=self.data.vendor_user, warm=False)
+
+    def test_vendor_orders(self):
+        self.assertQueryBudget(reverse('vendor-orders'), 8, user=self.data.vendor_user)
+
+    def test_vendor_menu(self):
+        self.assertQueryBudget(lambda: reverse('vendor-menu', args=[self.data.restaurants[-1].pk]), 5,
+                               user=self.data.vendor_user)
+
+
+class DashboardCacheTests(SimpleTestCase):
+    """Stale-while-revalidate caching of the vendor dashboard."""
+
+    def setUp(self):
+        # The shared cache is a database table here; the caching logic does not depend on it
+        patcher = mock.patch.object(dashboard, "shared_cache", LocMemCache("dashboard-tests", {}))
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache.clear()
+        self.vendor = SimpleNamespace(pk=1)
+
+    def age_entry(self, seconds):
+        key = dashboard.DASHBOARD_CACHE_KEY.format(vendor_id=self.vendor.pk)
+        entry = self.cache.get(key)
+        entry["computed_at"] -= seconds
+        self.cache.set(key, entry)
+
+    @mock.patch.object(dashboard, "compute_dashboard_context", side_effect=[{"n": 1}, {"n": 2}])
+    def test_fresh_hit(self, compute):
+        self.assertEqual(dashboard.get_dashboard_context(self.vendor), {"n": 1})
+        self.assertEqual(dashboard.get_dashboard_context(self.vendor), {"n": 1})
+        self.assertEqual(compute.call_count, 1)
+
+    @mock.patch.object(dashboard, "_refresh_in_background")
+    @mock.patch.object(dashboard, "compute_dashboard_context", return_value={"n": 1})
+    def test_stale_hit_triggers_refresh(self, compute, refresh):
+        dashboard.get_dashboard_context(self.vendor)
+        self.age_entry(dashboard._fresh_seconds() + 1)
+        # The stale entry is served while the refresh runs elsewhere
+        self.assertEqual(dashboard.get_dashboard_context(self.vendor), {"n": 1})
+        refresh.assert_called_once_with(self.vendor)
+        self.assertEqual(compute.call_count, 1)
+
+    @override_settings(VENDOR_DASHBOARD_BACKGROUND_REFRESH=False)
+    @mock.patch.object(dashboard, "compute_dashboard_context", side_effect=[{"n": 1}, {"n": 2}])
+    def test_stale_hit_refreshes_inline(self, compute):
+        dashboard.get_dashboard_context(self.vendor)
+        self.age_entry(dashboard._fresh_seconds() + 1)
+        self.assertEqual(dashboard.get_dashboard_context(self.vendor), {"n": 2})
+        self.assertIsNone(self.cache.get(dashboard.DASHBOARD_LOCK_KEY.format(vendor_id=self.vendor.pk)))
+
+    @mock.patch.object(dashboard, "_refresh_in_background")
+    @mock.patch.object(dashboard, "compute_dashboard_context", return_value={"n": 1})
+    def test_single_refresher(self, compute, refresh):
+        dashboard.get_dashboard_context(self.vendor)
+        self.age_entry(dashboard._fresh_seconds() + 1)
+        for _ in range(3):
+            dashboard.get_dashboard_context(self.vendor)
+        refresh.assert_called_once()
+        # Once the refresher releases the lock, the next stale hit may refresh again
+        self.cache.delete(dashboard.DASHBOARD_LOCK_KEY.format(vendor_id=self.vendor.pk))
+        dashboard.get_dashboard_context(self.vendor)
+        self.assertEqual(refresh.call_count, 2)
+
+    @mock.patch.object(dashboard, "compute_dashboard_context", return_value={"n": 1})
+    def test_background_refresh_releases_lock(self, compute):
+        lock_key = dashboard.DASHBOARD_LOCK_KEY.format(vendor_id=self.vendor.pk)
+        self.cache.add(lock_key, 1)
+        dashboard._refresh_in_background(self.vendor).join()
+        self.assertIsNone(self.cache.get(lock_key))
+        self.assertEqual(self.cache.get(dashboard.DASHBOARD_CACHE_KEY.format(vendor_id=self.vendor.pk))["context"],
+                         {"n": 1})
+
+
+
+class DashboardSharedCacheTests(TestCase):
+    @mock.patch.object(dashboard, "compute_dashboard_context", side_effect=[{"n": 1}, {"n": 2}])
+    def test_invalidation_reaches_every_process(self, compute):
+        vendor = SimpleNamespace(pk=1)
+        workers = [DatabaseCache("foodfood_shared_cache", {}) for _ in range(2)]
+        with mock.patch.object(dashboard, "shared_cache", workers[0]):
+            self.assertEqual(dashboard.get_dashboard_context(vendor), {"n": 1})
+        with mock.patch.object(dashboard, "shared_cache", workers[1]):
+            self.assertEqual(dashboard.get_dashboard_context(vendor), {"n": 1})
+            dashboard.invalidate_dashboard(vendor.pk)
+        with mock.patch.object(dashboard, "shared_cache", workers[0]):
+            self.assertEqual(dashboard.get_dashboard_context(vendor), {"n": 2})
+
+class UserRoleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("role_user", password="pass12345")
+
+    def test_role_is_resolved_once(self):
+        with self.assertNumQueries(1):
+            self.assertFalse(get_user_role(self.user).is_vendor)
+            get_user_role(self.user)
+        # Another request gets a fresh user object, served from the cache
+        user = User(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(get_user_role(user).is_customer)
+
+    def test_profile_change_invalidates_role(self):
+        get_user_role(self.user)
+        Vendor.objects.create(user=self.user, restaurant_name="Role Foods")
+        self.assertTrue(get_user_role(User(pk=self.user.pk)).is_vendor)
+
+    def test_smart_redirect(self):
+        self.client.force_login(self.user)
+        self.assertRedirects(self.client.get(reverse('smart-redirect')), reverse('menu-list'),
+                             fetch_redirect_response=False)
+        Vendor.objects.create(user=self.user, restaurant_name="Role Foods")
+        self.assertRedirects(self.client.get(reverse('smart-redirect')), reverse('vendor-dashboard'),
+                             fetch_redirect_response=False)
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    def test_queue_handler_writes_json_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "test.log"
+            handler = QueueFileHandler(path)
+            logger = logging.getLogger("foodfood.tests.queue")
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            try:
+                logger.info("login %s", "failed", extra={"username": "alice"})
+            finally:
+                logger.removeHandler(handler)
+                # Stopping the listener flushes the queue
+                handler.close()
+            record = json.loads(path.read_text().splitlines()[-1])
+        self.assertEqual(record["message"], "login failed")
+        self.assertEqual(record["username"], "alice")
+        self.assertEqual(record["level"], "INFO")
+
+    @skipUnless(hasattr(os, "fork"), "needs fork()")
+    def test_queue_handler_survives_fork(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "test.log"
+            handler = QueueFileHandler(path)
+            record = logging.makeLogRecord({"msg": "from %s", "levelno": logging.INFO})
+            try:
+                pid = os.fork()
+                if pid == 0:
+                    # The child's listener thread was started again after the fork
+                    record.args = ("child",)
+                    handler.handle(record)
+                    handler.close()
+                    os._exit(0)
+                os.waitpid(pid, 0)
+                record.args = ("parent",)
+                handler.handle(record)
+            finally:
+                handler.close()
+            messages = [json.loads(line)["message"] for line in path.read_text().splitlines()]
+        self.assertEqual(sorted(messages), ["from child", "from parent"])
+
+    def test_sampling_filter(self):
+        sampling = SamplingFilter({"INFO": 0.25})
+        info = logging.makeLogRecord({"levelno": logging.INFO})
+        warning = logging.makeLogRecord({"levelno": logging.WARNING})
+        with mock.patch("foodfood.log.random.random", return_value=0.5):
+            self.assertFalse(sampling.filter(info))
+            self.assertTrue(sampling.filter(warning))
+        with mock.patch("foodfood.log.random.random", return_value=0.1):
+            self.assertTrue(sampling.filter(info))
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        throttle_cache.clear()
+        User.objects.create_user("login_user", password="pass12345")
+
+    def test_failed_login_authenticates_once(self):
+        with mock.patch("django.contrib.auth.forms.authenticate", wraps=authenticate) as spy:
+            response = self.client.post(reverse('login'), {'username': 'login_user', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(spy.call_count, 1)
+
+    def test_login(self):
+        response = self.client.post(reverse('login'), {'username': 'login_user', 'password': 'pass12345'})
+        self.assertRedirects(response, reverse('smart-redirect'), fetch_redirect_response=False)
+
+
+@override_settings(LOGIN_THROTTLE={'username': {'limit': 3, 'window_seconds': 60}})
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        throttle_cache.clear()
+        # Start at the beginning of a window
+        self.now = 600.0
+
+    def attempt(self, username="alice"):
+        with mock.patch("accounts.throttle.time", **{"time.return_value": self.now}):
+            return check_login_throttle(username, None)
+
+    def test_limit(self):
+        before = throttle_metrics()
+        self.assertEqual([self.attempt() for _ in range(3)], [0, 0, 0])
+        self.assertEqual(self.attempt(), 80)
+        # Buckets are per username
+        self.assertEqual(self.attempt("bob"), 0)
+        after = throttle_metrics()
+        self.assertEqual({outcome: after[outcome] - before[outcome] for outcome in after},
+                         {'allowed': 4, 'rejected': 1})
+
+    def test_window_slides(self):
+        for _ in range(3):
+            self.attempt()
+        # Half of the previous window still counts: 1.5 attempts
+        self.now += 90
+        self.assertEqual(self.attempt(), 0)
+        self.assertGreater(self.attempt(), 0)
+        self.now += 30
+        self.assertEqual(self.attempt(), 0)
+
+    def test_retry_after_is_honoured(self):
+        for _ in range(3):
+            self.attempt()
+        self.now += 30
+        retry_after = self.attempt()
+        self.now += retry_after - 1
+        self.assertGreater(self.attempt(), 0)
+        self.now += 1
+        self.assertEqual(self.attempt(), 0)
+
+    def test_reset(self):
+        for _ in range(3):
+            self.attempt()
+        with mock.patch("accounts.throttle.time", **{"time.return_value": self.now}):
+            reset_login_throttle("Alice")
+        self.assertEqual(self.attempt(), 0)
+
+    def test_rejection_without_queries(self):
+        for _ in range(3):
+            self.attempt()
+        with self.assertNumQueries(0):
+            self.assertGreater(self.attempt(), 0)
+
+    def test_database_cache_is_refused(self):
+        self.assertEqual(check_throttle_cache(None), [])
+        database_cache = DatabaseCache(settings.CACHES['shared']['LOCATION'], {})
+        with mock.patch("accounts.checks.caches", {THROTTLE_CACHE_ALIAS: database_cache}):
+            self.assertEqual([error.id for error in check_throttle_cache(None)], ['accounts.E001'])
+
+
+class ClientIPTests(SimpleTestCase):
+    factory = RequestFactory()
+
+    def request(self, remote_addr, forwarded=None):
+        headers = {'x-forwarded-for': forwarded} if forwarded else {}
+        return self.factory.get('/', REMOTE_ADDR=remote_addr, headers=headers)
+
+    def test_header_ignored_without_trusted_proxies(self):
+        self.assertEqual(client_ip(self.request('203.0.113.7', '198.51.100.1')), '203.0.113.7')
+
+    @override_settings(TRUSTED_PROXIES=['127.0.0.1', '10.0.0.0/8'])
+    def test_trusted_proxies(self):
+        self.assertEqual(client_ip(self.request('127.0.0.1', '198.51.100.1')), '198.51.100.1')
+        # A spoofed first hop is skipped: the nearest untrusted hop is the client
+        self.assertEqual(client_ip(self.request('127.0.0.1', '1.2.3.4, 198.51.100.1, 10.1.2.3')), '198.51.100.1')
+        # Untrusted peers cannot pick their address
+        self.assertEqual(client_ip(self.request('203.0.113.7', '198.51.100.1')), '203.0.113.7')
+        self.assertEqual(client_ip(self.request('127.0.0.1')), '127.0.0.1')
+
+
+class SessionStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user("session_user")
+
+    def setUp(self):
+        cache.clear()
+        self.session = SessionStore()
+        self.session['cart'] = {'items': {'1': 2}, 'restaurant_id': 1}
+        self.session.save()
+
+    def stored(self):
+        """The session as held by the database, bypassing the cache."""
+        return DBSessionStore(self.session.session_key).load()
+
+    def test_changes_reach_the_database(self):
+        self.assertEqual(self.stored()['cart'], {'items': {'1': 2}, 'restaurant_id': 1})
+        session = SessionStore(self.session.session_key)
+        session['cart'] = {'items': {}, 'restaurant_id': None}
+        session.save()
+        self.assertEqual(self.stored()['cart'], {'items': {}, 'restaurant_id': None})
+
+    def test_one_write_per_change_without_redis(self):
+        session = SessionStore(self.session.session_key)
+        session['cart'] = {'items': {'3': 1}, 'restaurant_id': 1}
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+        writes = [query['sql'] for query in queries if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('django_session', writes[0])
+
+    def test_unchanged_session_is_not_written(self):
+        session = SessionStore(self.session.session_key)
+        session['cart'] = dict(session['cart'])
+        session.modified = True
+        with self.assertNumQueries(0):
+            session.save()
+
+    # The per-process default cache stands in for Redis
+    @override_settings(SESSION_CACHE_ALIAS='default')
+    def test_falls_back_to_the_database(self):
+        self.assertEqual(SessionStore(self.session.session_key)['cart']['items'], {'1': 2})
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError):
+            self.assertEqual(SessionStore(self.session.session_key)['cart']['items'], {'1': 2})
+
+    @override_settings(SESSION_CACHE_ALIAS='default')
+    def test_cache_failure_does_not_lose_changes(self):
+        session = SessionStore(self.session.session_key)
+        session['cart'] = {'items': {'2': 1}, 'restaurant_id': 1}
+        with mock.patch.object(cache, 'set', side_effect=ConnectionError), \
+                self.assertLogs('django.contrib.sessions', 'ERROR'):
+            session.save()
+        self.assertEqual(self.stored()['cart']['items'], {'2': 1})
+
+    # A database cache is synchronous only, as the shared cache is without Redis
+    @override_settings(SESSION_CACHE_ALIAS='shared')
+    async def test_async_login(self):
+        user = await User.objects.aget(username="session_user")
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        await request.session.aset('cart', {'items': {}, 'restaurant_id': None})
+        await alogin(request, user)
+        self.assertEqual(await request.session.aget(SESSION_KEY), str(user.pk))
+        self.assertTrue(await request.session.aexists(request.session.session_key))
+        await alogout(request)
+        self.assertIsNone(await request.session.aget(SESSION_KEY))
+
+    def test_reads_json_sessions(self):
+        self.assertEqual(CompactSerializer().loads(b'{"cart": null}'), {'cart': None})
+        serializer = CompactSerializer()
+        self.assertEqual(serializer.loads(serializer.dumps({'a': [1, 'b']})), {'a': [1, 'b']})
+
+
+class CustomerProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("profile_user", password="pass12345")
+
+    def test_cached_lookup(self):
+        customer = Customer.objects.create(user=self.user, phone="9999999999")
+        self.assertEqual(get_customer_profile(self.user), customer)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_customer_profile(User(pk=self.user.pk)), customer)
+
+    def test_missing_profile(self):
+        self.assertIsNone(get_customer_profile(self.user))
+        # The absence is cached too, until a profile is created
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_customer_profile(User(pk=self.user.pk)))
+        customer = get_customer_profile(User(pk=self.user.pk), create=True)
+        self.assertEqual(get_customer_profile(User(pk=self.user.pk)), customer)
+
+    def test_edit_invalidates(self):
+        customer = Customer.objects.create(user=self.user, phone="9999999999", address="Old Street")
+        get_customer_profile(self.user)
+        customer.address = "New Street"
+        customer.save()
+        self.assertEqual(get_customer_profile(User(pk=self.user.pk)).address, "New Street")
+
+    def test_entries_expire_within_seconds(self):
+        Customer.objects.create(user=self.user, phone="9999999999")
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            get_customer_profile(self.user)
+        self.assertLessEqual(cache_set.call_args.args[2], 10)
+
+
+@override_settings(METRICS_TOKEN='metrics-secret', METRICS_ALLOWED_IPS=['198.51.100.1'])
+class MonitoringAccessTests(TestCase):
+    def test_metrics_require_a_monitoring_client(self):
+        # The test client comes from 127.0.0.1, like every request behind a local proxy
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), headers={'authorization': 'Bearer wrong'}).status_code,
+                         403)
+        self.assertEqual(self.client.get(reverse('metrics'), headers={'authorization': 'Bearer metrics-secret'})
+                         .status_code, 200)
+
+    def test_allowed_ips_go_through_trusted_proxies(self):
+        forwarded = {'x-forwarded-for': '198.51.100.1'}
+        self.assertEqual(self.client.get(reverse('metrics'), headers=forwarded).status_code, 403)
+        with override_settings(TRUSTED_PROXIES=['127.0.0.1']):
+            self.assertEqual(self.client.get(reverse('metrics'), headers=forwarded).status_code, 200)
+
+    def test_staff(self):
+        self.client.force_login(User.objects.create_user("staff_user", is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_server_timing_breakdown(self):
+        timing = self.client.get(reverse('login'))['Server-Timing']
+        self.assertTrue(timing.startswith('app;dur='))
+        self.assertNotIn('db;', timing)
+        timing = self.client.get(reverse('login'), headers={'authorization': 'Bearer metrics-secret'})['Server-Timing']
+        self.assertIn('db;dur=', timing)
+
+    async def test_server_timing_breakdown_under_asgi(self):
+        response = await self.async_client.get(reverse('menu-list'))
+        self.assertNotIn('db;', response['Server-Timing'])
+        response = await self.async_client.get(reverse('menu-list'), headers={'authorization': 'Bearer metrics-secret'})
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_disallowed_host(self):
+        response = self.client.get(reverse('login'), HTTP_HOST='evil.example')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('db;', response['Server-Timing'])
+
+    async def test_disallowed_host_under_asgi(self):
+        response = await self.async_client.get(reverse('menu-list'), headers={'host': 'evil.example'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_database_health_details(self):
+        self.assertEqual(self.client.get(reverse('database-health')).json(), {'status': 'ok'})
+        status = self.client.get(reverse('database-health'), headers={'authorization': 'Bearer metrics-secret'}).json()
+        self.assertEqual(status['vendor'], 'sqlite')
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+    baseline = {'menu-list': {'p50_ms': 10.0, 'p95_ms': 20.0, 'throughput_rps': 100.0, 'errors': 0}}
+
+    def test_percentile(self):
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 95), 4)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_regressions_beyond_threshold(self):
+        results = {'menu-list': {'p50_ms': 11.0, 'p95_ms': 30.0, 'throughput_rps': 70.0, 'errors': 1},
+                   'cart': {'p50_ms': 500.0, 'p95_ms': 900.0, 'throughput_rps': 1.0, 'errors': 3}}
+        self.assertEqual(compare(results, self.baseline), [
+            ('menu-list', 'p95_ms', 20.0, 30.0),
+            ('menu-list', 'throughput_rps', 100.0, 70.0),
+            ('menu-list', 'errors', 0, 1),
+        ])
+        self.assertEqual(compare(results, self.baseline, threshold=0.5), [('menu-list', 'errors', 0, 1)])
+
+
+class GenerateDataTests(TestCase):
+    options = dict(restaurants=4, items_per_restaurant=6, customers=5, orders=30, restaurants_per_vendor=2,
+                   end_date='2026-01-31', skip_analytics=True, stdout=StringIO())
+
+    def snapshot(self):
+        return list(Order.objects.filter(customer__user__username__startswith='gen_')
+                    .order_by('created_at', 'total_amount')
+                    .values_list('restaurant__slug', 'customer__user__username', 'total_amount', 'status'))
+
+    def test_counts(self):
+        call_command('generate_data', **self.options)
+        self.assertEqual(Vendor.objects.filter(user__username__startswith='gen_').count(), 2)
+        self.assertEqual(Restaurant.objects.filter(slug__startswith='gen-').count(), 4)
+        self.assertEqual(Customer.objects.filter(user__username__startswith='gen_').count(), 5)
+        self.assertEqual(Order.objects.filter(customer__user__username__startswith='gen_').count(), 30)
+        self.assertFalse(Order.objects.filter(items__isnull=True).exists())
+
+    def test_same_seed_same_data(self):
+        call_command('generate_data', **self.options)
+        first = self.snapshot()
+        with self.assertRaises(CommandError):
+            call_command('generate_data', **self.options)
+        call_command('generate_data', clear=True, **self.options)
+        self.assertEqual(self.snapshot(), first)
+
+
+class SlowQuerySettingsTests(SimpleTestCase):
+    def threshold(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            if 'SLOW_QUERY_THRESHOLD_MS' not in environ:
+                os.environ.pop('SLOW_QUERY_THRESHOLD_MS', None)
+            return runpy.run_path(Path(settings.BASE_DIR) / 'foodfood' / 'settings.py')['SLOW_QUERY_THRESHOLD_MS']
+
+    def test_threshold_from_environment(self):
+        self.assertEqual(self.threshold(), 100)
+        self.assertEqual(self.threshold(SLOW_QUERY_THRESHOLD_MS='250'), 250)
+        self.assertIsNone(self.threshold(SLOW_QUERY_THRESHOLD_MS=''))
+        self.assertIsNone(self.threshold(SLOW_QUERY_THRESHOLD_MS='None'))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=None)
+    def test_none_disables_the_hook(self):
+        connection = SimpleNamespace(execute_wrappers=[])
+        install_slow_query_log(sender=None, connection=connection)
+        self.assertEqual(connection.execute_wrappers, [])
+
+
+class StartupReportTests(SimpleTestCase):
+    importtime = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       812 |        812 |   _io\n"
+        "import time:      1520 |       2104 |     django.utils.version\n"
+        "import time:       240 |      12480 | django\n"
+        "Traceback lines and warnings are ignored\n"
+    )
+    phases = {'setup_ms': 120.0, 'application_ms': 80.0, 'warmup_ms': 40.0, 'total_ms': 240.0}
+
+    def report(self, **options):
+        entries = parse_importtime(self.importtime)
+        stdout = StringIO()
+        with mock.patch('accounts.management.commands.startup_report.startup_profile',
+                        return_value=(self.phases, entries)):
+            call_command('startup_report', stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_parse_importtime(self):
+        self.assertEqual(parse_importtime(self.importtime), [
+            ('_io', 812, 812, 1),
+            ('django.utils.version', 1520, 2104, 2),
+            ('django', 240, 12480, 0),
+        ])
+
+    @override_settings(STARTUP_BUDGET_MS=300)
+    def test_within_budget(self):
+        output = self.report()
+        self.assertIn('total 240.0 ms (budget 300 ms)', output)
+        self.assertIn('Within the 300 ms startup budget', output)
+        # Self time summed per top-level package
+        self.assertRegex(output, r'django\s+1\.8 ms')
+
+    @override_settings(STARTUP_BUDGET_MS=200)
+    def test_over_budget(self):
+        with self.assertRaisesMessage(CommandError, 'over the 200 ms budget'):
+            self.report()
+        self.report(budget_ms=500)
+
+    def test_child_interpreter_failure(self):
+        with mock.patch('accounts.management.commands.startup_report.startup_profile',
+                        side_effect=RuntimeError('ImportError: no module named redis')):
+            with self.assertRaisesMessage(CommandError, 'Startup failed: ImportError'):
+                call_command('startup_report', stdout=StringIO())
+
+
+class DatabaseStatusTests(TestCase):
+    def test_pragmas_in_effect(self):
+        status = database_status()
+        self.assertEqual(status['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(status['pragmas']['busy_timeout'], settings.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(status['pragmas']['cache_size'], settings.SQLITE_PRAGMAS['cache_size'])
+        # synchronous=NORMAL and temp_store=MEMORY read back as numbers
+        self.assertEqual(status['pragmas']['synchronous'], 1)
+        self.assertEqual(status['pragmas']['temp_store'], 2)
+
+    def test_unknown_checkpoint_mode(self):
+        with self.assertRaises(ValueError):
+            wal_checkpoint('EVERYTHING')
+
+    def test_unhealthy_database(self):
+        with mock.patch('foodfood.database.database_status', side_effect=OperationalError('database is locked')):
+            response = self.client.get(reverse('database-health'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'status': 'error', 'error': ''})
+
+
+@mock.patch('foodfood.routing.replica_configured', return_value=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    cache_model = DatabaseCache('routing_cache', {}).cache_model_class
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, request, view, writes=()):
+        """Run view through the middleware; returns (read alias seen by the view, response)."""
+        seen = []
+
+        def get_response(request):
+            ReplicaRoutingMiddleware(None).process_view(request, view, (), {})
+            seen.append(self.router.db_for_read(Restaurant))
+            for model in writes:
+                self.router.db_for_write(model)
+            return HttpResponse()
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return seen[0], response.cookies
+
+    def test_marked_views_read_from_replica(self, _):
+        listing = read_replica(lambda request: None)
+        self.assertEqual(self.route(self.factory.get('/'), listing)[0], REPLICA)
+        self.assertIsNone(self.route(self.factory.post('/'), listing)[0])
+        self.assertIsNone(self.route(self.factory.get('/'), lambda request: None)[0])
+
+    def test_writes_pin_the_client_to_default(self, _):
+        listing = read_replica(lambda request: None)
+        cookies = self.route(self.factory.post('/'), listing, writes=[Order])[1]
+        self.assertIn(PIN_COOKIE, cookies)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = cookies[PIN_COOKIE].value
+        self.assertEqual(self.route(request, listing)[0], 'default')
+
+    def test_cache_tables_stay_on_default_and_do_not_pin(self, _):
+        with read_from(REPLICA):
+            self.assertEqual(self.router.db_for_read(Restaurant), REPLICA)
+            self.assertEqual(self.router.db_for_read(self.cache_model), 'default')
+        cookies = self.route(self.factory.get('/'), read_replica(lambda request: None), writes=[self.cache_model])[1]
+        self.assertNotIn(PIN_COOKIE, cookies)
+
+
+class BoundedHasherTests(TestCase):
+    def test_check_password_runs_in_the_hashing_pool(self):
+        user = User.objects.create_user("hashed_user", password="pass12345")
+        with mock.patch('foodfood.hashers.run_bounded', wraps=run_bounded) as bounded:
+            self.assertTrue(check_password("pass12345", user.password))
+        self.assertEqual(bounded.call_args.args[0], "hashing")
+
+
+class VendorOrdersExportTests(TestCase):
+    def setUp(self):
+        self.data = MarketplaceData()
+        self.data.grow(1)
+        self.old, self.recent = self.data.orders
+        Order.objects.filter(pk=self.old.pk).update(status=Order.STATUS_DELIVERED,
+                                                    created_at=timezone.now() - timedelta(days=10))
+        # Another vendor's order never shows up
+        other = Vendor.objects.create(user=User.objects.create_user("other_vendor"), restaurant_name="Other")
+        restaurant = Restaurant.objects.create(vendor=other, name="Other Kitchen")
+        self.other = Order.objects.create(customer=self.data.customer, restaurant=restaurant, delivery_address="x")
+        self.client.force_login(self.data.vendor_user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('vendor-orders-export'), params)
+        return response, b"".join(response.streaming_content).decode() if response.streaming else None
+
+    def test_csv(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(rows[0], CSV_HEADER)
+        # One row per order line, two lines per order
+        self.assertEqual([int(row[0]) for row in rows[1:]], [self.old.pk] * 2 + [self.recent.pk] * 2)
+        line = dict(zip(CSV_HEADER, rows[1]))
+        self.assertEqual(Decimal(line['line_total']), Decimal(line['unit_price']) * int(line['quantity']))
+
+    def test_jsonl(self):
+        response, body = self.export(format='jsonl')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        documents = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([document['order_id'] for document in documents], [self.old.pk, self.recent.pk])
+        self.assertEqual(len(documents[0]['items']), 2)
+
+    def test_filters(self):
+        since = (timezone.localdate() - timedelta(days=1)).isoformat()
+        body = self.export(format='jsonl', start=since)[1]
+        self.assertEqual([json.loads(line)['order_id'] for line in body.splitlines()], [self.recent.pk])
+        body = self.export(format='jsonl', status=Order.STATUS_DELIVERED)[1]
+        self.assertEqual([json.loads(line)['order_id'] for line in body.splitlines()], [self.old.pk])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.export(format='xml')[0].status_code, 400)
+        self.assertEqual(self.export(start='2026-13-01')[0].status_code, 400)
+        with self.assertRaises(CommandError):
+            call_command('export_vendor_orders', 'budget_vendor', start='yesterday', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('export_vendor_orders', 'budget_vendor', '--format=xml', stdout=StringIO())
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_vendor_orders', 'budget_vendor', format='jsonl', status=Order.STATUS_PENDING,
+                     stdout=out)
+        self.assertEqual([json.loads(line)['order_id'] for line in out.getvalue().splitlines()], [self.recent.pk])
+
+
+class VendorTimeseriesTests(TestCase):
+    day = timezone.make_aware(datetime(2026, 3, 10))
+
+    def setUp(self):
+        self.data = MarketplaceData()
+        self.data.grow(1)
+        first, second = self.data.orders
+        Order.objects.filter(pk=first.pk).update(created_at=self.day + timedelta(hours=9, minutes=5))
+        Order.objects.filter(pk=second.pk).update(created_at=self.day + timedelta(hours=9, minutes=50),
+                                                  status=Order.STATUS_DELIVERED)
+        self.revenue = first.total_amount + second.total_amount
+        self.client.force_login(self.data.vendor_user)
+
+    def series(self, **params):
+        return self.client.get(reverse('vendor-timeseries'), params)
+
+    def test_day_buckets_are_zero_filled(self):
+        points = self.series(start='2026-03-09', end='2026-03-11').json()['points']
+        self.assertEqual([point['orders'] for point in points], [0, 2, 0])
+        self.assertEqual(points[1]['start'], self.day.isoformat())
+        self.assertEqual(points[1]['revenue'], f"{self.revenue:.2f}")
+        self.assertEqual(points[0]['revenue'], "0.00")
+
+    def test_hour_buckets(self):
+        points = self.series(start='2026-03-10', end='2026-03-10', resolution='hour').json()['points']
+        self.assertEqual(len(points), 24)
+        self.assertEqual({n: point['orders'] for n, point in enumerate(points) if point['orders']}, {9: 2})
+        points = self.series(start='2026-03-10', end='2026-03-10', resolution='hour', status='delivered').json()
+        self.assertEqual(sum(point['orders'] for point in points['points']), 1)
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.series(resolution='minute').status_code, 400)
+        self.assertEqual(self.series(start='2026-03-11', end='2026-03-10').status_code, 400)
+        self.assertEqual(self.series(start='March').status_code, 400)
+
+    def test_point_cap(self):
+        # 42 days of hours is over the cap, 41 is not
+        self.assertEqual(self.series(start='2026-01-01', end='2026-02-11', resolution='hour').status_code, 400)
+        points = self.series(start='2026-01-01', end='2026-02-10', resolution='hour').json()['points']
+        self.assertEqual(len(points), 41 * 24)
+        self.assertLessEqual(len(points), dashboard.TIMESERIES_MAX_POINTS)
@@ -0,0 +1,101 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from foodfood.instrumentation import registry
+
+THROTTLE_CACHE_ALIAS = "throttle"
+WINDOW_CACHE_KEY = "login-throttle:{scope}:{ident}:{window}"
+METRIC = "foodfood_login_throttle_total"
+
+# Redis when REDIS_URL is set, else per process; never a database table (see checks.py)
+throttle_cache = ConnectionProxy(caches, THROTTLE_CACHE_ALIAS)
+
+DEFAULT_LOGIN_THROTTLE = {
+    # Attempts allowed per sliding window of window_seconds
+    'username': {'limit': 5, 'window_seconds': 300},
+    'ip': {'limit': 30, 'window_seconds': 60},
+}
+
+
+def _limits():
+    return getattr(settings, 'LOGIN_THROTTLE', DEFAULT_LOGIN_THROTTLE)
+
+
+def _window_key(scope, ident, window):
+    # Hash the identifier so arbitrary usernames make valid cache keys
+    digest = hashlib.sha1(ident.encode()).hexdigest()
+    return WINDOW_CACHE_KEY.format(scope=scope, ident=digest, window=window)
+
+
+def _incr(key, timeout):
+    # add() only creates a missing counter; incr() is atomic on Redis and LocMem
+    throttle_cache.add(key, 0, timeout)
+    try:
+        return throttle_cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        throttle_cache.set(key, 1, timeout)
+        return 1
+
+
+def _take(scope, ident, now):
+    """Count one attempt of ident; return seconds to wait if it is over the limit.
+
+    Sliding window approximated from two fixed windows: the attempts of the current
+    window plus those of the previous one, weighted by how much of it the sliding
+    window still covers. Rejected attempts are not counted.
+    """
+    limit = _limits()[scope]
+    allowed = limit['limit']
+    window = limit['window_seconds']
+    index, elapsed = divmod(now, window)
+    key = _window_key(scope, ident, int(index))
+    current = _incr(key, 2 * window)
+    previous = throttle_cache.get(_window_key(scope, ident, int(index) - 1), 0)
+    if current + previous * (1 - elapsed / window) <= allowed:
+        return 0
+    throttle_cache.decr(key)
+    taken = current - 1
+    if taken < allowed:
+        # Wait for the previous window to slide out enough
+        wait = window * (1 - (allowed - taken - 1) / previous) - elapsed
+    else:
+        # This window alone is full: wait into the next one
+        wait = window - elapsed + window * (1 - (allowed - 1) / taken)
+    return max(1, math.ceil(wait))
+
+
+def check_login_throttle(username, ip):
+    """Consume a login attempt for username and ip.
+
+    Returns 0 when the attempt may proceed, otherwise the number of seconds after which
+    the client should retry. With Redis the limits hold across worker processes;
+    either way a rejection costs no database query.
+    """
+    now = time.time()
+    limits = _limits()
+    retry_after = 0
+    if ip and 'ip' in limits:
+        retry_after = _take('ip', ip, now)
+    if not retry_after and username and 'username' in limits:
+        retry_after = _take('username', username.lower(), now)
+    registry.increment(METRIC, outcome='rejected' if retry_after else 'allowed')
+    return retry_after
+
+
+def reset_login_throttle(username):
+    """Forget the attempts of username after a successful login."""
+    limit = _limits().get('username')
+    if limit:
+        index = int(time.time() // limit['window_seconds'])
+        throttle_cache.delete_many([_window_key('username', username.lower(), window) for window in (index - 1, index)])
+
+
+def throttle_metrics():
+    """Allowed and rejected attempts counted by this process."""
+    return {outcome: registry.counter(METRIC, outcome=outcome) for outcome in ('allowed', 'rejected')}
@@ -1,87 +1,58 @@
 from django.shortcuts import render, redirect
-from django.contrib.auth import login, authenticate
+from django.contrib.auth import login
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView
-from django.utils.decorators import method_decorator
-from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
-from django.db.models import Count, Sum, Avg, Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, HttpResponseBadRequest
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import timedelta
 import logging
+from foodfood.proxies import client_ip
+from foodfood.routing import current_read_alias, read_replica
 from .forms import SignupForm, CustomerProfileForm, MenuItemForm
 from .models import Customer, Vendor
+from .profiles import get_customer_profile
+from .roles import get_user_role
+from .throttle import check_login_throttle, reset_login_throttle
+from .dashboard import get_dashboard_context, order_timeseries
+from .exports import EXPORT_FORMATS, parse_export_date, vendor_orders_queryset, iter_export
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
 
 
 class CustomLoginView(LoginView):
-    """Vue de connexion personnalisée avec logs détaillés"""
-    
-    def get(self, request, *args, **kwargs):
-        print("=== GET LOGIN PAGE ===")
-        logger.info("=== GET LOGIN PAGE ===")
-        return super().get(request, *args, **kwargs)
-    
+    """Login view: a single authenticate() per attempt, with structured logs"""
+
     def post(self, request, *args, **kwargs):
-        print("=== TENTATIVE DE CONNEXION ===")
-        print(f"Username reçu: '{request.POST.get('username', '')}'")
-        print(f"Password reçu: {'*' * len(request.POST.get('password', ''))}")
-        
-        logger.info(f"=== TENTATIVE DE CONNEXION ===")
-        logger.info(f"Username reçu: '{request.POST.get('username', '')}'")
-        logger.info(f"Password reçu: {'*' * len(request.POST.get('password', ''))}")
-        
-        # Vérifier si l'utilisateur existe
+        # Throttle before any password hashing or database work
         username = request.POST.get('username', '').strip()
-        password = request.POST.get('password', '')
-        
+        retry_after = check_login_throttle(username, client_ip(request))
+        if retry_after:
+            logger.warning("login throttled", extra={"username": username, "retry_after": retry_after})
+            response = HttpResponse("Too many login attempts. Please try again later.", status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
+        return super().post(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        user = form.get_user()
+        login(self.request, user)
+        reset_login_throttle(user.get_username())
+        logger.info("login succeeded", extra={"username": user.username, "user_id": user.pk})
+        messages.success(self.request, f"Welcome back, {user.first_name or user.username}!")
+        return redirect('smart-redirect')
+
+    def form_invalid(self, form):
+        username = self.request.POST.get('username', '').strip()
         if not username:
-            print("Username vide")
-            logger.warning("Username vide")
-            messages.error(request, "Username is required.")
-            return super().post(request, *args, **kwargs)
-            
-        if not password:
-            print("Password vide")
-            logger.warning("Password vide")
-            messages.error(request, "Password is required.")
-            return super().post(request, *args, **kwargs)
-        
-        # Vérifier si l'utilisateur existe dans la base
-        try:
-            from django.contrib.auth.models import User
-            user = User.objects.get(username=username)
-            print(f"Utilisateur trouvé: {user.username}, Active: {user.is_active}")
-            logger.info(f"Utilisateur trouvé: {user.username}, Active: {user.is_active}")
-        except User.DoesNotExist:
-            print(f"Utilisateur '{username}' n'existe pas")
-            logger.error(f"Utilisateur '{username}' n'existe pas")
-            messages.error(request, f"User '{username}' does not exist.")
-            return super().post(request, *args, **kwargs)
-        
-        # Tester l'authentification
-        print(f"Test d'authentification pour '{username}'")
-        logger.info(f"Test d'authentification pour '{username}'")
-        user = authenticate(username=username, password=password)
-        
-        if user is not None:
-            print(f"Authentification RÉUSSIE pour '{username}'")
-            print(f"User: {user.username}, Active: {user.is_active}, Staff: {user.is_staff}")
-            logger.info(f"Authentification RÉUSSIE pour '{username}'")
-            logger.info(f"User: {user.username}, Active: {user.is_active}, Staff: {user.is_staff}")
-            login(request, user)
-            messages.success(request, f"Welcome back, {user.first_name or user.username}!")
-            return redirect('smart-redirect')
+            messages.error(self.request, "Username is required.")
+        elif not self.request.POST.get('password'):
+            messages.error(self.request, "Password is required.")
         else:
-            print(f"Authentification ÉCHOUÉE pour '{username}'")
-            print("Mot de passe incorrect ou utilisateur inactif")
-            logger.error(f"Authentification ÉCHOUÉE pour '{username}'")
-            logger.error("Mot de passe incorrect ou utilisateur inactif")
-            messages.error(request, "Invalid username or password.")
-            return super().post(request, *args, **kwargs)
+            messages.error(self.request, "Invalid username or password.")
+        logger.warning("login failed", extra={"username": username})
+        return super().form_invalid(form)
 
 
 def signup_view(request):
@@ -102,7 +73,7 @@ def signup_view(request):
 
 @login_required
 def profile_view(request):
-    customer, _ = Customer.objects.get_or_create(user=request.user)
+    customer = get_customer_profile(request.user, create=True, cached=request.method != 'POST')
     if request.method == 'POST':
         form = CustomerProfileForm(request.POST, instance=customer, user=request.user)
         if form.is_valid():
@@ -124,166 +95,56 @@ def profile_view(request):
 @login_required
 def smart_redirect(request):
     """Redirect users based on their role after login"""
-    try:
-        if hasattr(request.user, 'vendor_profile') and request.user.vendor_profile:
-            return redirect('vendor-dashboard')
-    except Vendor.DoesNotExist:
-        pass
+    if get_user_role(request.user).is_vendor:
+        return redirect('vendor-dashboard')
     return redirect('menu-list')
 
 
+@read_replica
 @login_required
 def vendor_dashboard(request):
     """Vendor dashboard with comprehensive analytics"""
     try:
         vendor = Vendor.objects.get(user=request.user)
-        restaurants = vendor.restaurants.all()
-        
-        # Import models
-        from orders.models import Order, OrderItem
-        from restaurants.models import MenuItem
-        
-        # === ANALYTICS TEMPORELLES ===
-        now = timezone.now()
-        today = now.date()
-        week_ago = now - timedelta(days=7)
-        month_ago = now - timedelta(days=30)
-        
-        # Commandes par période
-        orders_today = Order.objects.filter(
-            restaurant__vendor=vendor,
-            created_at__date=today
-        )
-        orders_week = Order.objects.filter(
-            restaurant__vendor=vendor,
-            created_at__gte=week_ago
-        )
-        orders_month = Order.objects.filter(
-            restaurant__vendor=vendor,
-            created_at__gte=month_ago
-        )
-        
-        # === MÉTRIQUES FINANCIÈRES ===
-        revenue_today = orders_today.aggregate(total=Sum('total_amount'))['total'] or 0
-        revenue_week = orders_week.aggregate(total=Sum('total_amount'))['total'] or 0
-        revenue_month = orders_month.aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        # === MÉTRIQUES DE COMMANDES ===
-        orders_count_today = orders_today.count()
-        orders_count_week = orders_week.count()
-        orders_count_month = orders_month.count()
-        
-        # Panier moyen
-        avg_order_value_today = orders_today.aggregate(avg=Avg('total_amount'))['avg'] or 0
-        avg_order_value_week = orders_week.aggregate(avg=Avg('total_amount'))['avg'] or 0
-        avg_order_value_month = orders_month.aggregate(avg=Avg('total_amount'))['avg'] or 0
-        
-        # === ANALYTICS PAR RESTAURANT ===
-        restaurant_stats = []
-        for restaurant in restaurants:
-            restaurant_orders = Order.objects.filter(restaurant=restaurant)
-            restaurant_orders_month = restaurant_orders.filter(created_at__gte=month_ago)
-            
-            stats = {
-                'restaurant': restaurant,
-                'total_orders': restaurant_orders.count(),
-                'orders_this_month': restaurant_orders_month.count(),
-                'revenue_this_month': restaurant_orders_month.aggregate(total=Sum('total_amount'))['total'] or 0,
-                'avg_rating': restaurant.rating,
-                'is_open': restaurant.is_open,
-                'menu_items_count': restaurant.menu_items.count(),
-                'available_items': restaurant.menu_items.filter(is_available=True).count(),
-            }
-            restaurant_stats.append(stats)
-        
-        # === PLATS LES PLUS VENDUS ===
-        top_menu_items = OrderItem.objects.filter(
-            order__restaurant__vendor=vendor,
-            order__created_at__gte=month_ago
-        ).values(
-            'menu_item__name', 
-            'menu_item__restaurant__name'
-        ).annotate(
-            total_quantity=Sum('quantity'),
-            total_revenue=Sum('price')
-        ).order_by('-total_quantity')[:10]
-        
-        # === COMMANDES RÉCENTES ===
-        recent_orders = Order.objects.filter(
-            restaurant__vendor=vendor
-        ).order_by('-created_at')[:10]
-        
-        # === STATUTS DES COMMANDES ===
-        order_status_stats = Order.objects.filter(
-            restaurant__vendor=vendor,
-            created_at__gte=month_ago
-        ).values('status').annotate(count=Count('status'))
-        
-        # === TENDANCES HEBDOMADAIRES ===
-        weekly_data = []
-        for i in range(7):
-            date = today - timedelta(days=i)
-            day_orders = Order.objects.filter(
-                restaurant__vendor=vendor,
-                created_at__date=date
-            )
-            weekly_data.append({
-                'date': date,
-                'orders': day_orders.count(),
-                'revenue': day_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-            })
-        weekly_data.reverse()  # Du plus ancien au plus récent
-        
-        # === PERFORMANCE GÉNÉRALE ===
-        total_customers = Order.objects.filter(
-            restaurant__vendor=vendor
-        ).values('customer').distinct().count()
-        
-        repeat_customers = Order.objects.filter(
-            restaurant__vendor=vendor
-        ).values('customer').annotate(
-            order_count=Count('id')
-        ).filter(order_count__gt=1).count()
-        
-        customer_retention = (repeat_customers / total_customers * 100) if total_customers > 0 else 0
-        
-        context = {
-            'vendor': vendor,
-            'restaurants': restaurants,
-            'recent_orders': recent_orders,
-            
-            # Métriques temporelles
-            'revenue_today': revenue_today,
-            'revenue_week': revenue_week,
-            'revenue_month': revenue_month,
-            'orders_count_today': orders_count_today,
-            'orders_count_week': orders_count_week,
-            'orders_count_month': orders_count_month,
-            'avg_order_value_today': avg_order_value_today,
-            'avg_order_value_week': avg_order_value_week,
-            'avg_order_value_month': avg_order_value_month,
-            
-            # Analytics par restaurant
-            'restaurant_stats': restaurant_stats,
-            
-            # Plats populaires
-            'top_menu_items': top_menu_items,
-            
-            # Statuts des commandes
-            'order_status_stats': order_status_stats,
-            
-            # Tendances
-            'weekly_data': weekly_data,
-            
-            # Performance
-            'total_customers': total_customers,
-            'repeat_customers': repeat_customers,
-            'customer_retention': customer_retention,
-        }
-        return render(request, 'accounts/vendor_dashboard.html', context)
     except Vendor.DoesNotExist:
         messages.error(request, "You are not a registered vendor.")
         return redirect('restaurant-list')
+    context = get_dashboard_context(vendor)
+    return render(request, 'accounts/vendor_dashboard.html', context)
+
+
+@read_replica
+@login_required
+def vendor_timeseries(request):
+    """Order count and revenue series for the dashboard charts"""
+    try:
+        vendor = Vendor.objects.get(user=request.user)
+    except Vendor.DoesNotExist:
+        return JsonResponse({"error": "You are not a registered vendor."}, status=403)
+
+    today = timezone.localdate()
+    try:
+        end = parse_export_date(request.GET.get('end')) or today
+        start = parse_export_date(request.GET.get('start')) or end - timedelta(days=29)
+        restaurant_id = int(request.GET['restaurant']) if request.GET.get('restaurant') else None
+        resolution = request.GET.get('resolution', 'day')
+        series = order_timeseries(
+            vendor, start, end, resolution,
+            restaurant_id=restaurant_id,
+            status=request.GET.get('status') or None,
+        )
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return JsonResponse({
+        "resolution": resolution,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "points": [
+            {"start": point['start'].isoformat(), "orders": point['orders'], "revenue": f"{point['revenue']:.2f}"}
+            for point in series
+        ],
+    })
 
 
 @login_required
@@ -332,7 +193,7 @@ def vendor_orders(request):
     # Get all orders for vendor's restaurants
     orders = Order.objects.filter(
         restaurant__vendor=vendor
-    ).order_by('-created_at')
+    ).select_related('restaurant', 'customer__user').order_by('-created_at')
     
     # Calculate statistics
     total_orders = orders.count()
@@ -353,6 +214,36 @@ def vendor_orders(request):
     return render(request, 'accounts/vendor_orders.html', context)
 
 
+@read_replica
+@login_required
+def vendor_orders_export(request):
+    """Stream the vendor's order history as CSV or JSON lines"""
+    try:
+        vendor = Vendor.objects.get(user=request.user)
+    except Vendor.DoesNotExist:
+        messages.error(request, "You are not a registered vendor.")
+        return redirect('restaurant-list')
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Unsupported export format")
+    try:
+        start = parse_export_date(request.GET.get('start'))
+        end = parse_export_date(request.GET.get('end'))
+        restaurant_id = int(request.GET['restaurant']) if request.GET.get('restaurant') else None
+    except ValueError:
+        return HttpResponseBadRequest("Invalid filter")
+
+    # The body is streamed after the view returns: bind the queryset to this request's read database
+    orders = vendor_orders_queryset(
+        vendor, start=start, end=end, restaurant_id=restaurant_id, status=request.GET.get('status') or None,
+    ).using(current_read_alias())
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(iter_export(orders, export_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="orders-{vendor.pk}.{export_format}"'
+    return response
+
+
 @login_required
 def vendor_menu_management(request, restaurant_id):
     """Vendor menu management for specific restaurant"""
@@ -363,7 +254,6 @@ def vendor_menu_management(request, restaurant_id):
         messages.error(request, "Restaurant not found or access denied.")
         return redirect('vendor-dashboard')
     
-    from restaurants.models import MenuItem
     menu_items = restaurant.menu_items.all()
     
     context = {
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodfood.settings')
+# Sync work runs on short-lived per-request threads under ASGI: persistent connections
+# would be opened per thread and never reused
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,176 @@
+"""
+Endpoint latency benchmark.
+
+Each scenario drives the real URL conf and middleware stack without a network, and
+reports latency percentiles, throughput and the peak number of threads the process
+needed. Two interfaces:
+
+- "wsgi": the test Client (a WSGI handler) from one thread per concurrent client, as
+  under a threaded WSGI server.
+- "asgi": the AsyncClient (the async handler) from one coroutine per concurrent client,
+  all on one event loop, each request in its own ThreadSensitiveContext as ASGIHandler
+  does. Sync views and middleware still take a thread while they run.
+
+Results are plain dicts so they can be stored as a JSON baseline and compared against
+later runs.
+"""
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+INTERFACES = ("wsgi", "asgi")
+
+PERCENTILES = (50, 95, 99)
+
+
+class Scenario:
+    """One benchmarked endpoint.
+
+    prepare(client, fixtures) runs unmeasured before every request, e.g. to fill
+    the cart before a checkout; request(client, fixtures) is the measured call. Both
+    return what the client returns, so they work with Client and AsyncClient alike.
+    """
+
+    def __init__(self, name, role, request, prepare=None):
+        self.name = name
+        self.role = role
+        self.request = request
+        self.prepare = prepare
+
+
+def _fill_cart(client, fixtures):
+    return client.get(reverse("add-to-cart", args=[fixtures["menu_item_id"]]))
+
+
+SCENARIOS = [
+    Scenario("menu-list", "customer",
+             lambda c, f: c.get(reverse("menu-list"), {"q": "a", "category": "main", "price_min": "5",
+                                                       "price_max": "500"})),
+    Scenario("restaurant-search", "customer",
+             lambda c, f: c.get(reverse("restaurant-list"), {"q": f["search_term"], "open": "1"})),
+    Scenario("cart", "customer", lambda c, f: c.get(reverse("cart-view")), prepare=_fill_cart),
+    Scenario("checkout", "customer", lambda c, f: c.post(reverse("checkout")), prepare=_fill_cart),
+    Scenario("order-history", "customer", lambda c, f: c.get(reverse("order-history"))),
+    Scenario("vendor-dashboard", "vendor", lambda c, f: c.get(reverse("vendor-dashboard"))),
+    Scenario("vendor-orders", "vendor", lambda c, f: c.get(reverse("vendor-orders"))),
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _worker(scenario, users, fixtures, requests, warmup, peak):
+    # Server errors are counted, not raised, so one failure does not abort the run
+    client = Client(raise_request_exception=False)
+    client.force_login(users[scenario.role])
+    latencies, errors = [], 0
+    try:
+        for index in range(warmup + requests):
+            if scenario.prepare:
+                scenario.prepare(client, fixtures)
+            start = time.perf_counter()
+            response = scenario.request(client, fixtures)
+            elapsed = time.perf_counter() - start
+            peak[0] = max(peak[0], threading.active_count())
+            if index < warmup:
+                continue
+            if response.status_code >= 400:
+                errors += 1
+            latencies.append(elapsed)
+    finally:
+        connections.close_all()
+    return latencies, errors
+
+
+async def _async_worker(scenario, users, fixtures, requests, warmup, peak):
+    client = AsyncClient(raise_request_exception=False)
+    await client.aforce_login(users[scenario.role])
+    latencies, errors = [], 0
+    for index in range(warmup + requests):
+        async with ThreadSensitiveContext():
+            if scenario.prepare:
+                await scenario.prepare(client, fixtures)
+            start = time.perf_counter()
+            response = await scenario.request(client, fixtures)
+            elapsed = time.perf_counter() - start
+            # Sampled before the context exits, while its thread, if any, is alive
+            peak[0] = max(peak[0], threading.active_count())
+        if index < warmup:
+            continue
+        if response.status_code >= 400:
+            errors += 1
+        latencies.append(elapsed)
+    return latencies, errors
+
+
+async def _run_async(scenario, users, fixtures, requests, concurrency, warmup, peak):
+    return await asyncio.gather(*[
+        _async_worker(scenario, users, fixtures, requests, warmup, peak) for _ in range(concurrency)
+    ])
+
+
+def run_scenario(scenario, users, fixtures, requests=200, concurrency=4, warmup=5, interface="wsgi"):
+    """Run requests spread over concurrency clients and summarise the latencies in ms."""
+    if interface not in INTERFACES:
+        raise ValueError(f"Unknown interface {interface!r}")
+    per_worker = max(1, requests // concurrency)
+    peak = [threading.active_count()]
+    start = time.perf_counter()
+    if interface == "asgi":
+        results = asyncio.run(_run_async(scenario, users, fixtures, per_worker, concurrency, warmup, peak))
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency,
+                                thread_name_prefix=f"bench-{scenario.name}") as executor:
+            futures = [
+                executor.submit(_worker, scenario, users, fixtures, per_worker, warmup, peak)
+                for _ in range(concurrency)
+            ]
+            results = [future.result() for future in futures]
+    wall = time.perf_counter() - start
+
+    latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+    summary = {
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "peak_threads": peak[0],
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}_ms"] = round(percentile(latencies, pct) * 1000, 2)
+    return summary
+
+
+def compare(results, baseline, threshold=0.2):
+    """Regressions of results against baseline: [(scenario, metric, baseline, current)].
+
+    Latency percentiles regress when they grow by more than threshold, throughput
+    when it drops by more than threshold, and any new error counts. Scenarios missing
+    on either side are skipped.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if previous[metric] and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append((name, metric, previous[metric], current[metric]))
+        if previous["throughput_rps"] and \
+                current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+            regressions.append((name, "throughput_rps", previous["throughput_rps"], current["throughput_rps"]))
+        if current["errors"] > previous["errors"]:
+            regressions.append((name, "errors", previous["errors"], current["errors"]))
+    return regressions
+
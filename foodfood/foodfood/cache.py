@@ -0,0 +1,29 @@
+"""
+The "shared" cache: state every worker process must see, such as counters and versions.
+
+The default cache is a per-process LocMemCache. Anything a write in one worker must
+change for all of them lives in the "shared" alias instead: Redis when REDIS_URL is
+set, otherwise a table of the default database (created by migrate).
+"""
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache as BaseDatabaseCache
+from django.db import router, transaction
+from django.utils.connection import ConnectionProxy
+
+SHARED_CACHE_ALIAS = "shared"
+# Models of database cache tables carry this app label (see ReplicaRouter)
+DATABASE_CACHE_APP_LABEL = "django_cache"
+
+shared_cache = ConnectionProxy(caches, SHARED_CACHE_ALIAS)
+
+
+class DatabaseCache(BaseDatabaseCache):
+    """Database cache whose incr() and decr() are atomic.
+
+    Django's read-modify-write runs in one transaction; SQLite connections open it
+    with BEGIN IMMEDIATE (transaction_mode), which serializes concurrent increments.
+    """
+
+    def incr(self, key, delta=1, version=None):
+        with transaction.atomic(using=router.db_for_write(self.cache_model_class)):
+            return super().incr(key, delta, version)
@@ -0,0 +1,69 @@
+"""
+Conditional GET for pages validated by modification stamps.
+
+A view reads the stamps of what it would render (updated_at values, counts) with one
+indexed query, and answers 304 Not Modified without rendering when the client's ETag
+or Last-Modified still matches. Pages carry a per-user header and a CSRF token, so the
+ETag also includes the logged-in user id, the session key and the CSRF secret: a login
+or logout rotates the last two, and the browser must not keep a page with the old token.
+
+Pages rendered from the restaurant cache stamp its version instead (restaurants.cache):
+the ETag then describes the cached entry actually rendered, even a stale one.
+"""
+import hashlib
+
+from django.contrib.auth import SESSION_KEY
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def stamp_etag(client, *stamps):
+    parts = [str(client or "")]
+    parts += [str(stamp.timestamp()) if hasattr(stamp, "timestamp") else str(stamp) for stamp in stamps]
+    return quote_etag(hashlib.md5(":".join(parts).encode(), usedforsecurity=False).hexdigest())
+
+
+def _csrf_secret(request):
+    if "CSRF_COOKIE" not in request.META:
+        # First visit: the page would create the secret while rendering, create it now
+        get_token(request)
+    return request.META["CSRF_COOKIE"]
+
+
+def _client_stamp(user_id, request):
+    return ":".join(str(part or "") for part in (user_id, request.session.session_key, _csrf_secret(request)))
+
+
+def session_stamp(request):
+    """What identifies the client in a page: user id, session key and CSRF secret, without a query."""
+    return _client_stamp(request.session.get(SESSION_KEY), request)
+
+
+async def asession_stamp(request):
+    return _client_stamp(await request.session.aget(SESSION_KEY), request)
+
+
+def _validated(request, etag, last_modified):
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified), last_modified
+
+
+def _with_validators(request, response, etag, last_modified):
+    if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+        response.headers.setdefault("ETag", etag)
+        if last_modified:
+            response.headers.setdefault("Last-Modified", http_date(last_modified))
+    return response
+
+
+def conditional(request, etag, last_modified, render):
+    """304 (or 412) when the client's validators match, else render() with ETag and Last-Modified."""
+    response, last_modified = _validated(request, etag, last_modified)
+    return _with_validators(request, response if response is not None else render(), etag, last_modified)
+
+
+async def aconditional(request, etag, last_modified, render):
+    """conditional() for async views; render is a coroutine function."""
+    response, last_modified = _validated(request, etag, last_modified)
+    return _with_validators(request, response if response is not None else await render(), etag, last_modified)
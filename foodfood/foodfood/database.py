@@ -0,0 +1,92 @@
+"""
+SQLite maintenance and health reporting.
+
+The connection pragmas themselves live in settings.SQLITE_PRAGMAS and are applied by
+the backend's init_command. This module checkpoints the WAL, runs PRAGMA optimize and
+reports what is actually in effect on a live connection.
+"""
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+
+from .instrumentation import scrape_allowed
+
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+REPORTED_PRAGMAS = ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size",
+                    "temp_store", "foreign_keys", "page_size", "page_count", "freelist_count")
+
+
+def wal_checkpoint(mode="PASSIVE", using="default"):
+    """Run a WAL checkpoint; returns (busy, wal_pages, checkpointed_pages)."""
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Unknown checkpoint mode {mode!r}")
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"PRAGMA wal_checkpoint({mode})")
+        return tuple(cursor.fetchone())
+
+
+def optimize(using="default"):
+    """Let SQLite refresh the statistics the query planner relies on."""
+    with connections[using].cursor() as cursor:
+        cursor.execute("PRAGMA optimize")
+
+
+def copy_sqlite_database(source, target, pages=1024):
+    """Copy the source SQLite file onto target with the online backup API.
+
+    Pages are copied in steps of `pages`, so writers on source are only held up briefly.
+    Returns the number of pages in the copy.
+    """
+    with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(target)) as dst:
+        src.backup(dst, pages=pages)
+        return dst.execute("PRAGMA page_count").fetchone()[0]
+
+
+def database_status(using="default"):
+    """Settings in effect on a live connection, plus file sizes and a round-trip time."""
+    connection = connections[using]
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        pragmas = {}
+        if connection.vendor == "sqlite":
+            for name in REPORTED_PRAGMAS:
+                cursor.execute(f"PRAGMA {name}")
+                row = cursor.fetchone()
+                pragmas[name] = row[0] if row else None
+
+    status = {
+        "vendor": connection.vendor,
+        "latency_ms": latency_ms,
+        "conn_max_age": connection.settings_dict.get("CONN_MAX_AGE"),
+        "conn_health_checks": connection.settings_dict.get("CONN_HEALTH_CHECKS"),
+        "transaction_mode": getattr(connection, "transaction_mode", None),
+        "pragmas": pragmas,
+    }
+    name = str(connection.settings_dict["NAME"])
+    if connection.vendor == "sqlite" and os.path.exists(name):
+        status["file_bytes"] = os.path.getsize(name)
+        status["wal_bytes"] = os.path.getsize(f"{name}-wal") if os.path.exists(f"{name}-wal") else 0
+        expected = getattr(settings, "SQLITE_PRAGMAS", {}).get("journal_mode")
+        status["wal_enabled"] = str(pragmas.get("journal_mode", "")).upper() == "WAL"
+        status["profile_applied"] = not expected or str(pragmas.get("journal_mode")).upper() == expected.upper()
+    return status
+
+
+def database_health_view(request):
+    """200 when the database answers, 503 otherwise; details for monitoring clients only."""
+    try:
+        status = database_status()
+    except Exception as exc:
+        return JsonResponse({"status": "error", "error": str(exc) if scrape_allowed(request) else ""},
+                            status=503)
+    if not scrape_allowed(request):
+        return JsonResponse({"status": "ok"})
+    return JsonResponse({"status": "ok", **status})
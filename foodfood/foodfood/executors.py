@@ -0,0 +1,46 @@
+"""
+Bounded executors for blocking work.
+
+Each kind of blocking work gets its own thread pool, sized by settings.BLOCKING_EXECUTORS:
+"gateway" for payment gateway calls, "hashing" for password hashing. The pools cap how
+many such calls run at once, whatever the number of request threads: CPU-bound hashing
+beyond the number of cores only slows every request down, and a slow gateway can not
+tie up more than its pool.
+
+run_blocking() awaits a call in a pool from async code; run_bounded() runs it there from
+sync code and waits for the result.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+
+DEFAULT_EXECUTOR_SIZES = {
+    "gateway": 8,
+    "hashing": os.cpu_count() or 2,
+}
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_executor(name):
+    with _lock:
+        if name not in _executors:
+            sizes = {**DEFAULT_EXECUTOR_SIZES, **getattr(settings, "BLOCKING_EXECUTORS", {})}
+            _executors[name] = ThreadPoolExecutor(max_workers=sizes[name], thread_name_prefix=f"foodfood-{name}")
+        return _executors[name]
+
+
+async def run_blocking(name, func, *args, **kwargs):
+    """Await func(*args, **kwargs) run in the named pool, off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(name), partial(func, *args, **kwargs))
+
+
+def run_bounded(name, func, *args, **kwargs):
+    """Run func(*args, **kwargs) in the named pool and wait for it. Must not nest in the same pool."""
+    return get_executor(name).submit(func, *args, **kwargs).result()
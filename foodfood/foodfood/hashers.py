@@ -0,0 +1,15 @@
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from .executors import run_bounded
+
+
+class BoundedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """Django's PBKDF2 hasher, with the key derivation run in the bounded "hashing" pool.
+
+    Same algorithm name, so existing hashes verify and are not rehashed. verify() and
+    harden_runtime() go through encode() too. It must replace PBKDF2PasswordHasher in
+    PASSWORD_HASHERS, not sit beside it.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        return run_bounded("hashing", super().encode, password, salt, iterations)
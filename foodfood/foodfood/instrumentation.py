@@ -0,0 +1,248 @@
+"""
+Per-request performance instrumentation.
+
+RequestMetricsMiddleware measures, for every request, wall time, SQL query count and
+time, template render time and response size. It reports them in a Server-Timing
+header (the database and template timings only to monitoring clients, see
+scrape_allowed), tags every SQL statement with the view that issued it, and
+aggregates them per URL name into histograms served in Prometheus text format by
+metrics_view.
+
+SQL is timed by instrument_connection(), an execute wrapper added to every connection
+on connection_created: under ASGI the async ORM runs queries on executor threads, each
+with its own connections, and the wrapper finds the request through its context.
+
+Histograms are kept per process; scrape every worker or run one per host.
+"""
+import hmac
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .proxies import client_ip
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+_current = ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.view = "unresolved"
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+
+
+def current_stats():
+    """Stats of the request being handled in this context, or None."""
+    return _current.get()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.total += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """Histograms per (metric, view) and labelled counters, guarded by one lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, metric, view, value, buckets):
+        with self._lock:
+            key = (metric, view)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    def increment(self, metric, amount=1, **labels):
+        with self._lock:
+            key = (metric, tuple(sorted(labels.items())))
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def counter(self, metric, **labels):
+        with self._lock:
+            return self.counters.get((metric, tuple(sorted(labels.items()))), 0)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for metric in sorted({metric for metric, _ in self.histograms}):
+                lines.append(f"# TYPE {metric} histogram")
+                for (name, view), hist in sorted(self.histograms.items()):
+                    if name != metric:
+                        continue
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        lines.append(f'{metric}_bucket{{view="{view}",le="{bound}"}} {count}')
+                    lines.append(f'{metric}_bucket{{view="{view}",le="+Inf"}} {hist.total}')
+                    lines.append(f'{metric}_sum{{view="{view}"}} {hist.sum}')
+                    lines.append(f'{metric}_count{{view="{view}"}} {hist.total}')
+            for metric in sorted({metric for metric, _ in self.counters}):
+                lines.append(f"# TYPE {metric} counter")
+                for (name, labels), value in sorted(self.counters.items()):
+                    if name != metric:
+                        continue
+                    label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                    lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+_template_patch_lock = threading.Lock()
+_template_patched = False
+
+
+def _install_template_timer():
+    """Time top-level template renders done through the Django template backend."""
+    global _template_patched
+    with _template_patch_lock:
+        if _template_patched:
+            return
+        from django.template.backends.django import Template
+
+        original_render = Template.render
+
+        def timed_render(self, context=None, request=None):
+            stats = _current.get()
+            if stats is None:
+                return original_render(self, context, request)
+            start = time.perf_counter()
+            try:
+                return original_render(self, context, request)
+            finally:
+                stats.template_time += time.perf_counter() - start
+
+        Template.render = timed_render
+        _template_patched = True
+
+
+def sql_timer(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    # The comment lets slow query logs and the database point back at the view
+    sql = f"/* view={stats.view} */ {sql}"
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_count += 1
+        stats.sql_time += time.perf_counter() - start
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """connection_created receiver: time the queries of every new connection."""
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_timer)
+
+
+class RequestMetricsMiddleware:
+    """Place right after SecurityMiddleware so the whole stack is measured."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        _install_template_timer()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(response, stats, time.perf_counter() - start, scrape_allowed(request))
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(response, stats, time.perf_counter() - start, await ascrape_allowed(request))
+
+    def record(self, response, stats, elapsed, detailed):
+        """Observe the request; only monitoring clients get the database and template timings."""
+        size = 0 if response.streaming else len(response.content)
+        timings = [f"app;dur={elapsed * 1000:.1f}"]
+        if detailed:
+            timings += [
+                f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries"',
+                f"tpl;dur={stats.template_time * 1000:.1f}",
+            ]
+        response["Server-Timing"] = ", ".join(timings)
+        registry.observe("foodfood_request_duration_seconds", stats.view, elapsed, DURATION_BUCKETS)
+        registry.observe("foodfood_request_queries", stats.view, stats.sql_count, QUERY_BUCKETS)
+        registry.observe("foodfood_request_sql_seconds", stats.view, stats.sql_time, DURATION_BUCKETS)
+        registry.observe("foodfood_request_template_seconds", stats.view, stats.template_time, DURATION_BUCKETS)
+        if not response.streaming:
+            registry.observe("foodfood_response_bytes", stats.view, size, SIZE_BUCKETS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = _current.get()
+        match = request.resolver_match
+        if stats is not None and match is not None:
+            stats.view = (match.view_name or match._func_path).replace("*", "").replace('"', "")
+
+
+def _monitoring_client(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return True
+    # Behind a proxy REMOTE_ADDR is the proxy's: read the client through TRUSTED_PROXIES
+    return client_ip(request) in getattr(settings, "METRICS_ALLOWED_IPS", [])
+
+
+def scrape_allowed(request):
+    """Monitoring endpoints answer in full to METRICS_TOKEN, METRICS_ALLOWED_IPS and staff only."""
+    if _monitoring_client(request):
+        return True
+    # Requests answered before AuthenticationMiddleware (a bad Host header) have no user
+    user = getattr(request, "user", None)
+    return user is not None and user.is_staff
+
+
+async def ascrape_allowed(request):
+    if _monitoring_client(request):
+        return True
+    auser = getattr(request, "auser", None)
+    return auser is not None and (await auser()).is_staff
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the request histograms of this process."""
+    if not scrape_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4")
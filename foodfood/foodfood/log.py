@@ -0,0 +1,125 @@
+"""
+Logging helpers: JSON formatting, level-based sampling and a queue-backed handler.
+
+Records are put on an in-memory queue by the request thread and written to disk by a
+background QueueListener, so file I/O never sits on the request path. Threads do not
+survive fork(): listeners are stopped before it and started again on both sides, so
+workers forked after a preload keep logging.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import weakref
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else was passed through `extra`.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line, keeping `extra` fields."""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of the records of each level.
+
+    rates maps level names to the fraction kept, e.g. {"DEBUG": 0.01, "INFO": 0.25}.
+    Levels that are not listed are always kept.
+    """
+
+    def __init__(self, rates=None, name=""):
+        super().__init__(name)
+        self.rates = {logging.getLevelName(level): rate for level, rate in (rates or {}).items()}
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+_queue_handlers = weakref.WeakSet()
+
+
+def _stop_listeners():
+    for handler in list(_queue_handlers):
+        handler.forking = handler.stop_listener()
+
+
+def _restart_listeners():
+    for handler in list(_queue_handlers):
+        if handler.forking:
+            handler.forking = False
+            handler.listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_stop_listeners, after_in_parent=_restart_listeners,
+                        after_in_child=_restart_listeners)
+
+
+class QueueFileHandler(logging.handlers.QueueHandler):
+    """Queue-backed handler writing JSON lines to a rotating file from a background thread.
+
+    When the queue is full records are dropped rather than blocking the caller.
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        target = logging.handlers.RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True,
+        )
+        target.setFormatter(JSONFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+        self.forking = False
+        _queue_handlers.add(self)
+        atexit.register(self.stop_listener)
+
+    def stop_listener(self):
+        """Flush pending records and stop the thread; returns whether it was running."""
+        # QueueListener.stop() fails if called twice
+        if self.listener._thread is None:
+            return False
+        self.listener.stop()
+        return True
+
+    def prepare(self, record):
+        # Resolve the message and traceback now, while args and exc_info are valid,
+        # but keep the record's extra fields for the JSON formatter.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+    def close(self):
+        _queue_handlers.discard(self)
+        self.stop_listener()
+        super().close()
@@ -0,0 +1,15 @@
+"""
+WSGI entrypoint for pre-forking servers, e.g. ``gunicorn --preload foodfood.preload:application``.
+
+The application is loaded and warmed once in the master process, which then freezes
+its heap out of the garbage collector (see foodfood.startup.preload), so the forked
+workers start warm and share that memory copy-on-write.
+"""
+
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodfood.settings')
+
+from foodfood.startup import preload  # noqa: E402
+
+application = preload()
@@ -0,0 +1,36 @@
+"""
+Client addresses behind reverse proxies.
+
+REMOTE_ADDR is the proxy's address when the site runs behind one. client_ip() follows
+X-Forwarded-For only through the proxies listed in TRUSTED_PROXIES (addresses or
+networks): the client is the nearest address that is not one of them. Without
+TRUSTED_PROXIES the header is ignored, since any client can send it.
+"""
+import ipaddress
+
+from django.conf import settings
+
+
+def _networks():
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in getattr(settings, "TRUSTED_PROXIES", [])]
+
+
+def _is_trusted(address, networks):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+def client_ip(request):
+    remote_addr = request.META.get("REMOTE_ADDR")
+    networks = _networks()
+    if not networks or not _is_trusted(remote_addr, networks):
+        return remote_addr
+    forwarded = [hop.strip() for hop in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if hop.strip()]
+    # Each proxy appends the address it received the request from: walk back from ours
+    for hop in reversed(forwarded):
+        if not _is_trusted(hop, networks):
+            return hop
+    return forwarded[0] if forwarded else remote_addr
@@ -0,0 +1,109 @@
+"""
+N+1 query detection.
+
+QueryRecorder captures every SQL statement run inside it together with the template
+line (or project source line) that triggered it. find_repeated_queries groups them by
+shape: the same statement run again and again from one place is an N+1.
+
+The test harness in foodfood.testing asserts on it; NPlusOneWarningMiddleware logs it
+during development when NPLUSONE_WARNINGS is enabled.
+"""
+import logging
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+_COMMENT_RE = re.compile(r"^\s*/\*.*?\*/\s*")
+_IN_LIST_RE = re.compile(r"\((?:%s, )+%s\)")
+# Database hooks whose own frames are never the origin of a query
+_HOOK_FILES = ("querycheck.py", "slowqueries.py", "instrumentation.py")
+
+
+def query_shape(sql):
+    """The statement with leading comments dropped and IN lists collapsed."""
+    return _IN_LIST_RE.sub("(%s, ...)", _COMMENT_RE.sub("", sql))
+
+
+def query_origin():
+    """Where the current query comes from: innermost template node, else project code."""
+    project_root = str(Path(settings.BASE_DIR).resolve())
+    source_line = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        node = frame.f_locals.get("self")
+        # type() rather than isinstance(): isinstance would evaluate lazy objects
+        # such as request.user, running a query from inside this hook
+        if issubclass(type(node), Node) and getattr(node, "origin", None) and getattr(node, "token", None):
+            return f"{node.origin.template_name or node.origin.name}:{node.token.lineno}"
+        filename = frame.f_code.co_filename
+        if (source_line is None and filename.startswith(project_root)
+                and not filename.endswith(_HOOK_FILES) and "site-packages" not in filename):
+            source_line = f"{Path(filename).relative_to(project_root)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return source_line or "unknown"
+
+
+class QueryRecorder:
+    """Context manager recording (shape, origin, sql) for queries on every connection."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        self._wrapped = []
+        for connection in connections.all():
+            wrapper_cm = connection.execute_wrapper(self)
+            wrapper_cm.__enter__()
+            self._wrapped.append(wrapper_cm)
+        return self
+
+    def __exit__(self, *exc_info):
+        for wrapper_cm in reversed(self._wrapped):
+            wrapper_cm.__exit__(*exc_info)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((query_shape(sql), query_origin(), sql))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+
+def find_repeated_queries(queries, threshold=3):
+    """[(origin, count, shape)] for shapes run at least threshold times from one origin."""
+    counts = Counter((origin, shape) for shape, origin, _ in queries)
+    return [
+        (origin, count, shape)
+        for (origin, shape), count in counts.most_common()
+        if count >= threshold
+    ]
+
+
+class NPlusOneWarningMiddleware:
+    """Log a warning for every repeated query shape of a request. Development only.
+
+    Sync only on purpose: under ASGI, Django then runs the layers below in this thread,
+    so the async ORM's queries go through the connections being recorded.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "NPLUSONE_WARNINGS", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, "NPLUSONE_THRESHOLD", 3)
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        for origin, count, shape in find_repeated_queries(recorder.queries, self.threshold):
+            logger.warning("Possible N+1 on %s: %s queries from %s: %s",
+                           request.path, count, origin, shape[:200])
+        return response
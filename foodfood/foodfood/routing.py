@@ -0,0 +1,144 @@
+"""
+Read/write database routing.
+
+Writes always go to "default". Reads go to "default" too, unless the current context
+was switched to the replica: by ReplicaRoutingMiddleware for GET/HEAD requests to
+views marked with @read_replica (or listed in DATABASE_ROUTING_OVERRIDES), or
+explicitly with read_from().
+
+Read-your-writes: a request that writes sets a short-lived cookie, and that client's
+requests read from "default" until it expires (REPLICA_PIN_SECONDS), which should
+exceed the replica lag.
+
+Without a "replica" entry in DATABASES everything reads from "default".
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .cache import DATABASE_CACHE_APP_LABEL
+
+REPLICA = "replica"
+PIN_COOKIE = "db_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_alias = ContextVar("read_alias", default=None)
+_wrote = ContextVar("wrote", default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def current_read_alias():
+    return _read_alias.get() or "default"
+
+
+@contextmanager
+def read_from(alias):
+    """Route the reads of this block to alias ("default" when no replica is configured)."""
+    if alias == REPLICA and not replica_configured():
+        alias = "default"
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+def read_replica(view):
+    """Mark a view whose GET/HEAD requests may read from the replica."""
+    view.read_replica = True
+    return view
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == DATABASE_CACHE_APP_LABEL:
+            # Cache tables are shared state, never read a lagging copy
+            return "default"
+        if _wrote.get():
+            # Once this request has written, it reads its own writes
+            return None
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        wrote = _wrote.get()
+        # Cache writes do not pin the client to the writer
+        if wrote is not None and model._meta.app_label != DATABASE_CACHE_APP_LABEL:
+            wrote.add(model._meta.label)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of default: objects read from either may be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        wrote = set()
+        wrote_token = _wrote.set(wrote)
+        alias_token = _read_alias.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(alias_token)
+            _wrote.reset(wrote_token)
+        return self.pin_writer(response, wrote)
+
+    async def __acall__(self, request):
+        wrote = set()
+        wrote_token = _wrote.set(wrote)
+        alias_token = _read_alias.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(alias_token)
+            _wrote.reset(wrote_token)
+        return self.pin_writer(response, wrote)
+
+    def pin_writer(self, response, wrote):
+        if wrote and replica_configured():
+            pin_seconds = getattr(settings, "REPLICA_PIN_SECONDS", 15)
+            response.set_cookie(PIN_COOKIE, str(int(time.time() + pin_seconds)), max_age=pin_seconds,
+                                httponly=True, samesite="Lax")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not replica_configured() or request.method not in SAFE_METHODS:
+            return None
+        overrides = getattr(settings, "DATABASE_ROUTING_OVERRIDES", {})
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        view_class = getattr(view_func, "view_class", None)
+        alias = overrides.get(url_name) or (
+            REPLICA if getattr(view_func, "read_replica", False) or getattr(view_class, "read_replica", False)
+            else None
+        )
+        if alias == REPLICA and self.pinned(request):
+            alias = "default"
+        if alias:
+            _read_alias.set(alias)
+        return None
+
+    def pinned(self, request):
+        try:
+            return int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
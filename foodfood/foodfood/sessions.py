@@ -0,0 +1,93 @@
+"""
+Change-aware session engine with compact encoding.
+
+Built on the cached_db engine:
+- a session is only written when its content actually changed, whatever
+  request.session.modified says, so most requests never write;
+- a change is written to the database and then to the session cache, within the
+  request: the database always holds the latest state;
+- reads are served from the session cache, falling back to the database. The cache
+  is the "sessions" alias: Redis when REDIS_URL is set. Without Redis it is a dummy
+  cache, so a change costs one write to django_session and nothing else;
+- the cache may be synchronous only (a database cache): every async method runs the
+  sync one in a thread;
+- session data is encoded with marshal instead of JSON, which is smaller and faster
+  for the plain dicts, lists and strings stored here. The payload stays signed.
+"""
+import hashlib
+import json
+import marshal
+
+from asgiref.sync import sync_to_async
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+KEY_PREFIX = "foodfood.sessions"
+MARSHAL_MAGIC = b"\x00m"
+
+
+class CompactSerializer:
+    """Binary session serializer for signing.dumps()/loads().
+
+    Sessions written by the JSON serializer are still readable.
+    """
+
+    def dumps(self, obj):
+        return MARSHAL_MAGIC + marshal.dumps(obj)
+
+    def loads(self, data):
+        if data.startswith(MARSHAL_MAGIC):
+            return marshal.loads(data[len(MARSHAL_MAGIC):])
+        return json.loads(data.decode("latin-1"))
+
+
+def _digest(data):
+    try:
+        return hashlib.blake2b(marshal.dumps(data), digest_size=16).digest()
+    except ValueError:
+        # Unmarshallable content: never treat it as unchanged
+        return None
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded_digest = None
+
+    def load(self):
+        data = super().load()
+        self._loaded_digest = _digest(data)
+        return data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        digest = _digest(data)
+        if not must_create and digest is not None and digest == self._loaded_digest:
+            return
+        # Database first, then the cache; a cache failure is logged by cached_db
+        super().save(must_create=must_create)
+        self._loaded_digest = digest
+
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create=must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    async def aexists(self, session_key):
+        return await sync_to_async(self.exists)(session_key)
+
+    async def acreate(self):
+        return await sync_to_async(self.create)()
+
+    async def acycle_key(self):
+        return await sync_to_async(self.cycle_key)()
+
+    async def aflush(self):
+        return await sync_to_async(self.flush)()
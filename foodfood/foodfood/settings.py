@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -30,8 +32,12 @@ ALLOWED_HOSTS = ["localhost", "127.0.0.1", "0.0.0.0"]
 
 # Application definition
 
+# The jazzmin admin theme is optional: left out when it is not installed, or with
+# DJANGO_JAZZMIN=0 on workers that never serve the admin
+JAZZMIN_ENABLED = os.getenv('DJANGO_JAZZMIN', '1') == '1' and find_spec('jazzmin') is not None
+
 INSTALLED_APPS = [
-    'jazzmin',
+    *(['jazzmin'] if JAZZMIN_ENABLED else []),
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -46,6 +52,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodfood.instrumentation.RequestMetricsMiddleware',
+    'foodfood.querycheck.NPlusOneWarningMiddleware',
+    'foodfood.routing.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,11 +89,105 @@ WSGI_APPLICATION = 'foodfood.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuned for concurrent web traffic: WAL lets readers run during a write,
+# busy_timeout makes writers wait instead of failing, and IMMEDIATE transactions take
+# the write lock up front so an atomic block never fails halfway on lock upgrade.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,  # KiB
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# Optional read replica for analytics and listings (see foodfood.routing). Locally,
+# DB_REPLICA_NAME=db.replica.sqlite3 and `manage.py refresh_replica --loop` keep a copy.
+if os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / os.getenv('DB_REPLICA_NAME'),
+        'OPTIONS': {
+            **DATABASES['default']['OPTIONS'],
+            'init_command': DATABASES['default']['OPTIONS']['init_command'] + ';PRAGMA query_only=ON',
+        },
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['foodfood.routing.ReplicaRouter']
+# After writing, a client reads from default for this long; keep it above the replica lag
+REPLICA_PIN_SECONDS = 15
+# Per-view routing by URL name, e.g. {'vendor-dashboard': 'default'}; wins over @read_replica
+DATABASE_ROUTING_OVERRIDES = {}
+
+
+# Cache
+# "default" is per process. "shared" is seen by every worker process (cache
+# versions, dashboards): Redis when REDIS_URL is set, else a table of the default database.
+# "throttle" holds the login throttling counters: Redis when REDIS_URL is set, else
+# per process, never the database (a rejected login must stay cheap). "sessions" is
+# Redis too, else a dummy cache: sessions then live in django_session alone.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    } if os.getenv('REDIS_URL') else {
+        'BACKEND': 'foodfood.cache.DatabaseCache',
+        'LOCATION': 'foodfood_shared_cache',
+    },
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    } if os.getenv('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'login-throttle',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    } if os.getenv('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+# Sessions: written only when their content changed, to the database then the
+# "sessions" cache; compact binary encoding.
+SESSION_ENGINE = 'foodfood.sessions'
+SESSION_SERIALIZER = 'foodfood.sessions.CompactSerializer'
+SESSION_CACHE_ALIAS = 'sessions'
+
+
+# Password hashing runs in the bounded "hashing" pool (foodfood.executors). The bounded
+# hasher replaces Django's PBKDF2 one: hashes are verified by the last hasher listed
+# with their algorithm name.
+PASSWORD_HASHERS = [
+    'foodfood.hashers.BoundedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Thread pool sizes for blocking work, see foodfood/executors.py
+BLOCKING_EXECUTORS = {
+    'gateway': int(os.getenv('GATEWAY_EXECUTOR_WORKERS', '8')),
+    'hashing': int(os.getenv('HASHING_EXECUTOR_WORKERS', str(os.cpu_count() or 2))),
 }
 
 
@@ -140,17 +243,42 @@ CSRF_TRUSTED_ORIGINS = [
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Configuration du logging pour diagnostiquer les problèmes de connexion
+# Logging: records go through a queue and are written as JSON lines to debug.log by a
+# background thread. LOG_SAMPLING_RATES keeps only a fraction of the chatty levels.
+LOG_SAMPLING_RATES = {
+    'DEBUG': 0.01,
+    'INFO': 0.25,
+}
+
+# Queries slower than this are logged with their plan (None disables the hook; set the
+# variable to an empty string or "none" for that)
+SLOW_QUERY_THRESHOLD_MS = os.getenv('SLOW_QUERY_THRESHOLD_MS', '100').strip()
+SLOW_QUERY_THRESHOLD_MS = (int(SLOW_QUERY_THRESHOLD_MS)
+                           if SLOW_QUERY_THRESHOLD_MS.lower() not in ('', 'none') else None)
+SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.log'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'sampling': {
+            '()': 'foodfood.log.SamplingFilter',
+            'rates': LOG_SAMPLING_RATES,
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
+            'level': 'WARNING',
         },
         'file': {
-            'class': 'logging.FileHandler',
-            'filename': 'debug.log',
+            '()': 'foodfood.log.QueueFileHandler',
+            'filename': BASE_DIR / 'debug.log',
+            'filters': ['sampling'],
+        },
+        'slow_queries': {
+            '()': 'foodfood.log.QueueFileHandler',
+            'filename': SLOW_QUERY_LOG,
         },
     },
     'loggers': {
@@ -161,17 +289,51 @@ LOGGING = {
         },
         'django.contrib.auth': {
             'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'level': 'INFO',
             'propagate': True,
         },
+        'foodfood.slowqueries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
+# Reverse proxies whose X-Forwarded-For is trusted, as addresses or networks
+# (comma separated), e.g. TRUSTED_PROXIES=127.0.0.1 behind a local nginx
+TRUSTED_PROXIES = [proxy for proxy in os.getenv('TRUSTED_PROXIES', '').split(',') if proxy]
+
+# Login throttling: attempts per username and per client IP over a sliding window,
+# counted in the "throttle" cache.
+LOGIN_THROTTLE = {
+    'username': {'limit': 5, 'window_seconds': 300},
+    'ip': {'limit': 30, 'window_seconds': 60},
+}
+
+# Monitoring (/metrics, /health/db/, Server-Timing details) is open to staff, to
+# clients sending "Authorization: Bearer $METRICS_TOKEN" and to the client IPs listed
+# in METRICS_ALLOWED_IPS (comma separated, resolved through TRUSTED_PROXIES)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip]
+
+# Worker startup budget checked by the startup_report command
+STARTUP_BUDGET_MS = int(os.getenv('STARTUP_BUDGET_MS', '1000'))
+
+# Log repeated query shapes (N+1) per request; development only
+NPLUSONE_WARNINGS = os.getenv('NPLUSONE_WARNINGS') == '1'
+NPLUSONE_THRESHOLD = 3
+
 # Auth redirects
 # Use named URLs to avoid NoReverseMatch on empty strings
 LOGIN_REDIRECT_URL = 'smart-redirect'
 LOGOUT_REDIRECT_URL = 'menu-list'
 
+# Vendor dashboard cache: entries younger than FRESH are served as is, older ones
+# are served stale while a single background recompute refreshes them.
+VENDOR_DASHBOARD_FRESH_SECONDS = 30
+VENDOR_DASHBOARD_STALE_SECONDS = 600
+
 # Jazzmin configuration (optional tweaks)
 JAZZMIN_SETTINGS = {
     "site_title": "FoodFood Admin",
@@ -183,3 +345,17 @@ JAZZMIN_SETTINGS = {
 import os
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID", "rzp_test_RLtyL9jGuMti9L")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET", "Uyl1g4FFL0oPzb7AqalzahdQ")
+RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET", "")
+# Payment gateway: "razorpay", or "stub" for the offline in-process gateway
+PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "razorpay")
+PAYMENT_GATEWAY_OPTIONS = {
+    'connect_timeout': 3.05,
+    'read_timeout': 10,
+    'retries': 2,
+    'pool_size': 10,
+    'breaker_failure_threshold': 5,
+    'breaker_reset_seconds': 30,
+}
+PAYMENT_STUB_LATENCY_MS = int(os.getenv("PAYMENT_STUB_LATENCY_MS", "0"))
+# How long a stored Razorpay order is reused for the payment page
+RAZORPAY_ORDER_TTL_SECONDS = 6 * 60 * 60
@@ -0,0 +1,37 @@
+"""
+Helpers for async views.
+
+Async views read through the async ORM. Rendering stays sync: context processors and
+templates may still touch the session or lazy relations, so arender() runs it in a
+thread, after resolving the user once through request.auser().
+"""
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404
+from django.shortcuts import render
+
+
+async def arender(request, template_name, context=None):
+    # request.user and request.auser() cache separately: share the resolved user
+    request.user = await request.auser()
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def apaginate(request, queryset, per_page):
+    """ListView's pagination context, with the count and the page read through the async ORM."""
+    paginator = Paginator(queryset, per_page)
+    paginator.count = await queryset.acount()
+    page_number = request.GET.get('page') or 1
+    if page_number == 'last':
+        page_number = paginator.num_pages
+    try:
+        page = paginator.page(page_number)
+    except InvalidPage as exc:
+        raise Http404(f"Invalid page ({page_number}): {exc}")
+    page.object_list = [obj async for obj in page.object_list]
+    return {
+        'paginator': paginator,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'object_list': page.object_list,
+    }
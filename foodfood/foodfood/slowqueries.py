@@ -0,0 +1,149 @@
+"""
+Slow query log.
+
+install_slow_query_log() is connected to connection_created and adds an execute
+wrapper to every database connection. Queries slower than SLOW_QUERY_THRESHOLD_MS
+are logged to the "foodfood.slowqueries" logger with their SQL, parameters,
+originating view and source line. The first time a query shape is seen, its plan
+is captured with EXPLAIN QUERY PLAN (EXPLAIN on other databases) and logged too.
+
+slow_query_report() reads the log back for the staff page at admin/slow-queries/.
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import render
+
+from .instrumentation import current_stats
+from .querycheck import query_origin, query_shape
+
+logger = logging.getLogger(__name__)
+
+PLAN_WARNINGS = ("SCAN", "USE TEMP B-TREE")
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+MAX_EXPLAINED_SHAPES = 2000
+
+_explained = OrderedDict()
+
+
+def _threshold():
+    return getattr(settings, "SLOW_QUERY_THRESHOLD_MS", 100) / 1000
+
+
+def explain(connection, sql, params):
+    """Plan lines of sql, read on a fresh backend cursor so the caller's results survive."""
+    prefix = "EXPLAIN QUERY PLAN" if connection.vendor == "sqlite" else "EXPLAIN"
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f"{prefix} {sql}", params)
+        # SQLite rows are (id, parent, notused, detail); other backends return one text column
+        return [str(row[-1]) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def plan_warnings(plan):
+    return sorted({warning for line in plan for warning in PLAN_WARNINGS if warning in line})
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed = time.perf_counter() - start
+    if elapsed < _threshold():
+        return result
+
+    shape = query_shape(sql)
+    stats = current_stats()
+    entry = {
+        "duration_ms": round(elapsed * 1000, 2),
+        "sql": sql,
+        "params": [str(param) for param in params] if params and not many else [],
+        "shape": shape,
+        "view": stats.view if stats else None,
+        "origin": query_origin(),
+    }
+    if shape not in _explained and not many and shape.lstrip().upper().startswith(EXPLAINABLE):
+        _explained[shape] = True
+        if len(_explained) > MAX_EXPLAINED_SHAPES:
+            _explained.popitem(last=False)
+        try:
+            entry["plan"] = explain(context["connection"], sql, params)
+            entry["plan_warnings"] = plan_warnings(entry["plan"])
+        except Exception as exc:
+            entry["plan_error"] = str(exc)
+    logger.warning("Slow query (%sms) from %s", entry["duration_ms"], entry["view"] or entry["origin"],
+                   extra=entry)
+    return result
+
+
+def install_slow_query_log(sender, connection, **kwargs):
+    """connection_created receiver: wrap every new connection unless disabled."""
+    if getattr(settings, "SLOW_QUERY_THRESHOLD_MS", 100) is None:
+        return
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+def read_slow_queries(limit=2000):
+    """The last limit entries of the slow query log, oldest first."""
+    path = getattr(settings, "SLOW_QUERY_LOG", None)
+    if not path:
+        return []
+    try:
+        with open(path, encoding="utf-8") as log_file:
+            lines = log_file.readlines()[-limit:]
+    except FileNotFoundError:
+        return []
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
+
+
+def slow_query_report(limit=2000):
+    """Slow queries grouped by shape, slowest total time first."""
+    groups = {}
+    for entry in read_slow_queries(limit):
+        group = groups.setdefault(entry.get("shape", entry.get("sql")), {
+            "shape": entry.get("shape", entry.get("sql")),
+            "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "plan": [], "plan_warnings": [],
+        })
+        group["count"] += 1
+        group["total_ms"] += entry.get("duration_ms", 0)
+        if entry.get("duration_ms", 0) >= group["max_ms"]:
+            group.update(max_ms=entry.get("duration_ms", 0), sql=entry.get("sql"),
+                         params=entry.get("params"), view=entry.get("view"),
+                         origin=entry.get("origin"), ts=entry.get("ts"))
+        if entry.get("plan"):
+            group["plan"] = entry["plan"]
+            group["plan_warnings"] = entry.get("plan_warnings", [])
+    report = sorted(groups.values(), key=lambda group: group["total_ms"], reverse=True)
+    for group in report:
+        group["avg_ms"] = round(group["total_ms"] / group["count"], 2)
+        group["total_ms"] = round(group["total_ms"], 2)
+        group["plan_lines"] = [
+            {"text": line, "warning": any(warning in line for warning in PLAN_WARNINGS)}
+            for line in group["plan"]
+        ]
+    return report
+
+
+@staff_member_required
+def slow_queries_view(request):
+    context = {
+        **admin.site.each_context(request),
+        "title": "Slow queries",
+        "report": slow_query_report(),
+        "threshold_ms": getattr(settings, "SLOW_QUERY_THRESHOLD_MS", 100),
+    }
+    return render(request, "admin/slow_queries.html", context)
@@ -0,0 +1,117 @@
+"""
+Worker startup: measure it, and do it once before forking.
+
+load_application() is what a worker does before its first request. preload() also
+warms the URL resolver and compiles the project templates, then freezes everything
+allocated so far out of the garbage collector: after a fork, collections in the
+workers no longer touch those objects, so their pages stay shared copy-on-write.
+
+measure_startup() times the same steps in a fresh interpreter; the startup_report
+command runs it under -X importtime and breaks the import time down.
+"""
+import gc
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def load_application():
+    from django.core.wsgi import get_wsgi_application
+    from django.urls import get_resolver
+
+    application = get_wsgi_application()
+    # Imports the URLconf, and with it every view module
+    get_resolver().url_patterns
+    return application
+
+
+def warm_url_resolver():
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    resolver._populate()
+    return len(resolver.reverse_dict)
+
+
+def warm_templates():
+    """Compile the project templates into the cached loader; returns how many were."""
+    from django.template import TemplateSyntaxError, engines
+
+    warmed = 0
+    for engine in engines.all():
+        for directory in getattr(engine, "dirs", []):
+            for path in sorted(Path(directory).rglob("*.html")):
+                name = path.relative_to(directory).as_posix()
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError:
+                    logger.warning("Could not precompile template %s", name, exc_info=True)
+                else:
+                    warmed += 1
+    return warmed
+
+
+def preload():
+    """Load and warm the application, then freeze the heap ahead of fork()."""
+    from django.db import connections
+
+    application = load_application()
+    warm_url_resolver()
+    warm_templates()
+    # Workers must not inherit open database connections
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+    return application
+
+
+def measure_startup():
+    """Time the startup phases in this (fresh) interpreter and print them as JSON."""
+    import django
+
+    phases = {}
+    start = time.perf_counter()
+    django.setup()
+    phases["setup_ms"] = (time.perf_counter() - start) * 1000
+    mark = time.perf_counter()
+    load_application()
+    phases["application_ms"] = (time.perf_counter() - mark) * 1000
+    mark = time.perf_counter()
+    warm_url_resolver()
+    warm_templates()
+    phases["warmup_ms"] = (time.perf_counter() - mark) * 1000
+    phases["total_ms"] = (time.perf_counter() - start) * 1000
+    print(json.dumps({name: round(value, 1) for name, value in phases.items()}))
+
+
+def parse_importtime(output):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output."""
+    entries = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def startup_profile(base_dir, settings_module):
+    """Run measure_startup() in a child interpreter: (phases, importtime entries)."""
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from foodfood.startup import measure_startup; measure_startup()"],
+        cwd=base_dir, env=env, capture_output=True, text=True, check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "startup failed")
+    phases = json.loads(result.stdout.strip().splitlines()[-1])
+    return phases, parse_importtime(result.stderr)
@@ -0,0 +1,98 @@
+"""
+Query budget test harness.
+
+QueryBudgetTestCase renders a view at several data scales and fails when the number
+of queries exceeds its budget, grows with the data, or contains an N+1 (the same query
+shape repeated from one template line or source line).
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase
+
+from accounts.models import Customer, Vendor
+from orders.models import Order, OrderItem
+from restaurants.models import MenuItem, Restaurant
+from .querycheck import QueryRecorder, find_repeated_queries
+
+SCALES = (1, 4)
+
+
+class MarketplaceData:
+    """One vendor and one customer whose restaurants, menus and orders grow with scale."""
+
+    def __init__(self):
+        self.vendor_user = User.objects.create_user("budget_vendor", password="pass12345")
+        self.vendor = Vendor.objects.create(user=self.vendor_user, restaurant_name="Budget Foods")
+        self.customer_user = User.objects.create_user("budget_customer", password="pass12345")
+        self.customer = Customer.objects.create(user=self.customer_user, phone="9999999999",
+                                                address="1 Budget Street")
+        self.restaurants = []
+        self.orders = []
+
+    def grow(self, scale):
+        """Add restaurants, menu items and orders until the data matches scale."""
+        while len(self.restaurants) < scale:
+            index = len(self.restaurants) + 1
+            restaurant = Restaurant.objects.create(vendor=self.vendor, name=f"Budget Kitchen {index}")
+            MenuItem.objects.bulk_create(
+                MenuItem(restaurant=restaurant, name=f"Dish {index}-{n}", price=Decimal("100.00") + n)
+                for n in range(2 * scale + 2)
+            )
+            self.restaurants.append(restaurant)
+        for restaurant in self.restaurants:
+            menu_items = list(restaurant.menu_items.all())
+            while sum(1 for order in self.orders if order.restaurant_id == restaurant.pk) < 2 * scale:
+                order = Order.objects.create(customer=self.customer, restaurant=restaurant,
+                                             delivery_address=self.customer.address)
+                OrderItem.objects.bulk_create(
+                    OrderItem(order=order, menu_item=item, quantity=1, price=item.price)
+                    for item in menu_items[:scale + 1]
+                )
+                order.recalculate_total()
+                self.orders.append(order)
+
+
+class QueryBudgetTestCase(TestCase):
+    scales = SCALES
+    nplusone_threshold = 3
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.data = MarketplaceData()
+
+    def record(self, url, user=None):
+        if user is not None:
+            self.client.force_login(user)
+        if callable(url):
+            url = url()
+        with QueryRecorder() as recorder:
+            response = self.client.get(url)
+        self.assertLess(response.status_code, 400, f"{url} answered {response.status_code}")
+        return recorder
+
+    def assertQueryBudget(self, url, budget, user=None, warm=True):
+        """Render url at every scale; url may be a callable evaluated after each growth.
+
+        With warm=True the measured request follows an identical one, so cached paths
+        are measured; warm=False measures the request on empty caches.
+        """
+        counts = []
+        for scale in self.scales:
+            self.data.grow(scale)
+            for cache in caches.all():
+                cache.clear()
+            if warm:
+                self.record(url, user)
+            recorder = self.record(url, user)
+            repeated = find_repeated_queries(recorder.queries, self.nplusone_threshold)
+            if repeated:
+                self.fail("N+1 queries at scale %s:\n%s" % (scale, "\n".join(
+                    f"  {count}x from {origin}: {shape[:160]}" for origin, count, shape in repeated
+                )))
+            self.assertLessEqual(len(recorder), budget,
+                                 f"{len(recorder)} queries at scale {scale}, budget is {budget}")
+            counts.append(len(recorder))
+        self.assertEqual(len(set(counts)), 1, f"Query count grows with data: {counts}")
@@ -20,7 +20,12 @@ from django.views.generic import RedirectView
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .database import database_health_view
+from .instrumentation import metrics_view
+from .slowqueries import slow_queries_view
+
 urlpatterns = [
+    path('admin/slow-queries/', slow_queries_view, name='slow-queries'),
     path('admin/', admin.site.urls),
     # Root redirects to menu list to show menu items first
     path('', RedirectView.as_view(pattern_name='menu-list', permanent=False)),
@@ -29,6 +34,8 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('accounts/', include('django.contrib.auth.urls')),
     path('payments/', include('payments.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('health/db/', database_health_view, name='database-health'),
 ]
 
 if settings.DEBUG:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, MenuItemSales
 
 
 class OrderItemInline(admin.TabularInline):
@@ -18,4 +18,11 @@ class OrderAdmin(admin.ModelAdmin):
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ("order", "menu_item", "quantity", "price")
 
+
+@admin.register(MenuItemSales)
+class MenuItemSalesAdmin(admin.ModelAdmin):
+    list_display = ("menu_item", "restaurant", "date", "quantity", "revenue")
+    list_filter = ("restaurant",)
+    date_hierarchy = "date"
+
 # Register your models here.
@@ -0,0 +1,115 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from restaurants.models import Restaurant
+
+from .models import Order, MenuItemSales, CustomerSketch
+from .sketches import HyperLogLog
+
+
+def record_order_sales(order, items=None):
+    """Add the lines of order to the daily MenuItemSales counters.
+
+    items defaults to order.items.all(); callers that just created the lines can pass
+    them in to avoid reading them back.
+    """
+    if items is None:
+        items = order.items.all()
+    day = timezone.localdate(order.created_at)
+    for item in items:
+        line_revenue = item.price * item.quantity
+        updated = MenuItemSales.objects.filter(menu_item_id=item.menu_item_id, date=day).update(
+            quantity=F("quantity") + item.quantity,
+            revenue=F("revenue") + line_revenue,
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                MenuItemSales.objects.create(
+                    restaurant_id=order.restaurant_id,
+                    menu_item_id=item.menu_item_id,
+                    date=day,
+                    quantity=item.quantity,
+                    revenue=line_revenue,
+                )
+        except IntegrityError:
+            # Another checkout created today's row first
+            MenuItemSales.objects.filter(menu_item_id=item.menu_item_id, date=day).update(
+                quantity=F("quantity") + item.quantity,
+                revenue=F("revenue") + line_revenue,
+            )
+
+
+def top_menu_items(restaurants, since, limit=10):
+    """Top selling menu items of restaurants since a date, ranked by quantity sold.
+
+    Rows keep the keys used by the dashboard template (menu_item__name,
+    menu_item__restaurant__name, total_quantity, total_revenue).
+    """
+    return list(
+        MenuItemSales.objects.filter(restaurant__in=restaurants, date__gte=since)
+        .values("menu_item", "menu_item__name", "menu_item__restaurant__name")
+        .annotate(total_quantity=Sum("quantity"), total_revenue=Sum("revenue"))
+        .order_by("-total_quantity", "-total_revenue")[:limit]
+    )
+
+
+def record_order_customer(order):
+    """Add the customer of order to the restaurant's sketches for the order day.
+
+    The customer is a repeat one when they ordered from any restaurant of the same
+    vendor before, so the union of a vendor's sketches counts vendor-level repeats.
+    """
+    day = timezone.localdate(order.created_at)
+    is_repeat = Order.objects.filter(
+        customer_id=order.customer_id,
+        restaurant__vendor_id=Restaurant.objects.filter(pk=order.restaurant_id).values("vendor_id")[:1],
+        created_at__lt=order.created_at,
+    ).exists()
+    with transaction.atomic():
+        sketch, _ = CustomerSketch.objects.select_for_update().get_or_create(
+            restaurant_id=order.restaurant_id,
+            date=day,
+            defaults={"customers": b"", "repeat_customers": b""},
+        )
+        fields = ["customers"]
+        customers = HyperLogLog.from_bytes(sketch.customers)
+        customers.add(order.customer_id)
+        sketch.customers = customers.to_bytes()
+        if is_repeat:
+            repeat = HyperLogLog.from_bytes(sketch.repeat_customers)
+            repeat.add(order.customer_id)
+            sketch.repeat_customers = repeat.to_bytes()
+            fields.append("repeat_customers")
+        sketch.save(update_fields=fields)
+
+
+def customer_metrics(restaurants, start=None, end=None):
+    """Unique and repeat customer estimates of restaurants between two dates (inclusive).
+
+    Either bound may be omitted. A repeat customer is one who placed an order in the
+    window that was not their first with the vendor of that restaurant.
+    """
+    sketches = CustomerSketch.objects.filter(restaurant__in=restaurants)
+    if start is not None:
+        sketches = sketches.filter(date__gte=start)
+    if end is not None:
+        sketches = sketches.filter(date__lte=end)
+
+    customers = HyperLogLog()
+    repeat = HyperLogLog()
+    for row in sketches.values_list("customers", "repeat_customers").iterator():
+        customers.merge(HyperLogLog.from_bytes(row[0]))
+        repeat.merge(HyperLogLog.from_bytes(row[1]))
+
+    total_customers = customers.count()
+    # Both estimates carry independent error, keep the ratio meaningful
+    repeat_customers = min(repeat.count(), total_customers)
+    retention = (repeat_customers / total_customers * 100) if total_customers > 0 else 0
+    return {
+        "total_customers": total_customers,
+        "repeat_customers": repeat_customers,
+        "customer_retention": retention,
+    }
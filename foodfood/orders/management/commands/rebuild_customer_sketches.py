@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from orders.models import Order, CustomerSketch
+from orders.sketches import HyperLogLog
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily customer sketches from existing orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of orders read per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        orders = (
+            Order.objects
+            .order_by('restaurant__vendor_id', 'created_at', 'id')
+            .values_list('restaurant__vendor_id', 'restaurant_id', 'customer_id', 'created_at')
+        )
+
+        created = 0
+        with transaction.atomic():
+            CustomerSketch.objects.all().delete()
+            # Orders are walked vendor by vendor, in order: a repeat customer is one who
+            # already ordered from any restaurant of the vendor. Only one vendor's
+            # customers and daily sketches are held in memory at a time.
+            current_vendor = None
+            seen_customers = set()
+            sketches = {}
+            for vendor_id, restaurant_id, customer_id, created_at in orders.iterator(chunk_size=batch_size):
+                if vendor_id != current_vendor:
+                    created += self.flush(sketches)
+                    current_vendor = vendor_id
+                    seen_customers = set()
+                    sketches = {}
+                key = (restaurant_id, timezone.localdate(created_at))
+                customers, repeat = sketches.setdefault(key, (HyperLogLog(), HyperLogLog()))
+                customers.add(customer_id)
+                if customer_id in seen_customers:
+                    repeat.add(customer_id)
+                else:
+                    seen_customers.add(customer_id)
+            created += self.flush(sketches)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} customer sketches'))
+
+    def flush(self, sketches):
+        if not sketches:
+            return 0
+        CustomerSketch.objects.bulk_create([
+            CustomerSketch(
+                restaurant_id=restaurant_id,
+                date=day,
+                customers=customers.to_bytes(),
+                repeat_customers=repeat.to_bytes(),
+            )
+            for (restaurant_id, day), (customers, repeat) in sketches.items()
+        ])
+        return len(sketches)
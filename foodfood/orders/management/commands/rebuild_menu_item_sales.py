@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from orders.models import OrderItem, MenuItemSales
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily menu item sales counters from existing order lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of counter rows inserted per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        line_revenue = ExpressionWrapper(
+            F('price') * F('quantity'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+        rows = (
+            OrderItem.objects
+            .annotate(day=TruncDate('order__created_at'))
+            .values('menu_item', 'menu_item__restaurant', 'day')
+            .annotate(total_quantity=Sum('quantity'), total_revenue=Sum(line_revenue))
+            .order_by()
+        )
+
+        created = 0
+        with transaction.atomic():
+            MenuItemSales.objects.all().delete()
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(MenuItemSales(
+                    restaurant_id=row['menu_item__restaurant'],
+                    menu_item_id=row['menu_item'],
+                    date=row['day'],
+                    quantity=row['total_quantity'],
+                    revenue=row['total_revenue'],
+                ))
+                if len(batch) >= batch_size:
+                    MenuItemSales.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            if batch:
+                MenuItemSales.objects.bulk_create(batch)
+                created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} menu item sales rows'))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('restaurants', '0005_remove_restaurant_cuisine_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='restaurants.menuitem')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='menu_item_sales', to='restaurants.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['restaurant', 'date'], name='orders_menu_restaur_c5610f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('menu_item', 'date'), name='unique_menu_item_sales_per_day')],
+            },
+        ),
+    ]
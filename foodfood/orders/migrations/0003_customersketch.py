@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_menuitemsales'),
+        ('restaurants', '0005_remove_restaurant_cuisine_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('customers', models.BinaryField()),
+                ('repeat_customers', models.BinaryField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='customer_sketches', to='restaurants.restaurant')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('restaurant', 'date'), name='unique_customer_sketch_per_day')],
+            },
+        ),
+    ]
@@ -27,6 +27,7 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
     delivery_address = models.TextField()
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Order #{self.pk} - {self.customer.user.username}"
@@ -34,7 +35,7 @@ class Order(models.Model):
     def recalculate_total(self):
         subtotal = sum(item.quantity * item.price for item in self.items.all())
         self.total_amount = subtotal + (self.restaurant.delivery_fee or 0)
-        self.save(update_fields=["total_amount"]) 
+        self.save(update_fields=["total_amount", "updated_at"])
 
 
 class OrderItem(models.Model):
@@ -46,4 +47,47 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.menu_item.name}"
 
-# Create your models here.
+
+class MenuItemSales(models.Model):
+    """Daily sales counters per menu item, maintained at checkout.
+
+    Keeps the dashboard's top-sellers ranking off the OrderItem table: a 30 day window
+    reads at most 30 rows per menu item of the restaurant.
+    """
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name="menu_item_sales")
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="daily_sales")
+    date = models.DateField()
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["menu_item", "date"], name="unique_menu_item_sales_per_day"),
+        ]
+        indexes = [
+            models.Index(fields=["restaurant", "date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item_id} on {self.date}: {self.quantity}"
+
+
+class CustomerSketch(models.Model):
+    """Daily HyperLogLog sketches of the customers of a restaurant.
+
+    customers holds everyone who ordered that day, repeat_customers those whose order
+    was not their first with the restaurant's vendor. Merging the rows of any date
+    range gives unique and repeat customer estimates without touching the orders table.
+    """
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name="customer_sketches")
+    date = models.DateField()
+    customers = models.BinaryField()
+    repeat_customers = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["restaurant", "date"], name="unique_customer_sketch_per_day"),
+        ]
+
+    def __str__(self):
+        return f"Customers of {self.restaurant_id} on {self.date}"
@@ -0,0 +1,55 @@
+import hashlib
+import math
+
+DEFAULT_PRECISION = 11  # 2048 one-byte registers, ~2.3% standard error
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch.
+
+    Registers are stored as raw bytes so a sketch can live in a BinaryField. Sketches
+    with the same precision merge by taking the register-wise maximum, which makes
+    a date range the union of its daily sketches.
+    """
+
+    def __init__(self, registers=None, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers:
+            if len(registers) != self.size:
+                raise ValueError(f"Expected {self.size} registers, got {len(registers)}")
+            self.registers = bytearray(registers)
+        else:
+            self.registers = bytearray(self.size)
+
+    @classmethod
+    def from_bytes(cls, data, precision=DEFAULT_PRECISION):
+        return cls(bytes(data) if data else None, precision=precision)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        index = hashed >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        remainder = hashed & ((1 << remaining_bits) - 1)
+        rank = remaining_bits - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precisions")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Linear counting is far more accurate for small cardinalities
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
@@ -1,3 +1,187 @@
+import math
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Customer, Vendor
+from accounts.profiles import get_customer_profile
+from foodfood.testing import MarketplaceData, QueryBudgetTestCase
+from restaurants.models import Restaurant
+from .analytics import customer_metrics, record_order_customer, record_order_sales, top_menu_items
+from .models import MenuItemSales, Order, OrderItem
+from .sketches import DEFAULT_PRECISION
+
+
+class OrderQueryBudgetTests(QueryBudgetTestCase):
+    def test_order_list(self):
+        self.assertQueryBudget(reverse('order-list'), 3, user=self.data.customer_user)
+
+    def test_order_detail(self):
+        self.assertQueryBudget(lambda: reverse('order-detail', args=[self.data.orders[-1].pk]), 6,
+                               user=self.data.customer_user)
+
+    def test_order_history(self):
+        self.assertQueryBudget(reverse('order-history'), 4, user=self.data.customer_user)
+
+    def test_cart(self):
+        def cart_url():
+            self.client.force_login(self.data.customer_user)
+            for item in self.data.restaurants[-1].menu_items.all():
+                self.client.get(reverse('add-to-cart', args=[item.pk]))
+            return reverse('cart-view')
+        self.assertQueryBudget(cart_url, 4, user=self.data.customer_user)
+
+    def test_order_detail_not_modified(self):
+        self.data.grow(1)
+        order = self.data.orders[-1]
+        url = reverse('order-detail', args=[order.pk])
+        self.client.force_login(self.data.customer_user)
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        order.status = order.STATUS_ACCEPTED
+        order.save()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+        # The page header differs per user, and so does the ETag
+        self.client.force_login(self.data.vendor_user)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+
+class CustomerSketchTests(TestCase):
+    # Three standard errors of a precision 11 HyperLogLog
+    error_bound = 3 * 1.04 / math.sqrt(1 << DEFAULT_PRECISION)
+
+    def setUp(self):
+        vendor = Vendor.objects.create(user=User.objects.create_user("sketch_vendor"), restaurant_name="Sketch")
+        self.first = Restaurant.objects.create(vendor=vendor, name="Sketch One")
+        self.second = Restaurant.objects.create(vendor=vendor, name="Sketch Two")
+        User.objects.bulk_create(User(username=f"sketch_{n}") for n in range(300))
+        Customer.objects.bulk_create(
+            Customer(user=user, phone="9999999999") for user in User.objects.filter(username__startswith="sketch_")
+            .exclude(username="sketch_vendor")
+        )
+        start = timezone.now() - timedelta(days=10)
+        self.orders = []
+        for n, customer in enumerate(Customer.objects.order_by("pk")):
+            restaurants = [self.first]
+            if n % 5 < 2:
+                # Repeat with the vendor at its other restaurant only
+                restaurants.append(self.second)
+            elif n % 5 == 2:
+                restaurants.append(self.first)
+            for offset, restaurant in enumerate(restaurants):
+                self.orders.append(Order.objects.create(
+                    customer=customer, restaurant=restaurant, delivery_address="1 Sketch Street",
+                    created_at=start + timedelta(days=n % 7 + offset, seconds=n),
+                ))
+
+    def assertWithinBound(self, estimate, exact):
+        self.assertLessEqual(abs(estimate - exact), exact * self.error_bound, f"{estimate} vs {exact}")
+
+    def assertMatchesOrders(self):
+        orders_per_customer = Counter(order.customer_id for order in self.orders)
+        exact_customers = len(orders_per_customer)
+        exact_repeat = sum(1 for count in orders_per_customer.values() if count > 1)
+        metrics = customer_metrics([self.first, self.second])
+        self.assertWithinBound(metrics["total_customers"], exact_customers)
+        self.assertWithinBound(metrics["repeat_customers"], exact_repeat)
+
+    def test_vendor_level_estimates(self):
+        for order in self.orders:
+            record_order_customer(order)
+        self.assertMatchesOrders()
+
+    def test_rebuild_matches_checkout(self):
+        call_command("rebuild_customer_sketches", stdout=StringIO())
+        self.assertMatchesOrders()
+
+
+class MenuItemSalesTests(TestCase):
+    def setUp(self):
+        self.data = MarketplaceData()
+        self.data.grow(1)
+        self.restaurant = self.data.restaurants[0]
+        self.dishes = list(self.restaurant.menu_items.order_by("pk"))
+
+    def order(self, *lines, days_ago=0):
+        order = Order.objects.create(customer=self.data.customer, restaurant=self.restaurant,
+                                     delivery_address="1 Budget Street",
+                                     created_at=timezone.now() - timedelta(days=days_ago))
+        items = [OrderItem(order=order, menu_item=dish, quantity=quantity, price=dish.price)
+                 for dish, quantity in lines]
+        record_order_sales(order, items)
+        return order
+
+    def sales(self, dish):
+        return {row.date: (row.quantity, row.revenue) for row in MenuItemSales.objects.filter(menu_item=dish)}
+
+    def test_daily_counters(self):
+        dish = self.dishes[0]
+        self.order((dish, 2))
+        self.order((dish, 3))
+        self.order((dish, 1), days_ago=1)
+        today = timezone.localdate()
+        self.assertEqual(self.sales(dish), {
+            today: (5, dish.price * 5),
+            today - timedelta(days=1): (1, dish.price),
+        })
+
+    def test_concurrent_first_sale_of_the_day(self):
+        dish = self.dishes[0]
+        filter_sales = MenuItemSales.objects.filter
+        missed = []
+
+        def filter_before_other_checkout(*args, **kwargs):
+            # The first update runs before another checkout inserts today's row
+            if not missed:
+                missed.append(True)
+                MenuItemSales.objects.create(restaurant=self.restaurant, menu_item=dish, date=timezone.localdate(),
+                                             quantity=2, revenue=dish.price * 2)
+                return mock.Mock(**{"update.return_value": 0})
+            return filter_sales(*args, **kwargs)
+
+        with mock.patch.object(MenuItemSales.objects, "filter", side_effect=filter_before_other_checkout):
+            self.order((dish, 2))
+        # The insert hits the unique constraint and falls back to the update
+        self.assertEqual(self.sales(dish), {timezone.localdate(): (4, dish.price * 4)})
+
+    def test_top_menu_items(self):
+        first, second, third = self.dishes[:3]
+        self.order((first, 1), (second, 3), (third, 3))
+        self.order((first, 1), days_ago=40)
+        top = top_menu_items([self.restaurant], timezone.localdate() - timedelta(days=30), limit=2)
+        # Ties on quantity go to the higher revenue
+        expected = sorted([second, third], key=lambda dish: -dish.price)
+        self.assertEqual([row["menu_item"] for row in top], [dish.pk for dish in expected])
+        self.assertEqual(top[0]["total_quantity"], 3)
+        self.assertEqual(top[0]["total_revenue"], expected[0].price * 3)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.data = MarketplaceData()
+        self.data.grow(1)
+        self.client.force_login(self.data.customer_user)
+
+    def test_order_gets_the_current_address(self):
+        # This worker cached the profile; another worker then saved a new address
+        get_customer_profile(self.data.customer_user)
+        Customer.objects.filter(pk=self.data.customer.pk).update(address="2 New Street")
+        self.assertEqual(get_customer_profile(User.objects.get(pk=self.data.customer_user.pk)).address,
+                         "1 Budget Street")
 
-# Create your tests here.
+        item = self.data.restaurants[0].menu_items.first()
+        self.client.get(reverse('add-to-cart', args=[item.pk]))
+        self.client.post(reverse('checkout'))
+        self.assertEqual(Order.objects.latest('pk').delivery_address, "2 New Street")
@@ -1,11 +1,20 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from functools import partial
+
+from django.shortcuts import aget_object_or_404, render, get_object_or_404, redirect
 from django.views.generic import ListView, DetailView
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.db import transaction
+from django.db.models import Max
+from django.http import Http404
 from .models import Order, OrderItem
+from .analytics import record_order_sales, record_order_customer
+from restaurants.cache import aget_available_menu, aget_restaurant, arestaurant_version
 from restaurants.models import MenuItem, Restaurant
-from accounts.models import Customer
+from accounts.profiles import get_customer_profile
+from foodfood.conditional import conditional, session_stamp, stamp_etag
+from foodfood.shortcuts import arender
+from payments.gateway import prepare_gateway_order
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 
@@ -16,6 +25,9 @@ class OrderListView(ListView):
     template_name = 'orders/list.html'
     context_object_name = 'orders'
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('restaurant')
+
 
 @method_decorator(login_required, name='dispatch')
 class OrderDetailView(DetailView):
@@ -23,19 +35,43 @@ class OrderDetailView(DetailView):
     template_name = 'orders/detail.html'
     context_object_name = 'order'
 
+    def get(self, request, *args, **kwargs):
+        # The page shows the order, its restaurant and its items' menu entries
+        stamp = (
+            Order.objects.filter(pk=kwargs['pk'])
+            .annotate(items_updated=Max('items__menu_item__updated_at'))
+            .values_list('updated_at', 'restaurant__updated_at', 'items_updated').first()
+        )
+        if stamp is None:
+            raise Http404("No order found matching the query")
+        etag = stamp_etag(session_stamp(request), "order", *stamp)
+        last_modified = max(value for value in stamp if value is not None)
+        return conditional(request, etag, last_modified, partial(super().get, request, *args, **kwargs))
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('restaurant').prefetch_related('items__menu_item')
+
 
 def _get_cart(session):
+    # An empty cart is not stored until something is added, so browsing never
+    # writes the session
     cart = session.get('cart')
     if not cart:
         cart = {"items": {}, "restaurant_id": None}
-        session['cart'] = cart
+    return cart
+
+
+async def _aget_cart(session):
+    cart = await session.aget('cart')
+    if not cart:
+        cart = {"items": {}, "restaurant_id": None}
     return cart
 
 
 @login_required
-def add_to_cart(request, menu_item_id):
-    item = get_object_or_404(MenuItem, id=menu_item_id, is_available=True)
-    cart = _get_cart(request.session)
+async def add_to_cart(request, menu_item_id):
+    item = await aget_object_or_404(MenuItem, id=menu_item_id, is_available=True)
+    cart = await _aget_cart(request.session)
     
     # Check if adding item from different restaurant
     if cart["restaurant_id"] and cart["restaurant_id"] != item.restaurant_id:
@@ -48,7 +84,7 @@ def add_to_cart(request, menu_item_id):
     
     cart_items = cart["items"]
     cart_items[str(menu_item_id)] = cart_items.get(str(menu_item_id), 0) + 1
-    request.session['cart'] = cart
+    await request.session.aset('cart', cart)
     
     # Add success message
     messages.success(request, f"'{item.name}' has been added to your cart!")
@@ -70,8 +106,8 @@ def remove_from_cart(request, menu_item_id):
 
 
 @login_required
-def cart_view(request):
-    cart = _get_cart(request.session)
+async def cart_view(request):
+    cart = await _aget_cart(request.session)
     items = []
     subtotal = 0
     restaurant = None
@@ -80,24 +116,27 @@ def cart_view(request):
     if cart["items"]:
         ids = [int(k) for k in cart["items"].keys()]
         qs = MenuItem.objects.filter(id__in=ids)
-        for mi in qs:
+        async for mi in qs:
             qty = cart["items"].get(str(mi.id), 0)
             line_total = mi.price * qty
             subtotal += line_total
             items.append({"menu_item": mi, "quantity": qty, "line_total": line_total})
         if cart["restaurant_id"]:
-            restaurant = Restaurant.objects.filter(id=cart["restaurant_id"]).first()
+            # One version lookup for both cached entries
+            version = await arestaurant_version(cart["restaurant_id"])
+            restaurant = await aget_restaurant(cart["restaurant_id"], version)
             
             # Get suggestions: other menu items from the same restaurant
             # Exclude items already in cart
-            suggestions = MenuItem.objects.filter(
-                restaurant=restaurant,
-                is_available=True
-            ).exclude(id__in=ids).order_by('category', 'name')[:6]  # Limit to 6 suggestions
+            menu = await aget_available_menu(cart["restaurant_id"], version)
+            suggestions = sorted(
+                (mi for mi in menu if mi.id not in ids),
+                key=lambda mi: (mi.category, mi.name),
+            )[:6]  # Limit to 6 suggestions
     
     delivery_fee = restaurant.delivery_fee if restaurant else 0
     total = subtotal + (delivery_fee or 0)
-    return render(request, 'orders/cart.html', {
+    return await arender(request, 'orders/cart.html', {
         "cart_items": items,
         "subtotal": subtotal,
         "delivery_fee": delivery_fee,
@@ -116,7 +155,8 @@ def checkout_view(request):
     if not cart["items"]:
         return redirect('cart-view')
     restaurant = get_object_or_404(Restaurant, id=cart["restaurant_id"])
-    customer, _ = Customer.objects.get_or_create(user=request.user)
+    # Uncached: the phone and address are copied into the order
+    customer = get_customer_profile(request.user, create=True, cached=False)
     if not customer.phone:
         messages.warning(request, "Please provide your phone number before checkout.")
         return redirect('/accounts/profile/')
@@ -129,12 +169,17 @@ def checkout_view(request):
     # create items
     ids = [int(k) for k in cart["items"].keys()]
     menu_items = {mi.id: mi for mi in MenuItem.objects.filter(id__in=ids)}
+    order_items = []
     for mid, qty in cart["items"].items():
         mi = menu_items.get(int(mid))
         if not mi:
             continue
-        OrderItem.objects.create(order=order, menu_item=mi, quantity=qty, price=mi.price)
+        order_items.append(OrderItem.objects.create(order=order, menu_item=mi, quantity=qty, price=mi.price))
     order.recalculate_total()
+    record_order_sales(order, order_items)
+    record_order_customer(order)
+    # Create the payment gateway order ahead of the payment page, outside the request
+    transaction.on_commit(lambda: prepare_gateway_order(order.pk))
     # clear cart
     request.session['cart'] = {"items": {}, "restaurant_id": None}
     return redirect('order-detail', pk=order.pk)
@@ -142,8 +187,11 @@ def checkout_view(request):
 
 @login_required
 def order_history(request):
-    customer = Customer.objects.filter(user=request.user).first()
-    orders = Order.objects.filter(customer=customer).order_by('-created_at') if customer else []
+    customer = get_customer_profile(request.user)
+    orders = (
+        Order.objects.filter(customer=customer).select_related('restaurant').order_by('-created_at')
+        if customer else []
+    )
     return render(request, 'orders/history.html', {"orders": orders})
 
 # Create your views here.
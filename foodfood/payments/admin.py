@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment
+from .models import Payment, GatewayOrder, WebhookEvent
 
 
 @admin.register(Payment)
@@ -7,4 +7,15 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ("order", "method", "amount", "status", "transaction_id", "created_at")
     list_filter = ("status", "method")
 
+
+@admin.register(GatewayOrder)
+class GatewayOrderAdmin(admin.ModelAdmin):
+    list_display = ("gateway_order_id", "order", "amount", "currency", "created_at", "expires_at", "superseded_at")
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "event_type", "received_at", "processed_at", "attempts")
+    list_filter = ("event_type",)
+
 # Register your models here.
@@ -0,0 +1,310 @@
+"""
+Payment gateway access.
+
+get_gateway() returns a process-wide gateway selected by settings.PAYMENT_GATEWAY:
+"razorpay" talks to Razorpay through one pooled HTTP session with strict timeouts,
+bounded retries and a circuit breaker; "stub" is the in-process StubGateway from
+payments.stub, for offline development and load tests.
+"""
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from foodfood.executors import get_executor
+from .models import GatewayOrder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GATEWAY_OPTIONS = {
+    'connect_timeout': 3.05,
+    'read_timeout': 10,
+    'retries': 2,
+    'backoff_factor': 0.3,
+    'backoff_jitter': 0.3,
+    'pool_size': 10,
+    'breaker_failure_threshold': 5,
+    'breaker_reset_seconds': 30,
+}
+
+# How long a claim on an order's gateway order may stay unfulfilled, and how often
+# other callers check whether it was
+GATEWAY_ORDER_CLAIM_SECONDS = 30
+GATEWAY_ORDER_POLL_SECONDS = 0.2
+
+
+class GatewayError(Exception):
+    """The payment gateway could not complete a call."""
+
+
+class GatewayUnavailable(GatewayError):
+    """The circuit breaker is open: the gateway is not called at all."""
+
+
+class SignatureVerificationError(GatewayError):
+    """A payment or webhook signature does not match."""
+
+
+def gateway_options():
+    return {**DEFAULT_GATEWAY_OPTIONS, **getattr(settings, 'PAYMENT_GATEWAY_OPTIONS', {})}
+
+
+def signature_matches(message, signature, secret):
+    expected = hmac.new(secret.encode(), message.encode() if isinstance(message, str) else message,
+                        hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, str(signature))
+
+
+class CircuitBreaker:
+    """Fail fast after repeated failures, then let a single trial call through.
+
+    closed: calls pass; failure_threshold consecutive failures open the circuit.
+    open: calls raise GatewayUnavailable until reset_seconds have passed.
+    half-open: one trial call passes; success closes the circuit, failure reopens it.
+
+    Only exceptions in failure_exceptions count as failures. Any other exception is
+    passed through as an answer from a working gateway, e.g. a rejected request.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=30, failure_exceptions=(Exception,)):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failure_exceptions = failure_exceptions
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+
+    def call(self, func, *args, **kwargs):
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self.trial_in_progress):
+                raise GatewayUnavailable("Payment gateway temporarily unavailable")
+            if state == 'half-open':
+                self.trial_in_progress = True
+        try:
+            result = func(*args, **kwargs)
+        except self.failure_exceptions:
+            self._record_failure()
+            raise
+        except Exception:
+            self._record_success()
+            raise
+        self._record_success()
+        return result
+
+    def _record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_progress = False
+
+    def _record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_progress = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                logger.warning("Payment gateway circuit opened after %s failures", self.failures)
+
+
+def build_http_session(options):
+    """A requests session with a bounded connection pool, default timeouts and retries.
+
+    Only connection errors are retried for POST, so a request the gateway may have
+    received is never replayed.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class TimeoutSession(requests.Session):
+        def request(self, method, url, **kwargs):
+            kwargs.setdefault('timeout', (options['connect_timeout'], options['read_timeout']))
+            return super().request(method, url, **kwargs)
+
+    retry = Retry(
+        total=options['retries'],
+        connect=options['retries'],
+        read=0,
+        status=options['retries'],
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        backoff_factor=options['backoff_factor'],
+        backoff_jitter=options['backoff_jitter'],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=options['pool_size'],
+        pool_maxsize=options['pool_size'],
+        max_retries=retry,
+    )
+    session = TimeoutSession()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def transient_errors():
+    """Exceptions of a Razorpay call that mean the gateway is failing, not the request.
+
+    Timeouts, connection errors and 5xx answers; a 5xx error page that is not JSON
+    (e.g. from a proxy in front of Razorpay) surfaces as a JSONDecodeError.
+    """
+    import razorpay
+    import requests
+
+    return (requests.Timeout, requests.ConnectionError, requests.JSONDecodeError,
+            razorpay.errors.ServerError, razorpay.errors.GatewayError)
+
+
+class RazorpayGateway:
+    def __init__(self, key_id, key_secret, options=None):
+        import razorpay
+
+        self.options = options or gateway_options()
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.client = razorpay.Client(session=build_http_session(self.options), auth=(key_id, key_secret))
+        self.breaker = CircuitBreaker(
+            failure_threshold=self.options['breaker_failure_threshold'],
+            reset_seconds=self.options['breaker_reset_seconds'],
+            failure_exceptions=transient_errors(),
+        )
+
+    def _call(self, func, *args, **kwargs):
+        import razorpay
+
+        if not self.key_id or not self.key_secret or self.key_id.startswith("rzp_test_xxxxx"):
+            raise GatewayError("Razorpay test keys not configured")
+        try:
+            return self.breaker.call(func, *args, **kwargs)
+        except GatewayError:
+            raise
+        except razorpay.errors.BadRequestError as exc:
+            raise GatewayError(str(exc)) from exc
+        except Exception as exc:
+            raise GatewayError(f"Payment gateway error: {exc}") from exc
+
+    def create_order(self, amount, currency="INR", receipt=None):
+        data = {"amount": amount, "currency": currency, "payment_capture": 1}
+        if receipt:
+            data["receipt"] = receipt
+        return self._call(self.client.order.create, data)
+
+    def fetch_order_payments(self, gateway_order_id):
+        return self._call(self.client.order.payments, gateway_order_id).get("items", [])
+
+    def verify_payment_signature(self, gateway_order_id, payment_id, signature):
+        if not signature_matches(f"{gateway_order_id}|{payment_id}", signature, self.key_secret):
+            raise SignatureVerificationError("Razorpay signature verification failed")
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Return the process-wide payment gateway, building it on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                if getattr(settings, 'PAYMENT_GATEWAY', 'razorpay') == 'stub':
+                    from .stub import StubGateway
+                    _gateway = StubGateway(settings.RAZORPAY_KEY_SECRET)
+                else:
+                    _gateway = RazorpayGateway(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
+    return _gateway
+
+
+def reset_gateway():
+    """Drop the process-wide gateway, e.g. after changing settings in tests."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = None
+
+
+def order_amount_paise(order):
+    return int(order.total_amount * 100)
+
+
+def _create_at_gateway(claim):
+    try:
+        data = get_gateway().create_order(claim.amount, currency=claim.currency, receipt=f"order-{claim.order_id}")
+    except Exception:
+        # Release the claim so that the next caller tries again
+        claim.delete()
+        raise
+    ttl = getattr(settings, "RAZORPAY_ORDER_TTL_SECONDS", 6 * 60 * 60)
+    claim.gateway_order_id = data["id"]
+    claim.expires_at = timezone.now() + timedelta(seconds=ttl)
+    claim.save(update_fields=["gateway_order_id", "expires_at"])
+    return claim
+
+
+def ensure_gateway_order(order):
+    """Return a usable GatewayOrder for order, creating one at the gateway only if needed.
+
+    A stored gateway order is reused as long as its amount matches and it has not
+    expired, so page refreshes never reach the gateway. Otherwise callers race to claim
+    the order's current row with get_or_create (a unique constraint allows one): the
+    winner creates the gateway order, the others wait for it. Replaced gateway orders
+    are kept, marked superseded.
+    """
+    amount = order_amount_paise(order)
+    deadline = time.monotonic() + GATEWAY_ORDER_CLAIM_SECONDS
+    while True:
+        now = timezone.now()
+        current = GatewayOrder.objects.filter(order=order, superseded_at__isnull=True).first()
+        if current is not None and current.is_usable_for(amount, now):
+            return current
+        if current is not None and (current.gateway_order_id is not None or current.expires_at <= now):
+            # Expired, for another amount, or a claim abandoned by a crashed process
+            GatewayOrder.objects.filter(pk=current.pk, superseded_at__isnull=True).update(superseded_at=now)
+            current = None
+        if current is None:
+            claim, created = GatewayOrder.objects.get_or_create(
+                order=order,
+                superseded_at=None,
+                defaults={"amount": amount, "expires_at": now + timedelta(seconds=GATEWAY_ORDER_CLAIM_SECONDS)},
+            )
+            if created:
+                return _create_at_gateway(claim)
+            continue
+        # Another process holds the claim and is calling the gateway
+        if time.monotonic() >= deadline:
+            raise GatewayError("The payment gateway order is still being created, please retry")
+        time.sleep(GATEWAY_ORDER_POLL_SECONDS)
+
+
+def prepare_gateway_order(order_id):
+    """Create the gateway order of a freshly placed order in the bounded "gateway" pool."""
+    from orders.models import Order
+
+    def run():
+        close_old_connections()
+        try:
+            order = Order.objects.filter(pk=order_id).first()
+            if order is not None:
+                ensure_gateway_order(order)
+        except Exception:
+            logger.warning("Could not prepare gateway order for order %s", order_id, exc_info=True)
+        finally:
+            close_old_connections()
+
+    return get_executor("gateway").submit(run)
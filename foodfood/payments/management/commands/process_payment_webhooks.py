@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from payments.webhooks import process_pending_events
+
+
+class Command(BaseCommand):
+    help = 'Apply queued payment webhook events to payments and orders in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running, polling the inbox every --interval seconds when idle',
+        )
+        parser.add_argument('--interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            handled = process_pending_events(batch_size=options['batch_size'])
+            total += handled
+            if handled:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} webhook events'))
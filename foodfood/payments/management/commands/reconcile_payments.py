@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from payments.reconciliation import reconcile_pending_payments
+
+
+class Command(BaseCommand):
+    help = 'Reconcile unpaid gateway orders and pending cash payments against the gateway and order state'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Orders or payments read and updated per keyset page')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Maximum gateway lookups in flight')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        summary = reconcile_pending_payments(
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+            dry_run=options['dry_run'],
+        )
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Scanned {summary['scanned']} unpaid orders and pending payments: "
+            f"{summary['success']} succeeded, {summary['failed']} failed, "
+            f"{summary['unchanged']} unchanged, {summary['errors']} errors"
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_customersketch'),
+        ('payments', '0002_alter_payment_method'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GatewayOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gateway_order_id', models.CharField(max_length=100, unique=True)),
+                ('amount', models.PositiveIntegerField(help_text='Amount in paise')),
+                ('currency', models.CharField(default='INR', max_length=3)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='gateway_order', to='orders.order')),
+            ],
+        ),
+    ]
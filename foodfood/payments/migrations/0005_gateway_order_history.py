@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_updated_at'),
+        ('payments', '0004_webhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gatewayorder',
+            name='superseded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gatewayorder',
+            name='gateway_order_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='gatewayorder',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gateway_orders', to='orders.order'),
+        ),
+        migrations.AddConstraint(
+            model_name='gatewayorder',
+            constraint=models.UniqueConstraint(condition=models.Q(('superseded_at__isnull', True)), fields=('order',), name='one_current_gateway_order'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from orders.models import Order
 
 
@@ -31,4 +32,56 @@ class Payment(models.Model):
     def __str__(self):
         return f"Payment for Order #{self.order_id} - {self.status}"
 
-# Create your models here.
+
+class GatewayOrder(models.Model):
+    """Payment gateway (Razorpay) order created for an app Order, reused while valid.
+
+    An order keeps every gateway order it ever had, so late webhooks and reconciliation
+    still match superseded ids; only the one with superseded_at unset is current. A
+    current row without gateway_order_id is a claim: some process is creating it.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="gateway_orders")
+    gateway_order_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    amount = models.PositiveIntegerField(help_text="Amount in paise")
+    currency = models.CharField(max_length=3, default="INR")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    superseded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["order"], condition=models.Q(superseded_at__isnull=True),
+                                    name="one_current_gateway_order"),
+        ]
+
+    def __str__(self):
+        return f"{self.gateway_order_id or 'pending'} for Order #{self.order_id}"
+
+    def is_usable_for(self, amount, now=None):
+        """True if this gateway order can still be paid for the given amount in paise."""
+        return (self.gateway_order_id is not None and self.superseded_at is None
+                and self.amount == amount and self.expires_at > (now or timezone.now()))
+
+
+class WebhookEvent(models.Model):
+    """Raw payment gateway webhook, stored on receipt and applied later in batches.
+
+    processed_at stays unset until the event applied; a failed event records its
+    error and is retried after next_attempt_at, up to a maximum number of attempts.
+    """
+    event_id = models.CharField(max_length=100, unique=True)
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["processed_at", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id})"
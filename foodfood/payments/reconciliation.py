@@ -0,0 +1,162 @@
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from django.utils import timezone
+
+from orders.models import Order
+from .gateway import GatewayError, get_gateway
+from .models import GatewayOrder, Payment
+from .webhooks import accept_orders
+
+logger = logging.getLogger(__name__)
+
+# Gateway orders expired longer ago than this can no longer change: their orders
+# are not scanned again
+RECONCILE_GRACE = timedelta(days=1)
+
+
+def _keyset_pages(queryset, batch_size):
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by("pk")[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def iter_unpaid_gateway_orders(batch_size, now=None):
+    """Yield orders with a recent gateway order and no successful payment, one keyset page at a time.
+
+    Card and UPI payments only get a Payment row once the gateway reports them, so
+    unpaid orders are found from their gateway orders, not from pending payments.
+    """
+    since = (now or timezone.now()) - RECONCILE_GRACE
+    recent = GatewayOrder.objects.filter(order=OuterRef("pk"), gateway_order_id__isnull=False, expires_at__gt=since)
+    orders = (
+        Order.objects.filter(Exists(recent))
+        .exclude(payment__status=Payment.STATUS_SUCCESS)
+        .select_related("payment")
+        .prefetch_related(
+            Prefetch("gateway_orders", queryset=GatewayOrder.objects.filter(gateway_order_id__isnull=False)),
+        )
+    )
+    return _keyset_pages(orders, batch_size)
+
+
+def iter_pending_cod_batches(batch_size):
+    """Yield pending cash on delivery payments, one keyset page at a time."""
+    payments = Payment.objects.filter(status=Payment.STATUS_PENDING, method=Payment.METHOD_COD).select_related("order")
+    return _keyset_pages(payments, batch_size)
+
+
+def _gateway_outcome(order, gateway_payments, now):
+    """Decide the payment status of an order from the gateway's view of its gateway orders."""
+    captured = [p for p in gateway_payments if p.get("status") == "captured"]
+    if captured:
+        return Payment.STATUS_SUCCESS, captured[0].get("id", "")
+    if gateway_payments and all(p.get("status") == "failed" for p in gateway_payments):
+        return Payment.STATUS_FAILED, gateway_payments[-1].get("id", "")
+    if not gateway_payments and all(g.expires_at <= now for g in order.gateway_orders.all()):
+        return Payment.STATUS_FAILED, ""
+    return None, None
+
+
+def _cod_outcome(payment):
+    """Cash on delivery is settled by the order itself."""
+    if payment.order.status == Order.STATUS_DELIVERED:
+        return Payment.STATUS_SUCCESS
+    if payment.order.status == Order.STATUS_CANCELLED:
+        return Payment.STATUS_FAILED
+    return None
+
+
+def reconcile_gateway_batch(batch, executor, dry_run=False):
+    """Ask the gateway about one batch of unpaid orders and record their payments."""
+    summary = Counter(scanned=len(batch))
+    now = timezone.now()
+    gateway = get_gateway()
+
+    # Superseded gateway orders may have been paid too
+    lookups = {
+        order.pk: [executor.submit(gateway.fetch_order_payments, g.gateway_order_id) for g in order.gateway_orders.all()]
+        for order in batch
+    }
+    to_create, to_update, paid_orders = [], [], []
+    for order in batch:
+        try:
+            gateway_payments = [p for lookup in lookups[order.pk] for p in lookup.result()]
+        except GatewayError as exc:
+            logger.warning("Could not reconcile order %s: %s", order.pk, exc)
+            summary["errors"] += 1
+            continue
+        status, transaction_id = _gateway_outcome(order, gateway_payments, now)
+        payment = getattr(order, "payment", None)
+        if status is None or (payment is not None and payment.status == status):
+            summary["unchanged"] += 1
+            continue
+        if status == Payment.STATUS_FAILED and payment is None and not transaction_id:
+            # Abandoned before paying: nothing to record
+            summary["unchanged"] += 1
+            continue
+        if payment is None:
+            payment = Payment(order=order, method=Payment.METHOD_CARD, amount=order.total_amount)
+            to_create.append(payment)
+        else:
+            to_update.append(payment)
+        payment.status = status
+        if transaction_id:
+            payment.transaction_id = transaction_id
+        summary[status] += 1
+        if status == Payment.STATUS_SUCCESS:
+            paid_orders.append(order)
+
+    if (to_create or to_update) and not dry_run:
+        with transaction.atomic():
+            # A webhook or the checkout may have recorded the payment meanwhile: theirs wins
+            Payment.objects.bulk_create(to_create, ignore_conflicts=True)
+            settled = set(
+                Payment.objects.select_for_update()
+                .filter(pk__in=[payment.pk for payment in to_update], status=Payment.STATUS_SUCCESS)
+                .values_list("pk", flat=True)
+            )
+            for payment in to_update:
+                if payment.pk in settled:
+                    summary[payment.status] -= 1
+                    summary["unchanged"] += 1
+            to_update = [payment for payment in to_update if payment.pk not in settled]
+            Payment.objects.bulk_update(to_update, ["status", "transaction_id"])
+            accept_orders(paid_orders)
+    return summary
+
+
+def reconcile_cod_batch(batch, dry_run=False):
+    """Settle one batch of pending cash on delivery payments from their orders."""
+    summary = Counter(scanned=len(batch))
+    changed = []
+    for payment in batch:
+        status = _cod_outcome(payment)
+        if status is None:
+            summary["unchanged"] += 1
+            continue
+        payment.status = status
+        changed.append(payment)
+        summary[status] += 1
+    if changed and not dry_run:
+        Payment.objects.bulk_update(changed, ["status"])
+    return summary
+
+
+def reconcile_pending_payments(batch_size=500, concurrency=8, dry_run=False):
+    """Reconcile unpaid gateway orders and pending cash payments; memory is bounded by batch_size."""
+    summary = Counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for batch in iter_unpaid_gateway_orders(batch_size):
+            summary.update(reconcile_gateway_batch(batch, executor, dry_run=dry_run))
+    for batch in iter_pending_cod_batches(batch_size):
+        summary.update(reconcile_cod_batch(batch, dry_run=dry_run))
+    return summary
@@ -0,0 +1,83 @@
+"""
+In-process stand-in for the Razorpay API, selected with PAYMENT_GATEWAY = "stub".
+
+Orders and payments live in memory. Signatures are computed exactly like Razorpay's,
+so the real verification code paths run unchanged. PAYMENT_STUB_LATENCY_MS adds an
+artificial delay to every call to mimic a remote gateway under load tests.
+"""
+import hashlib
+import hmac
+import itertools
+import threading
+import time
+
+from django.conf import settings
+
+from .gateway import GatewayError, SignatureVerificationError, signature_matches
+
+
+class StubGateway:
+    def __init__(self, key_secret):
+        self.key_secret = key_secret
+        self.orders = {}
+        self.payments = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        latency = getattr(settings, 'PAYMENT_STUB_LATENCY_MS', 0)
+        if latency:
+            time.sleep(latency / 1000)
+
+    def _next_id(self, prefix):
+        with self._lock:
+            return f"{prefix}_stub{next(self._ids):010d}"
+
+    def create_order(self, amount, currency="INR", receipt=None):
+        self._delay()
+        if amount <= 0:
+            raise GatewayError("Order amount must be positive")
+        order = {
+            "id": self._next_id("order"),
+            "amount": amount,
+            "currency": currency,
+            "receipt": receipt,
+            "status": "created",
+        }
+        with self._lock:
+            self.orders[order["id"]] = order
+            self.payments[order["id"]] = []
+        return order
+
+    def fetch_order_payments(self, gateway_order_id):
+        self._delay()
+        with self._lock:
+            if gateway_order_id not in self.orders:
+                raise GatewayError(f"Unknown order {gateway_order_id}")
+            return [dict(payment) for payment in self.payments[gateway_order_id]]
+
+    def verify_payment_signature(self, gateway_order_id, payment_id, signature):
+        if not signature_matches(f"{gateway_order_id}|{payment_id}", signature, self.key_secret):
+            raise SignatureVerificationError("Stub signature verification failed")
+
+    def sign(self, message):
+        return hmac.new(self.key_secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+    def simulate_payment(self, gateway_order_id, status="captured"):
+        """Record a payment against a stub order and return the checkout callback params."""
+        payment = {
+            "id": self._next_id("pay"),
+            "order_id": gateway_order_id,
+            "status": status,
+        }
+        with self._lock:
+            order = self.orders[gateway_order_id]
+            payment["amount"] = order["amount"]
+            self.payments[gateway_order_id].append(payment)
+            if status == "captured":
+                order["status"] = "paid"
+        return {
+            "razorpay_order_id": gateway_order_id,
+            "razorpay_payment_id": payment["id"],
+            "razorpay_signature": self.sign(f"{gateway_order_id}|{payment['id']}"),
+        }
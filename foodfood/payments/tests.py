@@ -1,3 +1,363 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
 
-# Create your tests here.
+import razorpay
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from foodfood.testing import MarketplaceData, QueryBudgetTestCase
+from orders.models import Order
+from . import webhooks
+from .gateway import (
+    CircuitBreaker, GatewayError, GatewayUnavailable, RazorpayGateway, build_http_session, ensure_gateway_order,
+    gateway_options, get_gateway, order_amount_paise, reset_gateway,
+)
+from .models import GatewayOrder, Payment, WebhookEvent
+from .reconciliation import _gateway_outcome, reconcile_pending_payments
+from .webhooks import process_pending_events
+
+
+@override_settings(PAYMENT_GATEWAY='stub')
+class PaymentQueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_gateway()
+        self.addCleanup(reset_gateway)
+
+    def test_upi_checkout(self):
+        self.assertQueryBudget(lambda: reverse('upi-checkout', args=[self.data.orders[-1].pk]), 4,
+                               user=self.data.customer_user)
+
+
+@override_settings(PAYMENT_GATEWAY='stub')
+class GatewayOrderTests(TestCase):
+    def setUp(self):
+        reset_gateway()
+        self.addCleanup(reset_gateway)
+        data = MarketplaceData()
+        data.grow(1)
+        self.order = data.orders[0]
+
+    def test_reused_while_valid(self):
+        first = ensure_gateway_order(self.order)
+        with mock.patch.object(get_gateway(), 'create_order') as create_order:
+            self.assertEqual(ensure_gateway_order(self.order), first)
+        create_order.assert_not_called()
+
+    def test_new_amount_supersedes_and_keeps_history(self):
+        first = ensure_gateway_order(self.order)
+        self.order.total_amount += 10
+        second = ensure_gateway_order(self.order)
+        self.assertNotEqual(second.gateway_order_id, first.gateway_order_id)
+        first.refresh_from_db()
+        self.assertIsNotNone(first.superseded_at)
+        self.assertEqual(self.order.gateway_orders.count(), 2)
+
+    def test_waits_for_a_concurrent_claim(self):
+        claim = GatewayOrder.objects.create(order=self.order, amount=order_amount_paise(self.order),
+                                            expires_at=timezone.now() + timedelta(seconds=30))
+
+        def other_process_finishes(seconds):
+            GatewayOrder.objects.filter(pk=claim.pk).update(gateway_order_id="order_other",
+                                                            expires_at=timezone.now() + timedelta(hours=1))
+
+        with mock.patch.object(get_gateway(), 'create_order') as create_order, \
+                mock.patch("payments.gateway.time.sleep", side_effect=other_process_finishes):
+            self.assertEqual(ensure_gateway_order(self.order).gateway_order_id, "order_other")
+        create_order.assert_not_called()
+
+    def test_only_one_current_claim(self):
+        GatewayOrder.objects.create(order=self.order, amount=1, expires_at=timezone.now())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            GatewayOrder.objects.create(order=self.order, amount=1, expires_at=timezone.now())
+
+    def test_abandoned_claim_is_replaced(self):
+        GatewayOrder.objects.create(order=self.order, amount=order_amount_paise(self.order),
+                                    expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNotNone(ensure_gateway_order(self.order).gateway_order_id)
+
+    def test_gateway_failure_releases_the_claim(self):
+        with mock.patch.object(get_gateway(), 'create_order', side_effect=GatewayError("down")):
+            with self.assertRaises(GatewayError):
+                ensure_gateway_order(self.order)
+        self.assertFalse(self.order.gateway_orders.exists())
+        self.assertIsNotNone(ensure_gateway_order(self.order).gateway_order_id)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        clock = mock.patch("payments.gateway.time")
+        self.time = clock.start()
+        self.addCleanup(clock.stop)
+        self.time.monotonic.return_value = 1000.0
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30, failure_exceptions=(TimeoutError,))
+
+    def fail(self, exc=TimeoutError):
+        with self.assertRaises(exc):
+            self.breaker.call(mock.Mock(side_effect=exc))
+
+    def test_opens_after_threshold(self):
+        self.fail()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.fail()
+        self.assertEqual(self.breaker.state, 'open')
+        func = mock.Mock()
+        with self.assertRaises(GatewayUnavailable):
+            self.breaker.call(func)
+        func.assert_not_called()
+
+    def test_success_resets_the_count(self):
+        self.fail()
+        self.breaker.call(mock.Mock())
+        self.fail()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_half_open_trial(self):
+        self.fail()
+        self.fail()
+        self.time.monotonic.return_value += 30
+        self.assertEqual(self.breaker.state, 'half-open')
+
+        def trial():
+            # Only one call goes through while the trial runs
+            with self.assertRaises(GatewayUnavailable):
+                self.breaker.call(mock.Mock())
+            return "ok"
+
+        self.assertEqual(self.breaker.call(trial), "ok")
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_failed_trial_reopens(self):
+        self.fail()
+        self.fail()
+        self.time.monotonic.return_value += 30
+        self.fail()
+        self.assertEqual(self.breaker.state, 'open')
+
+    def test_other_errors_pass_through(self):
+        for _ in range(3):
+            self.fail(ValueError)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_razorpay_client_errors_do_not_count(self):
+        gateway = RazorpayGateway("rzp_test_key", "secret", {**gateway_options(), 'breaker_failure_threshold': 1})
+        gateway.client = mock.Mock()
+        gateway.client.order.create.side_effect = razorpay.errors.BadRequestError("amount too small")
+        for _ in range(2):
+            with self.assertRaises(GatewayError):
+                gateway.create_order(1)
+        self.assertEqual(gateway.breaker.state, 'closed')
+        gateway.client.order.create.side_effect = razorpay.errors.ServerError("down")
+        with self.assertRaises(GatewayError):
+            gateway.create_order(100)
+        self.assertEqual(gateway.breaker.state, 'open')
+        with self.assertRaises(GatewayUnavailable):
+            gateway.create_order(100)
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 until `failures` requests were made, then 200."""
+    failures = 2
+    requests = []
+
+    def answer(self):
+        FlakyHandler.requests.append(self.command)
+        status = 503 if len(FlakyHandler.requests) <= self.failures else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    do_GET = do_POST = answer
+
+    def log_message(self, *args):
+        pass
+
+
+class GatewaySessionTests(SimpleTestCase):
+    def setUp(self):
+        FlakyHandler.requests = []
+        server = HTTPServer(("127.0.0.1", 0), FlakyHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = f"http://127.0.0.1:{server.server_port}/"
+        self.session = build_http_session({**gateway_options(), 'backoff_factor': 0, 'backoff_jitter': 0})
+
+    def test_get_is_retried(self):
+        self.assertEqual(self.session.get(self.url).status_code, 200)
+        self.assertEqual(FlakyHandler.requests, ["GET"] * 3)
+
+    def test_post_is_not_replayed(self):
+        self.assertEqual(self.session.post(self.url).status_code, 503)
+        self.assertEqual(FlakyHandler.requests, ["POST"])
+
+    def test_default_timeouts(self):
+        with mock.patch("requests.Session.request") as request:
+            self.session.get(self.url)
+        options = gateway_options()
+        self.assertEqual(request.call_args.kwargs["timeout"], (options['connect_timeout'], options['read_timeout']))
+
+
+@override_settings(RAZORPAY_WEBHOOK_SECRET='whsec_test')
+class WebhookTests(TestCase):
+    def setUp(self):
+        data = MarketplaceData()
+        data.grow(1)
+        self.orders = data.orders
+        for n, order in enumerate(self.orders):
+            GatewayOrder.objects.create(order=order, gateway_order_id=f"order_gw{n}", amount=order_amount_paise(order),
+                                        expires_at=timezone.now() + timedelta(hours=1))
+
+    def post(self, event_id, gateway_order_id, event="payment.captured", secret='whsec_test'):
+        body = json.dumps({"id": event_id, "event": event, "payload": {"payment": {"entity": {
+            "id": f"pay_{event_id}", "order_id": gateway_order_id,
+        }}}})
+        signature = hmac.new(secret.encode(), body.encode(), hashlib.sha256).hexdigest()
+        return self.client.post(reverse('payment-webhook'), body, content_type='application/json',
+                                headers={'x-razorpay-signature': signature})
+
+    def test_signature_is_checked(self):
+        self.assertEqual(self.post("evt_1", "order_gw0", secret='wrong').status_code, 400)
+        with override_settings(RAZORPAY_WEBHOOK_SECRET=''):
+            self.assertEqual(self.post("evt_1", "order_gw0", secret='').status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+        self.assertEqual(self.post("evt_1", "order_gw0").status_code, 200)
+        self.assertTrue(WebhookEvent.objects.filter(event_id="evt_1").exists())
+
+    def test_redeliveries_are_deduplicated(self):
+        self.post("evt_1", "order_gw0")
+        self.post("evt_1", "order_gw0")
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self.assertEqual(process_pending_events(), 1)
+        payment = Payment.objects.get(order=self.orders[0])
+        self.assertEqual((payment.status, payment.transaction_id), (Payment.STATUS_SUCCESS, "pay_evt_1"))
+        self.orders[0].refresh_from_db()
+        self.assertEqual(self.orders[0].status, Order.STATUS_ACCEPTED)
+
+    def test_superseded_gateway_order_still_matches(self):
+        GatewayOrder.objects.filter(gateway_order_id="order_gw0").update(superseded_at=timezone.now())
+        GatewayOrder.objects.create(order=self.orders[0], gateway_order_id="order_new", amount=1,
+                                    expires_at=timezone.now() + timedelta(hours=1))
+        self.post("evt_1", "order_gw0")
+        process_pending_events()
+        self.assertEqual(Payment.objects.get(order=self.orders[0]).status, Payment.STATUS_SUCCESS)
+
+    def test_failed_event_is_retried(self):
+        self.post("evt_bad", "order_gw0")
+        self.post("evt_good", "order_gw1")
+        apply = webhooks._apply
+
+        def failing_apply(events):
+            if any(event.event_id == "evt_bad" for event in events):
+                raise RuntimeError("boom")
+            apply(events)
+
+        with mock.patch.object(webhooks, "_apply", side_effect=failing_apply), \
+                self.assertLogs("payments.webhooks", "ERROR"):
+            self.assertEqual(process_pending_events(), 2)
+        bad = WebhookEvent.objects.get(event_id="evt_bad")
+        self.assertIsNone(bad.processed_at)
+        self.assertEqual((bad.attempts, bad.error), (1, "boom"))
+        self.assertTrue(Payment.objects.filter(order=self.orders[1], status=Payment.STATUS_SUCCESS).exists())
+
+        # Not due yet, then retried once the backoff has passed
+        self.assertEqual(process_pending_events(), 0)
+        WebhookEvent.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(process_pending_events(), 1)
+        bad.refresh_from_db()
+        self.assertIsNotNone(bad.processed_at)
+        self.assertEqual((bad.attempts, bad.error), (2, ""))
+        self.assertEqual(Payment.objects.get(order=self.orders[0]).status, Payment.STATUS_SUCCESS)
+
+    def test_gives_up_after_max_attempts(self):
+        self.post("evt_bad", "order_gw0")
+        WebhookEvent.objects.update(attempts=webhooks.MAX_ATTEMPTS)
+        self.assertEqual(process_pending_events(), 0)
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        data = MarketplaceData()
+        data.grow(2)
+        self.paid, self.failed, self.open, self.superseded = data.orders[:4]
+        self.gateway_payments = {
+            "order_paid": [{"id": "pay_1", "status": "failed"}, {"id": "pay_2", "status": "captured"}],
+            "order_failed": [{"id": "pay_3", "status": "failed"}],
+            "order_open": [],
+            "order_old": [{"id": "pay_4", "status": "captured"}],
+            "order_new": [],
+        }
+        later = timezone.now() + timedelta(hours=1)
+        for order, gateway_order_id in ((self.paid, "order_paid"), (self.failed, "order_failed"),
+                                        (self.open, "order_open"), (self.superseded, "order_new")):
+            GatewayOrder.objects.create(order=order, gateway_order_id=gateway_order_id, amount=1, expires_at=later)
+        GatewayOrder.objects.create(order=self.superseded, gateway_order_id="order_old", amount=1, expires_at=later,
+                                    superseded_at=timezone.now())
+        self.gateway = mock.Mock()
+        self.gateway.fetch_order_payments.side_effect = lambda gateway_order_id: self.gateway_payments[gateway_order_id]
+        patcher = mock.patch("payments.reconciliation.get_gateway", return_value=self.gateway)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_creates_payments_from_the_gateway(self):
+        summary = reconcile_pending_payments(batch_size=2, concurrency=2)
+        self.assertEqual(summary['scanned'], 4)
+        payments = {payment.order_id: payment for payment in Payment.objects.all()}
+        self.assertEqual((payments[self.paid.pk].status, payments[self.paid.pk].transaction_id),
+                         (Payment.STATUS_SUCCESS, "pay_2"))
+        self.assertEqual(payments[self.failed.pk].status, Payment.STATUS_FAILED)
+        self.assertNotIn(self.open.pk, payments)
+        # Paid through a gateway order that was since replaced
+        self.assertEqual(payments[self.superseded.pk].status, Payment.STATUS_SUCCESS)
+        self.paid.refresh_from_db()
+        self.assertEqual(self.paid.status, Order.STATUS_ACCEPTED)
+
+    def test_paid_orders_are_not_scanned_again(self):
+        reconcile_pending_payments()
+        # The failed order is still unpaid, the customer may retry
+        self.assertEqual(reconcile_pending_payments()['scanned'], 2)
+
+    def test_gateway_errors_leave_orders_unpaid(self):
+        def fetch(gateway_order_id):
+            if gateway_order_id == "order_paid":
+                raise GatewayError("down")
+            return self.gateway_payments[gateway_order_id]
+
+        self.gateway.fetch_order_payments.side_effect = fetch
+        self.assertEqual(reconcile_pending_payments()['errors'], 1)
+        self.assertFalse(Payment.objects.filter(order=self.paid).exists())
+
+    def test_dry_run(self):
+        summary = reconcile_pending_payments(dry_run=True)
+        self.assertEqual(summary['success'], 2)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_cash_on_delivery(self):
+        payment = Payment.objects.create(order=self.open, method=Payment.METHOD_COD, amount=1)
+        Order.objects.filter(pk=self.open.pk).update(status=Order.STATUS_DELIVERED)
+        reconcile_pending_payments()
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.STATUS_SUCCESS)
+
+    def test_webhook_success_during_reconciliation_wins(self):
+        payment = Payment.objects.create(order=self.failed, method=Payment.METHOD_CARD, amount=1)
+
+        def webhook_meanwhile(order, gateway_payments, now):
+            if order.pk == self.failed.pk:
+                # Le webhook arrive après la lecture du lot
+                Payment.objects.filter(pk=payment.pk).update(status=Payment.STATUS_SUCCESS, transaction_id="pay_5")
+            return _gateway_outcome(order, gateway_payments, now)
+
+        with mock.patch("payments.reconciliation._gateway_outcome", side_effect=webhook_meanwhile):
+            summary = reconcile_pending_payments()
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.transaction_id), (Payment.STATUS_SUCCESS, "pay_5"))
+        self.assertEqual(summary['failed'], 0)
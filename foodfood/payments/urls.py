@@ -1,11 +1,12 @@
 from django.urls import path
-from .views import upi_checkout, verify_payment, cod_confirm
+from .views import upi_checkout, verify_payment, cod_confirm, payment_webhook
 
 
 urlpatterns = [
     path('upi/<int:order_id>/', upi_checkout, name='upi-checkout'),
     path('verify/', verify_payment, name='payment-verify'),
     path('cod/<int:order_id>/', cod_confirm, name='cod-confirm'),
+    path('webhook/', payment_webhook, name='payment-webhook'),
 ]
 
 
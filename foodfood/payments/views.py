@@ -6,34 +6,21 @@ from django.db import transaction
 from django.contrib import messages
 from django.conf import settings
 from orders.models import Order
-import razorpay
 from .models import Payment
-
-
-def get_razorpay_client():
-    return razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+from .gateway import get_gateway, ensure_gateway_order, order_amount_paise, SignatureVerificationError
+from .webhooks import verify_webhook_signature, store_event
 
 
 def upi_checkout(request, order_id):
     order = get_object_or_404(Order, pk=order_id)
-    amount_paise = int(order.total_amount * 100) if hasattr(order, 'total_amount') else int(order.get_total() * 100)
+    amount_paise = order_amount_paise(order)
 
     error_message = None
     rp_order_id = None
 
     try:
-        key_id = settings.RAZORPAY_KEY_ID
-        key_secret = settings.RAZORPAY_KEY_SECRET
-        if not key_id or not key_secret or key_id.startswith("rzp_test_xxxxx"):
-            raise razorpay.errors.BadRequestError("Razorpay test keys not configured")
-
-        client = razorpay.Client(auth=(key_id, key_secret))
-        rp_order = client.order.create({
-            "amount": amount_paise,
-            "currency": "INR",
-            "payment_capture": 1,
-        })
-        rp_order_id = rp_order["id"]
+        # Normally prepared right after checkout; only created here if missing or expired
+        rp_order_id = ensure_gateway_order(order).gateway_order_id
     except Exception as e:
         error_message = str(e)
 
@@ -63,7 +50,7 @@ def cod_confirm(request, order_id):
     # Consider COD as accepted/preparing depending on your business flow
     if order.status == Order.STATUS_PENDING:
         order.status = Order.STATUS_ACCEPTED
-        order.save(update_fields=["status"])
+        order.save(update_fields=["status", "updated_at"])
     messages.success(request, "Cash on Delivery confirmed. Your order is accepted.")
     # Redirect to order detail for better UX instead of returning JSON
     return redirect('order-detail', pk=order.pk)
@@ -83,13 +70,8 @@ def verify_payment(request):
     if not (rp_order_id and payment_id and signature and app_order_id):
         return HttpResponseBadRequest("Missing params")
 
-    client = get_razorpay_client()
     try:
-        client.utility.verify_payment_signature({
-            "razorpay_order_id": rp_order_id,
-            "razorpay_payment_id": payment_id,
-            "razorpay_signature": signature,
-        })
+        get_gateway().verify_payment_signature(rp_order_id, payment_id, signature)
 
         order = get_object_or_404(Order.objects.select_for_update(), pk=app_order_id)
         # Create or update a Payment record
@@ -105,10 +87,24 @@ def verify_payment(request):
         # Update order status to accepted or delivered depending on your flow
         if order.status in (Order.STATUS_PENDING, Order.STATUS_ACCEPTED):
             order.status = Order.STATUS_ACCEPTED
-            order.save(update_fields=["status"])
+            order.save(update_fields=["status", "updated_at"])
 
         return JsonResponse({"status": "ok", "payment_id": payment_obj.id})
-    except razorpay.errors.SignatureVerificationError:
+    except SignatureVerificationError:
         return JsonResponse({"status": "failed"}, status=400)
 
+
+@csrf_exempt
+@require_POST
+def payment_webhook(request):
+    """Verify a gateway webhook and queue it; process_payment_webhooks applies it later."""
+    try:
+        verify_webhook_signature(request.body, request.headers.get("X-Razorpay-Signature"))
+        store_event(request.body, event_id=request.headers.get("X-Razorpay-Event-Id"))
+    except SignatureVerificationError:
+        return JsonResponse({"status": "invalid signature"}, status=400)
+    except ValueError:
+        return HttpResponseBadRequest("Malformed event")
+    return JsonResponse({"status": "queued"})
+
 # Create your views here.
@@ -0,0 +1,147 @@
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from orders.models import Order
+from .gateway import SignatureVerificationError, signature_matches
+from .models import GatewayOrder, Payment, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+SUCCESS_EVENTS = {"payment.captured", "order.paid"}
+FAILURE_EVENTS = {"payment.failed"}
+# A failing event is retried after 1, 2, 4 and 8 minutes, then left for inspection
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 60
+
+
+def verify_webhook_signature(body, signature):
+    secret = getattr(settings, "RAZORPAY_WEBHOOK_SECRET", "")
+    if not secret or not signature or not signature_matches(body, signature, secret):
+        raise SignatureVerificationError("Webhook signature verification failed")
+
+
+def store_event(body, event_id=None):
+    """Append a verified webhook body to the inbox and return its event id.
+
+    Redeliveries of an event already in the inbox are ignored by the unique event_id.
+    """
+    payload = json.loads(body)
+    event_id = event_id or payload.get("id") or payload.get("event_id")
+    if not event_id:
+        raise ValueError("Webhook event has no id")
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(event_id=event_id, event_type=payload.get("event", ""), payload=payload)],
+        ignore_conflicts=True,
+    )
+    return event_id
+
+
+def _payment_entity(payload):
+    return payload.get("payload", {}).get("payment", {}).get("entity", {})
+
+
+def _apply(events):
+    """Apply a batch of events to Payment and Order with a handful of bulk queries."""
+    entities = {event.pk: _payment_entity(event.payload) for event in events}
+    gateway_order_ids = {entity.get("order_id") for entity in entities.values() if entity.get("order_id")}
+    app_order_ids = dict(
+        GatewayOrder.objects.filter(gateway_order_id__in=gateway_order_ids)
+        .values_list("gateway_order_id", "order_id")
+    )
+    orders = Order.objects.in_bulk(app_order_ids.values())
+    payments = {p.order_id: p for p in Payment.objects.filter(order_id__in=orders.keys())}
+
+    to_create, to_update, accepted_orders = {}, {}, set()
+    for event in events:
+        entity = entities[event.pk]
+        order = orders.get(app_order_ids.get(entity.get("order_id")))
+        if order is None or event.event_type not in SUCCESS_EVENTS | FAILURE_EVENTS:
+            continue
+        success = event.event_type in SUCCESS_EVENTS
+        payment = payments.get(order.pk) or to_create.get(order.pk)
+        if payment is None:
+            payment = Payment(order=order, method=Payment.METHOD_CARD, amount=order.total_amount)
+            to_create[order.pk] = payment
+        elif payment.pk:
+            to_update[order.pk] = payment
+        if success:
+            payment.status = Payment.STATUS_SUCCESS
+            payment.transaction_id = entity.get("id", payment.transaction_id)
+            accepted_orders.add(order.pk)
+        elif payment.status != Payment.STATUS_SUCCESS:
+            # A late failure never overrides a captured payment
+            payment.status = Payment.STATUS_FAILED
+            payment.transaction_id = entity.get("id", payment.transaction_id)
+
+    Payment.objects.bulk_create(to_create.values())
+    Payment.objects.bulk_update(to_update.values(), ["status", "transaction_id"])
+    accept_orders(order for pk, order in orders.items() if pk in accepted_orders)
+
+
+def accept_orders(orders):
+    """Move pending orders to accepted in one query and invalidate their vendors' dashboards."""
+    accepted = [order for order in orders if order.status == Order.STATUS_PENDING]
+    now = timezone.now()
+    for order in accepted:
+        order.status = Order.STATUS_ACCEPTED
+        order.updated_at = now
+    Order.objects.bulk_update(accepted, ["status", "updated_at"])
+    if accepted:
+        # bulk_update sends no post_save, so invalidate the dashboards ourselves
+        from accounts.dashboard import invalidate_dashboard
+        from restaurants.models import Restaurant
+        vendor_ids = Restaurant.objects.filter(
+            pk__in={order.restaurant_id for order in accepted}
+        ).values_list("vendor_id", flat=True)
+        for vendor_id in set(vendor_ids):
+            invalidate_dashboard(vendor_id)
+    return accepted
+
+
+def _attempt(events, now):
+    """Apply events in one savepoint, marking them processed; False if that failed."""
+    try:
+        with transaction.atomic():
+            _apply(events)
+    except Exception as exc:
+        for event in events:
+            event.error = str(exc)
+        return False
+    for event in events:
+        event.processed_at = now
+        event.error = ""
+    return True
+
+
+def process_pending_events(batch_size=200):
+    """Apply one batch of due webhook events; returns how many were attempted.
+
+    The batch is applied at once. If that fails, each event is applied again in its
+    own savepoint, so one bad event does not hold back the others. Failed events stay
+    unprocessed and are retried with an exponential backoff, up to MAX_ATTEMPTS times.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            WebhookEvent.objects.filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .order_by("id")[:batch_size]
+        )
+        if not events:
+            return 0
+        if not _attempt(events, now):
+            for event in events:
+                if not _attempt([event], now):
+                    logger.error("Failed to apply webhook event %s: %s", event.event_id, event.error)
+        for event in events:
+            event.attempts += 1
+            if event.processed_at is None:
+                event.next_attempt_at = now + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (event.attempts - 1))
+        WebhookEvent.objects.bulk_update(events, ["processed_at", "error", "attempts", "next_attempt_at"])
+    return len(events)
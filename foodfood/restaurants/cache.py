@@ -0,0 +1,178 @@
+"""
+Read-through cache of restaurant and menu data, versioned per restaurant.
+
+Every entry cached for a restaurant has the restaurant's current version in its key.
+Saving or deleting the restaurant or one of its menu items, or a bulk_update,
+bulk_create or update() through their managers, bumps that version with an atomic
+cache.incr once the transaction commits: every entry of the restaurant becomes
+unreachable at once, without knowing its keys, and simply expires.
+
+A version that fell out of the cache restarts from the current time in nanoseconds,
+never from a number older entries could still carry.
+
+Versions live in the "shared" cache, so a bump in one worker process reaches all of
+them; the entries themselves stay in each process's default cache. Hits and misses
+are counted in the foodfood_model_cache_total metric.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from foodfood.cache import shared_cache
+from foodfood.instrumentation import registry
+
+from .models import MenuItem, Restaurant
+
+VERSION_KEY = "restaurant-version:{restaurant_id}"
+ENTRY_KEY = "restaurant:{restaurant_id}:v{version}:{name}"
+SLUG_KEY = "restaurant-slug:{slug}"
+CACHE_TIMEOUT = 60 * 60
+_MISSING = object()
+_NOT_FOUND = "none"
+
+
+def _count(entry, outcome):
+    registry.increment("foodfood_model_cache_total", entry=entry, outcome=outcome)
+
+
+def restaurant_version(restaurant_id):
+    key = VERSION_KEY.format(restaurant_id=restaurant_id)
+    version = shared_cache.get(key)
+    if version is None:
+        shared_cache.add(key, time.time_ns(), None)
+        version = shared_cache.get(key)
+    return version
+
+
+async def arestaurant_version(restaurant_id):
+    key = VERSION_KEY.format(restaurant_id=restaurant_id)
+    version = await shared_cache.aget(key)
+    if version is None:
+        await shared_cache.aadd(key, time.time_ns(), None)
+        version = await shared_cache.aget(key)
+    return version
+
+
+def _bump(restaurant_ids):
+    for restaurant_id in restaurant_ids:
+        key = VERSION_KEY.format(restaurant_id=restaurant_id)
+        try:
+            shared_cache.incr(key)
+        except ValueError:
+            shared_cache.add(key, time.time_ns(), None)
+
+
+def invalidate_restaurants(restaurant_ids):
+    """Drop every cached entry of these restaurants, once the current transaction commits."""
+    restaurant_ids = {restaurant_id for restaurant_id in restaurant_ids if restaurant_id is not None}
+    if restaurant_ids:
+        # Bumping earlier would let a concurrent read cache pre-commit data under the new version
+        transaction.on_commit(lambda: _bump(restaurant_ids))
+
+
+def _entry_key(restaurant_id, name, version):
+    return ENTRY_KEY.format(restaurant_id=restaurant_id, version=version, name=name)
+
+
+def read_through(restaurant_id, name, loader, version=None):
+    """The entry name of the restaurant, loaded on a miss; version saves the lookup when known."""
+    if version is None:
+        version = restaurant_version(restaurant_id)
+    key = _entry_key(restaurant_id, name, version)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(name, "hit")
+        return value
+    _count(name, "miss")
+    value = loader()
+    cache.set(key, value, CACHE_TIMEOUT)
+    return value
+
+
+async def aread_through(restaurant_id, name, loader, version=None):
+    """read_through() for async callers; loader is a coroutine function."""
+    if version is None:
+        version = await arestaurant_version(restaurant_id)
+    key = _entry_key(restaurant_id, name, version)
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        _count(name, "hit")
+        return value
+    _count(name, "miss")
+    value = await loader()
+    await cache.aset(key, value, CACHE_TIMEOUT)
+    return value
+
+
+def get_restaurant(restaurant_id, version=None):
+    """The restaurant, or None."""
+    restaurant = read_through(restaurant_id, "restaurant",
+                              lambda: Restaurant.objects.filter(pk=restaurant_id).first() or _NOT_FOUND, version)
+    return None if restaurant == _NOT_FOUND else restaurant
+
+
+async def aget_restaurant(restaurant_id, version=None):
+    async def load():
+        return await Restaurant.objects.filter(pk=restaurant_id).afirst() or _NOT_FOUND
+    restaurant = await aread_through(restaurant_id, "restaurant", load, version)
+    return None if restaurant == _NOT_FOUND else restaurant
+
+
+def get_versioned_restaurant_by_slug(slug):
+    """(restaurant with this slug or None, the version it was read under).
+
+    The slug only maps to an id in the cache.
+    """
+    key = SLUG_KEY.format(slug=slug)
+    restaurant_id = cache.get(key)
+    if restaurant_id is not None:
+        version = restaurant_version(restaurant_id)
+        restaurant = get_restaurant(restaurant_id, version)
+        if restaurant is not None and restaurant.slug == slug:
+            return restaurant, version
+    # Unknown slug, or the restaurant was renamed since
+    restaurant = Restaurant.objects.filter(slug=slug).first()
+    if restaurant is None:
+        return None, None
+    version = restaurant_version(restaurant.pk)
+    cache.set_many({key: restaurant.pk, _entry_key(restaurant.pk, "restaurant", version): restaurant}, CACHE_TIMEOUT)
+    return restaurant, version
+
+
+async def aget_versioned_restaurant_by_slug(slug):
+    key = SLUG_KEY.format(slug=slug)
+    restaurant_id = await cache.aget(key)
+    if restaurant_id is not None:
+        version = await arestaurant_version(restaurant_id)
+        restaurant = await aget_restaurant(restaurant_id, version)
+        if restaurant is not None and restaurant.slug == slug:
+            return restaurant, version
+    restaurant = await Restaurant.objects.filter(slug=slug).afirst()
+    if restaurant is None:
+        return None, None
+    version = await arestaurant_version(restaurant.pk)
+    await cache.aset_many({key: restaurant.pk, _entry_key(restaurant.pk, "restaurant", version): restaurant},
+                          CACHE_TIMEOUT)
+    return restaurant, version
+
+
+def get_restaurant_by_slug(slug):
+    """The restaurant with this slug, or None."""
+    return get_versioned_restaurant_by_slug(slug)[0]
+
+
+async def aget_restaurant_by_slug(slug):
+    return (await aget_versioned_restaurant_by_slug(slug))[0]
+
+
+def get_available_menu(restaurant_id, version=None):
+    """Available menu items of the restaurant, as a list."""
+    return read_through(restaurant_id, "menu",
+                        lambda: list(MenuItem.objects.filter(restaurant_id=restaurant_id, is_available=True)), version)
+
+
+async def aget_available_menu(restaurant_id, version=None):
+    async def load():
+        return [item async for item in MenuItem.objects.filter(restaurant_id=restaurant_id, is_available=True)]
+    return await aread_through(restaurant_id, "menu", load, version)
@@ -1,8 +1,8 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 from django.db.models import TextChoices
 from accounts.models import Vendor
-from PIL import Image
 from pathlib import Path
 
 
@@ -14,6 +14,9 @@ def _compress_and_fit_image(image_path: str, target_size=TARGET_IMAGE_SIZE) -> N
     and save compressed back to the same path.
     """
     try:
+        # Pillow is only needed once an image is uploaded: keep it off worker startup
+        from PIL import Image
+
         with Image.open(image_path) as img:
             # Convert to RGB to avoid issues with PNG/alpha when saving JPEG
             if img.mode in ("RGBA", "P"):
@@ -52,6 +55,48 @@ def _compress_and_fit_image(image_path: str, target_size=TARGET_IMAGE_SIZE) -> N
         pass
 
 
+class RestaurantDataQuerySet(models.QuerySet):
+    """Bulk writes that bypass signals still invalidate the restaurant cache (restaurants.cache)
+    and move updated_at, which auto_now only does in save().
+    """
+
+    def _restaurant_ids(self, objs=None):
+        field = "pk" if self.model is Restaurant else "restaurant_id"
+        if objs is None:
+            return set(self.values_list(field, flat=True))
+        return {getattr(obj, field) for obj in objs}
+
+    def update(self, **kwargs):
+        from .cache import invalidate_restaurants
+
+        kwargs.setdefault("updated_at", timezone.now())
+        restaurant_ids = self._restaurant_ids()
+        moved_to = kwargs.get("restaurant", kwargs.get("restaurant_id"))
+        if moved_to is not None:
+            restaurant_ids.add(getattr(moved_to, "pk", moved_to))
+        rows = super().update(**kwargs)
+        invalidate_restaurants(restaurant_ids)
+        return rows
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        from .cache import invalidate_restaurants
+
+        objs = list(objs)
+        now = timezone.now()
+        for obj in objs:
+            obj.updated_at = now
+        rows = super().bulk_update(objs, {*fields, "updated_at"}, batch_size=batch_size)
+        invalidate_restaurants(self._restaurant_ids(objs))
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .cache import invalidate_restaurants
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        invalidate_restaurants(self._restaurant_ids(objs))
+        return objs
+
+
 class Restaurant(models.Model):
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name="restaurants")
     name = models.CharField(max_length=120)
@@ -62,6 +107,9 @@ class Restaurant(models.Model):
     delivery_time = models.PositiveIntegerField(help_text="Estimated delivery time in minutes", default=30)
     delivery_fee = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     is_open = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RestaurantDataQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Restaurant"
@@ -119,10 +167,15 @@ class MenuItem(models.Model):
     category = models.CharField(max_length=24, choices=Category.choices, default=Category.MAIN)
     image = models.ImageField(upload_to="menu_items/", blank=True, null=True)
     is_available = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RestaurantDataQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Menu Item"
         verbose_name_plural = "Menu Items"
+        # Latest change to a restaurant's menu, for the menu page's ETag
+        indexes = [models.Index(fields=["restaurant", "updated_at"])]
 
     def __str__(self):
         return f"{self.name} - {self.restaurant.name}"
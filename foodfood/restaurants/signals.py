@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_restaurants
+from .models import MenuItem, Restaurant
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def invalidate_restaurant(sender, instance, **kwargs):
+    invalidate_restaurants([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+def invalidate_menu(sender, instance, **kwargs):
+    invalidate_restaurants([instance.restaurant_id])
+
+
+@receiver(pre_save, sender=MenuItem)
+def invalidate_previous_menu(sender, instance, **kwargs):
+    # An item moved to another restaurant leaves the old menu too
+    if instance.pk is not None:
+        invalidate_restaurants(
+            MenuItem.objects.filter(pk=instance.pk).exclude(restaurant_id=instance.restaurant_id)
+            .values_list("restaurant_id", flat=True)
+        )
@@ -1,3 +1,151 @@
-from django.test import TestCase
+import re
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from foodfood.cache import DatabaseCache
+from foodfood.testing import MarketplaceData, QueryBudgetTestCase
+from .cache import get_available_menu, get_restaurant_by_slug
+from .models import MenuItem, Restaurant
+
+
+class RestaurantQueryBudgetTests(QueryBudgetTestCase):
+    def test_menu_list(self):
+        self.assertQueryBudget(reverse('menu-list'), 2)
+
+    def test_restaurant_list(self):
+        self.assertQueryBudget(reverse('restaurant-list'), 2)
+
+    def test_restaurant_detail(self):
+        self.assertQueryBudget(lambda: reverse('restaurant-detail', args=[self.data.restaurants[0].slug]), 1)
+
+    def test_restaurant_menu(self):
+        self.assertQueryBudget(lambda: reverse('restaurant-menu', args=[self.data.restaurants[0].slug]), 1)
+
+
+class RestaurantCacheTests(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.data = MarketplaceData()
+        self.data.grow(1)
+        self.restaurant = self.data.restaurants[0]
+
+    def test_save_invalidates_restaurant(self):
+        get_restaurant_by_slug(self.restaurant.slug)
+        # Only the version is read, from the shared cache
+        with self.assertNumQueries(1):
+            get_restaurant_by_slug(self.restaurant.slug)
+        self.restaurant.name = "Renamed Kitchen"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.save()
+        self.assertEqual(get_restaurant_by_slug(self.restaurant.slug).name, "Renamed Kitchen")
+
+    def test_bulk_writes_invalidate_menu(self):
+        items = get_available_menu(self.restaurant.pk)
+        self.assertEqual(len(items), 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.filter(pk=items[0].pk).update(is_available=False)
+        self.assertEqual(len(get_available_menu(self.restaurant.pk)), 3)
+
+        items = get_available_menu(self.restaurant.pk)
+        for item in items:
+            item.is_available = False
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.bulk_update(items, ['is_available'])
+        self.assertEqual(get_available_menu(self.restaurant.pk), [])
+
+    def test_bump_reaches_every_process(self):
+        # Each worker process has its own default cache; the shared table is common to all
+        workers = [
+            {"cache": LocMemCache(f"worker-{n}", {}), "shared_cache": DatabaseCache("foodfood_shared_cache", {})}
+            for n in range(2)
+        ]
+        for worker in workers:
+            with mock.patch.multiple("restaurants.cache", **worker):
+                self.assertEqual(len(get_available_menu(self.restaurant.pk)), 4)
+
+        item = self.restaurant.menu_items.first()
+        item.is_available = False
+        with mock.patch.multiple("restaurants.cache", **workers[0]), self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        with mock.patch.multiple("restaurants.cache", **workers[1]):
+            self.assertEqual(len(get_available_menu(self.restaurant.pk)), 3)
+
+
+class RestaurantConditionalGetTests(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.data = MarketplaceData()
+        self.data.grow(1)
+        self.restaurant = self.data.restaurants[0]
+
+    def test_restaurant_detail_not_modified(self):
+        url = reverse('restaurant-detail', args=[self.restaurant.slug])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1), self.assertTemplateNotUsed('restaurants/detail.html'):
+            response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.restaurant.description = "New description"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.save()
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_follows_the_cached_entry(self):
+        url = reverse('restaurant-detail', args=[self.restaurant.slug])
+        etag = self.client.get(url)['ETag']
+        # Written but not invalidated yet: the cached page still goes out under its own ETag
+        with self.captureOnCommitCallbacks() as callbacks:
+            Restaurant.objects.filter(pk=self.restaurant.pk).update(description="New description")
+        response = self.client.get(url)
+        self.assertEqual(response['ETag'], etag)
+        self.assertNotContains(response, "New description")
+
+        for callback in callbacks:
+            callback()
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertContains(response, "New description")
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_menu_etag_follows_items(self):
+        url = reverse('restaurant-menu', args=[self.restaurant.slug])
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.menu_items.order_by('-pk').first().delete()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_new_login_is_not_served_the_old_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('restaurant-menu', args=[self.restaurant.slug])
+
+        def csrf_token(response):
+            return re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode()).group(1)
+
+        def log_in():
+            token = csrf_token(client.get(reverse('login')))
+            response = client.post(reverse('login'), {'username': 'budget_customer', 'password': 'pass12345',
+                                                      'csrfmiddlewaretoken': token})
+            self.assertEqual(response.status_code, 302)
+
+        log_in()
+        response = client.get(url)
+        etag = response['ETag']
+        self.assertEqual(client.get(url, headers={'if-none-match': etag}).status_code, 304)
+        client.post(reverse('logout'), {'csrfmiddlewaretoken': csrf_token(response)})
+        # La connexion renouvelle le secret CSRF : la page en cache du navigateur est périmée
+        log_in()
+        response = client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        response = client.post(reverse('checkout'), {'csrfmiddlewaretoken': csrf_token(response)})
+        self.assertEqual(response.status_code, 302)
@@ -1,6 +1,11 @@
-from django.shortcuts import render, get_object_or_404
-from django.views.generic import ListView, DetailView
+from django.http import Http404
+from django.shortcuts import render
+from django.views.generic import DetailView, View
 from django.db.models import Q
+from foodfood.conditional import aconditional, asession_stamp, conditional, session_stamp, stamp_etag
+from foodfood.routing import read_replica
+from foodfood.shortcuts import apaginate, arender
+from .cache import aget_available_menu, aget_versioned_restaurant_by_slug, get_versioned_restaurant_by_slug
 from .models import Restaurant, MenuItem
 
 
@@ -9,15 +14,19 @@ def splash_view(request):
     return render(request, 'splash.html')
 
 
-class MenuListView(ListView):
+@read_replica
+class MenuListView(View):
     """Display all menu items from all restaurants on homepage"""
-    model = MenuItem
     template_name = 'restaurants/menu_list.html'
-    context_object_name = 'menu_items'
     paginate_by = 20
 
+    async def get(self, request, *args, **kwargs):
+        ctx = await apaginate(request, self.get_queryset(), self.paginate_by)
+        ctx['menu_items'] = ctx['object_list']
+        return await arender(request, self.template_name, self.get_context_data(**ctx))
+
     def get_queryset(self):
-        qs = super().get_queryset().filter(is_available=True).select_related('restaurant')
+        qs = MenuItem.objects.filter(is_available=True).select_related('restaurant')
         
         # Search filters
         q = self.request.GET.get('q', '').strip()
@@ -50,7 +59,7 @@ class MenuListView(ListView):
         return qs.order_by('restaurant__name', 'category', 'name')
 
     def get_context_data(self, **kwargs):
-        ctx = super().get_context_data(**kwargs)
+        ctx = {'view': self, **kwargs}
         ctx['q'] = self.request.GET.get('q', '').strip()
         ctx['category'] = self.request.GET.get('category', '')
         ctx['price_min'] = self.request.GET.get('price_min', '')
@@ -59,14 +68,18 @@ class MenuListView(ListView):
         return ctx
 
 
-class RestaurantListView(ListView):
-    model = Restaurant
+@read_replica
+class RestaurantListView(View):
     template_name = 'restaurants/list.html'
-    context_object_name = 'restaurants'
     paginate_by = 12
 
+    async def get(self, request, *args, **kwargs):
+        ctx = await apaginate(request, self.get_queryset(), self.paginate_by)
+        ctx['restaurants'] = ctx['object_list']
+        return await arender(request, self.template_name, self.get_context_data(**ctx))
+
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = Restaurant.objects.all()
         q = self.request.GET.get('q', '').strip()
         cuisine = self.request.GET.get('cuisine')
         is_open = self.request.GET.get('open')
@@ -84,7 +97,7 @@ class RestaurantListView(ListView):
         return qs.order_by('-rating', 'name')
 
     def get_context_data(self, **kwargs):
-        ctx = super().get_context_data(**kwargs)
+        ctx = {'view': self, **kwargs}
         ctx['q'] = self.request.GET.get('q', '').strip()
         ctx['open'] = self.request.GET.get('open', '')
         return ctx
@@ -97,10 +110,30 @@ class RestaurantDetailView(DetailView):
     slug_field = 'slug'
     slug_url_kwarg = 'slug'
 
+    def get(self, request, *args, **kwargs):
+        # The ETag comes from the cache version the page is rendered from: a stale
+        # cached restaurant never goes out under a newer ETag
+        restaurant, version = get_versioned_restaurant_by_slug(kwargs[self.slug_url_kwarg])
+        if restaurant is None:
+            raise Http404("No restaurant found matching the query")
+        self.object = restaurant
+        etag = stamp_etag(session_stamp(request), "restaurant", restaurant.pk, version)
+        return conditional(request, etag, restaurant.updated_at,
+                           lambda: self.render_to_response(self.get_context_data(object=restaurant)))
+
+
+async def restaurant_menu(request, slug):
+    restaurant, version = await aget_versioned_restaurant_by_slug(slug)
+    if restaurant is None:
+        raise Http404("No restaurant found matching the query")
+    # Same version for the items, the page and its ETag
+    items = await aget_available_menu(restaurant.pk, version)
+    etag = stamp_etag(await asession_stamp(request), "menu", restaurant.pk, version)
+    last_modified = max([restaurant.updated_at, *(item.updated_at for item in items)])
+
+    async def render_menu():
+        return await arender(request, 'restaurants/menu.html', {"restaurant": restaurant, "items": items})
 
-def restaurant_menu(request, slug):
-    restaurant = get_object_or_404(Restaurant, slug=slug)
-    items = restaurant.menu_items.filter(is_available=True)
-    return render(request, 'restaurants/menu.html', {"restaurant": restaurant, "items": items})
+    return await aconditional(request, etag, last_modified, render_menu)
 
 # Create your views here.
\ No newline at end of file